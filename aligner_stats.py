@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+"""
+Contains the AlignerStats class
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+from contextlib import contextmanager   # used to time phases with a with statement
+from time import perf_counter           # used to time phases
+
+
+class AlignerStats:
+    """
+    Collects the time spent in each phase of the alignment pipeline, and counters of the
+    pairs aligned, the DP cells computed and the bytes of matrices allocated.  An aligner
+    is only instrumented once instrument() wraps its methods, so an aligner without
+    stats runs exactly the same code as before
+    """
+
+    # Phases of GlobalAlignerBase.align timed by instrument()
+    ALIGNER_PHASES = ('init_matrices', 'compute_matrices', 'traceback_matrices')
+
+    def __init__(self):
+
+        self.times = {}         # { phase: seconds spent in the phase }
+        self.calls = {}         # { phase: number of times the phase ran }
+        self.counters = {'pairs': 0, 'cells': 0, 'matrixBytes': 0}
+
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Times the body of a with statement as phase name
+        :param name: the name of the phase
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, perf_counter() - start)
+
+
+    def add_time(self, name, seconds):
+        """
+        Adds a run of a phase
+        :param name: the name of the phase
+        :param seconds: the duration of the run
+        """
+        self.times[name] = self.times.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+
+    def instrument(self, aligner):
+        """
+        Wraps the methods of an aligner so that its phases and counters are recorded in
+        these stats, and sets aligner.stats
+        :param aligner: a GlobalAlignerBase
+        """
+        aligner.stats = self
+
+        for name in self.ALIGNER_PHASES:
+            setattr(aligner, name, self._timed(name, getattr(aligner, name)))
+        aligner.init_matrices = self._measured(aligner, aligner.init_matrices)
+        aligner._align = self._counted('align', aligner._align, lambda seqA, seqB: [(seqA, seqB)])
+        aligner._score = self._counted('score', aligner._score, lambda seqA, seqB: [(seqA, seqB)])
+
+        # The numpy and prefix sharing engines align batches of targets without going through _align
+        if aligner.engine == aligner.NUMPY_ENGINE or aligner.prefixSharing:
+            engine = aligner.prefix_scan_engine() if aligner.prefixSharing else aligner.wavefront_engine()
+            batch = lambda query, targets, *args: [(query, target) for target in targets if target]
+            engine.align_many = self._counted('align_many', engine.align_many, batch)
+            engine.score_many = self._counted('score_many', engine.score_many, batch)
+
+
+    def _timed(self, name, method):
+        """
+        Returns a wrapper of method recording each call as a run of phase name
+        """
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.add_time(name, perf_counter() - start)
+        return timed
+
+
+    def _counted(self, name, method, pairs):
+        """
+        Returns a wrapper of method timing it as phase name, and counting the pairs and
+        DP cells of each call
+        :param pairs: returns the (seqA, seqB) pairs computed by a call, from its arguments
+        """
+        timed = self._timed(name, method)
+
+        def counted(*args, **kwargs):
+            for seqA, seqB in pairs(*args, **kwargs):
+                self.counters['pairs'] += 1
+                self.counters['cells'] += len(seqA) * len(seqB)
+            return timed(*args, **kwargs)
+        return counted
+
+
+    def _measured(self, aligner, method):
+        """
+        Returns a wrapper of init_matrices counting the bytes by which it grows the
+        matrix buffers of the aligner's arena
+        """
+        def measured(*args, **kwargs):
+            size = aligner.arena.size()
+            result = method(*args, **kwargs)
+            self.counters['matrixBytes'] += max(0, aligner.arena.size() - size)
+            return result
+        return measured
+
+
+    def drain(self):
+        """
+        Returns the stats collected so far and resets them, so that worker processes can
+        send the stats of each job to the main process
+        :return: the times, calls and counters
+        :rtype: dict
+        """
+        report = {'times': self.times, 'calls': self.calls, 'counters': self.counters}
+        self.times = {}
+        self.calls = {}
+        self.counters = dict.fromkeys(self.counters, 0)
+        return report
+
+
+    def merge(self, report):
+        """
+        Adds stats returned by drain() to these stats
+        :param report: the times, calls and counters of other stats
+        :type report: dict
+        """
+        for name, seconds in report['times'].items():
+            self.times[name] = self.times.get(name, 0.0) + seconds
+        for name, count in report['calls'].items():
+            self.calls[name] = self.calls.get(name, 0) + count
+        for name, count in report['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + count
+
+
+    def summary(self):
+        """
+        Formats the stats as a human readable table
+        :return: one line per phase, followed by the counters
+        :rtype: str
+        """
+        lines = [f"{'phase':20} {'calls':>10} {'seconds':>12}"]
+        for name in sorted(self.times, key=self.times.get, reverse=True):
+            lines.append(f"{name:20} {self.calls[name]:>10} {self.times[name]:>12.4f}")
+        for name, count in self.counters.items():
+            lines.append(f"{name:20} {count:>10}")
+
+        seconds = self.times.get('align', 0.0) + self.times.get('score', 0.0) \
+            + self.times.get('align_many', 0.0) + self.times.get('score_many', 0.0)
+        if seconds:
+            lines.append(f"{'GCUPS':20} {self.counters['cells'] / seconds / 1e9:>10.4f}")
+        return '\n'.join(lines)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+"""
+Contains the AlignmentCache class
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+import sqlite3              # used to store the cache on disk
+import time                 # used to order entries by last use
+from hashlib import sha256  # used to build the cache keys
+
+
+class AlignmentCache:
+    """
+    A persistent cache of alignment results, stored in a local SQLite database.  Entries
+    are keyed by a hash of the scoring scheme and of both sequences, and hold the score
+    and, unless only the score was computed, the aligned sequences.  Once the cache holds
+    more than maxEntries entries, the least recently used ones are evicted
+    """
+
+    MAX_ENTRIES = 1_000_000
+
+    def __init__(self, path, maxEntries=MAX_ENTRIES):
+
+        self.path = path                # path of the SQLite database
+        self.maxEntries = maxEntries    # number of entries above which entries are evicted
+        self.hits = 0                   # lookups answered by the cache
+        self.misses = 0                 # lookups not answered by the cache
+
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS alignments ("
+                                 "key TEXT PRIMARY KEY, alignA TEXT, alignB TEXT, score, used REAL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS alignments_used ON alignments (used)")
+        self._size = self._count()      # number of entries, counting those added by this process
+
+
+    def key(self, scheme, seqA, seqB):
+        """
+        Builds the key of an alignment
+        :param scheme: a string identifying the mode, substitution scores and gap costs
+        :param seqA: an amino acid sequence
+        :param seqB: an amino acid sequence
+        :return: a hexadecimal SHA-256 digest
+        :rtype: str
+        """
+        return sha256('\0'.join((scheme, seqA, seqB)).encode()).hexdigest()
+
+
+    def get_alignment(self, key):
+        """
+        Looks up a cached alignment
+        :param key: the key of the alignment (see key)
+        :return: the aligned sequences and the score, or None if they are not cached
+        :rtype: tuple
+        """
+        row = self._lookup(key, "SELECT alignA, alignB, score FROM alignments WHERE key = ? AND alignA IS NOT NULL")
+        return None if row is None else tuple(row)
+
+
+    def get_score(self, key):
+        """
+        Looks up a cached score, from either an alignment or a score-only entry
+        :param key: the key of the alignment (see key)
+        :return: the score, or None if it is not cached
+        """
+        row = self._lookup(key, "SELECT score FROM alignments WHERE key = ?")
+        return None if row is None else row[0]
+
+
+    def put_alignment(self, key, result):
+        """
+        Stores an alignment
+        :param key: the key of the alignment (see key)
+        :param result: the aligned sequences and the score
+        :type result: tuple
+        """
+        alignA, alignB, score = result
+        self._store("INSERT OR REPLACE", key, alignA, alignB, score)
+
+
+    def put_score(self, key, score):
+        """
+        Stores a score, unless its alignment is already cached
+        :param key: the key of the alignment (see key)
+        :param score: the score of the alignment
+        """
+        self._store("INSERT OR IGNORE", key, None, None, score)
+
+
+    def clear(self):
+        """
+        Removes every entry of the cache
+        """
+        self._connection.execute("DELETE FROM alignments")
+        self._size = 0
+
+
+    def close(self):
+        """
+        Closes the database
+        """
+        self._connection.close()
+
+
+    def _lookup(self, key, query):
+        """
+        Runs a lookup query, counting the hit or miss and refreshing the entry's last use
+        :return: the row found, or None
+        """
+        row = self._connection.execute(query, (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._connection.execute("UPDATE alignments SET used = ? WHERE key = ?", (time.time(), key))
+        return row
+
+
+    def _store(self, insert, key, alignA, alignB, score):
+        """
+        Inserts an entry, then evicts the least recently used entries if the cache is
+        over maxEntries
+        :param insert: the INSERT statement, which decides what happens to an existing entry
+        """
+        self._connection.execute(insert + " INTO alignments VALUES (?, ?, ?, ?, ?)",
+                                 (key, alignA, alignB, score, time.time()))
+        self._size += 1
+
+        # Other processes may share the database, so recount before evicting
+        if self._size > self.maxEntries:
+            self._size = self._count()
+            excess = self._size - self.maxEntries
+            if excess > 0:
+                self._connection.execute("DELETE FROM alignments WHERE key IN "
+                                         "(SELECT key FROM alignments ORDER BY used LIMIT ?)", (excess,))
+                self._size -= excess
+
+
+    def _count(self):
+        """
+        Returns the number of entries of the cache
+        """
+        return self._connection.execute("SELECT COUNT(*) FROM alignments").fetchone()[0]
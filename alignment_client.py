@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+"""
+Contains the AlignmentClient class
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+import argparse
+import json
+import socket
+import sys
+
+
+class AlignmentClient:
+    """
+    A client of the alignment server (see alignment_server.py), sending pairs of
+    sequences over a Unix socket or localhost TCP and receiving their results as the
+    server's workers finish them.  The client only depends on the standard library, so
+    a pipeline can align a few pairs without loading the BLOSUM matrix or the aligners
+    """
+
+    DEFAULT_SOCKET = "/tmp/global-alignment.sock"
+
+    def __init__(self, socketPath=DEFAULT_SOCKET, host=None, port=None):
+
+        if port is None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(socketPath)
+        else:
+            self._socket = socket.create_connection((host or "127.0.0.1", port))
+        self._file = self._socket.makefile('rwb')
+        self._nextId = 0        # id of the next request
+
+
+    def align(self, pairs, mode, scoreOnly=False, threshold=None):
+        """
+        Sends pairs of sequences to align, and yields their results as they arrive,
+        which is not necessarily in the order of the pairs
+        :param pairs: (seqA, seqB) pairs of amino acid sequences
+        :param mode: "distance" or "similarity"
+        :param scoreOnly: whether to only compute the scores
+        :param threshold: the max distance or min similarity beyond which pairs are rejected
+        :return: one dict per pair, with the index of the pair and either alignA, alignB
+        and score, score only, rejected, or error
+        :rtype: generator
+        """
+        requestId = self._nextId
+        self._nextId += 1
+        request = {'id': requestId, 'mode': mode, 'pairs': [list(pair) for pair in pairs],
+                   'scoreOnly': scoreOnly, 'threshold': threshold}
+        self._file.write(json.dumps(request).encode() + b'\n')
+        self._file.flush()
+
+        while True:
+            line = self._file.readline()
+            if not line:
+                raise ConnectionError("The alignment server closed the connection")
+            response = json.loads(line)
+            if response.get('done'):
+                if 'error' in response:
+                    raise ValueError(response['error'])
+                return
+            del response['id']
+            yield response
+
+
+    def close(self):
+        """
+        Closes the connection to the server
+        """
+        self._file.close()
+        self._socket.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+#=========================================================================
+
+# Align the pairs of sequences given on the command line or on stdin
+
+parser = argparse.ArgumentParser(description='Global Alignment Client')
+parser.add_argument('mode', type=str, choices=['distance', 'similarity'],
+                    help="The type of global alignment to be performed.")
+parser.add_argument('pairs', type=str, nargs='*', metavar='SEQA,SEQB',
+                    help="Pairs of sequences to align, or one pair per line of stdin if none is given.")
+parser.add_argument('--socket', type=str, default=AlignmentClient.DEFAULT_SOCKET, metavar='PATH',
+                    help="The Unix socket of the server.")
+parser.add_argument('--port', type=int, default=None,
+                    help="Connect to the server on this localhost TCP port instead of the Unix socket.")
+parser.add_argument('--score-only', action='store_true',
+                    help="Only compute the scores.")
+parser.add_argument('--threshold', type=float, default=None, metavar='T',
+                    help="Reject the pairs beyond this max distance or min similarity.")
+
+if __name__ == '__main__':
+
+    args = parser.parse_intermixed_args()
+    lines = args.pairs or sys.stdin.read().split()
+    with AlignmentClient(args.socket, port=args.port) as client:
+        for result in client.align([line.split(',') for line in lines], args.mode, args.score_only, args.threshold):
+            print(json.dumps(result))
@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+
+"""
+Contains the AlignmentServer class
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import stat
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from alignment_client import AlignmentClient
+from global_aligner_base import GlobalAlignerBase
+from global_distance_aligner import GlobalDistanceAligner
+from global_similarity_aligner import GlobalSimilarityAligner
+
+
+ALIGNERS = {'distance': GlobalDistanceAligner, 'similarity': GlobalSimilarityAligner}
+
+#=========================================================================
+
+# Align batches of pairs in the worker processes
+
+aligners = {}   # { mode: the warm aligner of this worker process }
+
+def init_worker(blosumPath, engine):
+    # Each worker reads the BLOSUM file once, then aligns every batch it is given
+    for mode, alignerClass in ALIGNERS.items():
+        aligners[mode] = alignerClass(blosumPath, engine=engine)
+
+def align_batch(mode, scoreOnly, threshold, pairs):
+    """
+    Aligns a batch of pairs with the worker's aligner of the mode, each query being
+    aligned against all of its targets with align_many / score_many
+    :return: the result of each pair, as a dict of the response fields
+    :rtype: list
+    """
+    aligner = aligners[mode]
+    aligner.threshold = threshold
+
+    queries = {}    # { query: indices of the pairs of the query }
+    for k, (seqA, _) in enumerate(pairs):
+        queries.setdefault(seqA, []).append(k)
+
+    results = [None] * len(pairs)
+    for query, indices in queries.items():
+        targets = [pairs[k][1] for k in indices]
+        try:
+            batch = aligner.score_many(query, targets) if scoreOnly else aligner.align_many(query, targets)
+        except ValueError:
+            batch = [None] * len(targets)   # find the pairs with unknown residues one by one
+            for t, target in enumerate(targets):
+                try:
+                    batch[t] = aligner.score(query, target) if scoreOnly else aligner.align(query, target)
+                except ValueError as e:
+                    batch[t] = e
+
+        for k, result in zip(indices, batch):
+            if isinstance(result, ValueError):
+                results[k] = {'error': str(result)}
+            elif result is None:
+                results[k] = {'rejected': True}
+            elif scoreOnly:
+                results[k] = {'score': result}
+            else:
+                results[k] = {'alignA': result[0], 'alignB': result[1], 'score': result[2]}
+    return results
+
+#=========================================================================
+
+# Serve the requests
+
+class AlignmentServer:
+    """
+    A long-running alignment service keeping warm aligners in a pool of worker
+    processes.  Clients send one JSON request per line:
+
+        {"id": 1, "mode": "distance", "pairs": [["SEQA", "SEQB"], ...],
+         "scoreOnly": false, "threshold": null}
+
+    and receive one JSON line per pair, in the order in which the pairs finish:
+
+        {"id": 1, "index": 0, "alignA": "...", "alignB": "...", "score": 42.5}
+
+    (or "score" alone, "rejected": true, or "error"), then {"id": 1, "done": true}.
+    Pairs of every connection are queued by mode, scoreOnly and threshold, and sent to
+    the workers in batches of up to batchSize pairs, or after batchDelay seconds
+    """
+
+    BATCH_SIZE = 64         # largest number of pairs sent to a worker at once
+    BATCH_DELAY = 0.005     # seconds waited for more pairs before sending a partial batch
+    LINE_LIMIT = 1 << 26    # longest request line accepted, in bytes
+
+    def __init__(self, blosumPath, engine=GlobalAlignerBase.PYTHON_ENGINE, jobs=None,
+                 batchSize=BATCH_SIZE, batchDelay=BATCH_DELAY):
+
+        self.batchSize = batchSize              # largest number of pairs sent to a worker at once
+        self.batchDelay = batchDelay            # seconds waited before sending a partial batch
+        self.jobs = jobs or os.cpu_count() or 1  # number of worker processes
+        self.pool = ProcessPoolExecutor(self.jobs, initializer=init_worker, initargs=(blosumPath, engine))
+
+        self._pending = {}      # { (mode, scoreOnly, threshold): [(seqA, seqB, future)] }
+        self._timers = {}       # { (mode, scoreOnly, threshold): timer sending a partial batch }
+
+
+    def warm_up(self):
+        """
+        Starts every worker process, so that the first requests do not wait for them to
+        read the BLOSUM file
+        """
+        for future in [self.pool.submit(align_batch, 'distance', True, None, [('A', 'A')]) for _ in range(self.jobs)]:
+            future.result()
+
+
+    async def serve(self, socketPath=AlignmentClient.DEFAULT_SOCKET, port=None):
+        """
+        Serves requests until cancelled, on a Unix socket, or on a localhost TCP port.
+        Raises a RuntimeError if the socket is in use by another server
+        :param socketPath: the path of the Unix socket
+        :param port: the TCP port, instead of the Unix socket
+        """
+        if port is None:
+            await self._remove_stale_socket(socketPath)
+            server = await asyncio.start_unix_server(self.handle, socketPath, limit=self.LINE_LIMIT)
+        else:
+            server = await asyncio.start_server(self.handle, '127.0.0.1', port, limit=self.LINE_LIMIT)
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if port is None and os.path.exists(socketPath):
+                os.remove(socketPath)
+
+
+    async def _remove_stale_socket(self, socketPath):
+        """
+        Removes the socket left behind by a server that is no longer running.  Raises a
+        RuntimeError if a server still answers on it, or if the path is not a socket
+        :param socketPath: the path of the Unix socket
+        """
+        try:
+            if not stat.S_ISSOCK(os.stat(socketPath).st_mode):
+                raise RuntimeError(f"{socketPath} exists and is not a socket")
+        except FileNotFoundError:
+            return
+
+        try:
+            _, writer = await asyncio.open_unix_connection(socketPath)
+        except ConnectionRefusedError:
+            os.remove(socketPath)
+            return
+        writer.close()
+        raise RuntimeError(f"Another server is already listening on {socketPath}")
+
+
+    async def handle(self, reader, writer):
+        """
+        Handles the requests of a connection, several requests being served together
+        """
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.ensure_future(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+
+    async def respond(self, line, writer):
+        """
+        Serves one request line, writing the result of each pair as soon as it finishes
+        """
+        requestId = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("a request must be a JSON object")
+            requestId = request.get('id')
+            key = self._request_key(request)
+            pairs = request['pairs']
+            if not isinstance(pairs, list) or not all(
+                    isinstance(pair, list) and len(pair) == 2 and all(isinstance(s, str) and s for s in pair)
+                    for pair in pairs):
+                raise ValueError("pairs must be a list of pairs of non-empty sequences")
+        except (ValueError, KeyError) as e:
+            self._write(writer, {'id': requestId, 'done': True, 'error': f"Invalid request: {e}"})
+            await writer.drain()
+            return
+
+        async def indexed(index, future):
+            return index, await future
+
+        futures = [indexed(index, self.submit(key, seqA, seqB)) for index, (seqA, seqB) in enumerate(pairs)]
+        for completed in asyncio.as_completed(futures):
+            index, result = await completed
+            self._write(writer, {'id': requestId, 'index': index, **result})
+            await writer.drain()
+        self._write(writer, {'id': requestId, 'done': True})
+        await writer.drain()
+
+
+    def _request_key(self, request):
+        """
+        Returns the batch queue of a request, the pairs of a batch sharing their aligner
+        settings
+        """
+        mode = request['mode']
+        if mode not in ALIGNERS:
+            raise ValueError(f"unknown mode '{mode}', expected one of {', '.join(ALIGNERS)}")
+        threshold = request.get('threshold')
+        if threshold is not None and not isinstance(threshold, (int, float)):
+            raise ValueError("threshold must be a number")
+        return mode, bool(request.get('scoreOnly', False)), threshold
+
+
+    def _write(self, writer, response):
+        writer.write(json.dumps(response).encode() + b'\n')
+
+
+    def submit(self, key, seqA, seqB):
+        """
+        Queues a pair, sending its queue to the workers once it holds batchSize pairs,
+        or batchDelay seconds after the first pair of the queue
+        :param key: the (mode, scoreOnly, threshold) of the pair
+        :return: a future of the pair's result
+        :rtype: asyncio.Future
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._pending.setdefault(key, [])
+        queue.append((seqA, seqB, future))
+
+        if len(queue) >= self.batchSize:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.batchDelay, self._flush, key)
+        return future
+
+
+    def _flush(self, key):
+        """
+        Sends the pairs queued under key to the workers, split into one chunk per worker
+        so that a lone request still keeps every worker busy
+        """
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        queue = self._pending.pop(key, [])
+
+        size = -(-len(queue) // self.jobs)
+        for start in range(0, len(queue), size or 1):
+            self._send(key, queue[start:start + size])
+
+
+    def _send(self, key, chunk):
+        """
+        Sends a chunk of queued pairs to a worker, resolving their futures once done
+        """
+        loop = asyncio.get_running_loop()
+        batch = loop.run_in_executor(self.pool, align_batch, *key, [(seqA, seqB) for seqA, seqB, _ in chunk])
+
+        def resolve(batch):
+            futures = [future for _, _, future in chunk]
+            if batch.cancelled() or batch.exception() is not None:
+                error = {'error': "The worker failed" if batch.cancelled() else f"The worker failed: {batch.exception()}"}
+                results = [error] * len(futures)
+            else:
+                results = batch.result()
+            for future, result in zip(futures, results):
+                if not future.done():
+                    future.set_result(result)
+        batch.add_done_callback(resolve)
+
+
+    def close(self):
+        """
+        Stops the worker processes
+        """
+        self.pool.shutdown(cancel_futures=True)
+
+#=========================================================================
+
+# Define our program arguments
+
+parser = argparse.ArgumentParser(description='Global Alignment Server')
+parser.add_argument('blosum_file', type=str,
+                    help="The path to the file containing the BLOSUM matrix and gap penalties.")
+parser.add_argument('--engine', type=str, choices=GlobalAlignerBase.ENGINES, default=GlobalAlignerBase.PYTHON_ENGINE,
+                    help="The DP engine used to compute the alignments (numpy requires NumPy).")
+parser.add_argument('--jobs', type=int, default=None, metavar='N',
+                    help="Number of worker processes (by default, the number of CPUs).")
+parser.add_argument('--socket', type=str, default=AlignmentClient.DEFAULT_SOCKET, metavar='PATH',
+                    help="The Unix socket to listen on.")
+parser.add_argument('--port', type=int, default=None,
+                    help="Listen on this localhost TCP port instead of the Unix socket.")
+parser.add_argument('--batch-size', type=int, default=AlignmentServer.BATCH_SIZE, metavar='N',
+                    help="Largest number of pairs sent to a worker at once.")
+parser.add_argument('--batch-delay', type=float, default=AlignmentServer.BATCH_DELAY, metavar='SECONDS',
+                    help="Time waited for more pairs before sending a partial batch to a worker.")
+
+#=========================================================================
+
+# Run the program
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+    if not os.path.exists(args.blosum_file):
+        parser.error("The file %s does not exist!" % args.blosum_file)
+
+    server = AlignmentServer(args.blosum_file, args.engine, args.jobs, args.batch_size, args.batch_delay)
+    server.warm_up()
+    where = f"port {args.port}" if args.port is not None else args.socket
+    print(f"Serving {args.engine} alignments on {where} with {server.jobs} workers", file=sys.stderr)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))     # remove the socket on termination too
+    try:
+        asyncio.run(server.serve(args.socket, args.port))
+    except RuntimeError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+"""
+Contains the AlignmentWriter class
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+import json                         # used by the JSON Lines format
+import sys
+from itertools import groupby       # used to run-length encode the CIGAR operations
+from global_aligner_base import GlobalAlignerBase
+
+
+class AlignmentWriter:
+    """
+    Streams the results of the aligned pairs to stdout or to a file, optionally gzip
+    compressed.  The text of the pairs is collected and written in bulk every
+    BUFFER_SIZE characters, instead of once per line or per column.  The formats are:
+
+        text    the alignments, a line of match symbols, and the score
+        jsonl   one JSON object per pair, with the ids, the alignments and the score
+        cigar   one tab separated line per pair: idA, idB, score and the CIGAR string
+                of the alignment ('=' match, 'X' mismatch, 'I' residue of B against a
+                gap, 'D' residue of A against a gap), with '*' for what is unknown
+    """
+
+    TEXT = "text"
+    JSONL = "jsonl"
+    CIGAR = "cigar"
+    FORMATS = (TEXT, JSONL, CIGAR)
+
+    MATCH_SYMBOL = '*'
+    MISMATCH_SYMBOL = '|'
+    GAP_SYMBOL = ' '
+
+    BUFFER_SIZE = 1 << 20               # characters collected before writing them
+
+    def __init__(self, path=None, format=TEXT, compress=False):
+
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown format '{format}', expected one of {', '.join(self.FORMATS)}")
+
+        self.format = format            # TEXT, JSONL or CIGAR
+        self.pairs = 0                  # number of pairs written
+
+        self._chunks = []               # text not written yet
+        self._size = 0                  # characters in _chunks
+
+        if path is None:
+            sys.stdout.flush()
+            self._file = None
+            self._stream = sys.stdout.buffer
+        else:
+            self._file = self._stream = open(path, 'wb')
+        self._gzip = None
+        if compress:
+            import gzip
+            self._gzip = self._stream = gzip.GzipFile(fileobj=self._stream, mode='wb')
+
+
+    def write(self, recordA, recordB, result, scoreOnly):
+        """
+        Writes the result of a pair
+        :param recordA: the (id, protein, species, sequence) record of the first sequence
+        :param recordB: the (id, protein, species, sequence) record of the second sequence
+        :param result: the alignment (alignA, alignB, score), the score if scoreOnly, or
+        None if the pair was rejected by a threshold
+        :param scoreOnly: whether the result is a score only
+        """
+        if self.format == self.JSONL:
+            text = self._jsonl(recordA, recordB, result, scoreOnly)
+        elif self.format == self.CIGAR:
+            text = self._cigar_line(recordA, recordB, result, scoreOnly)
+        else:
+            text = self._text(recordA, recordB, result, scoreOnly)
+
+        self._chunks.append(text)
+        self._size += len(text)
+        self.pairs += 1
+        if self._size >= self.BUFFER_SIZE:
+            self.flush()
+
+
+    def _text(self, recordA, recordB, result, scoreOnly):
+        _, proteinA, speciesA, _ = recordA
+        _, proteinB, speciesB, _ = recordB
+        header = f"Alignment of {proteinA} ({speciesA}) and {proteinB} ({speciesB})\n"
+
+        if result is None:
+            return header + "Rejected: beyond the score threshold\n\n"
+        if scoreOnly:
+            return header + f"Score:  {result}\n\n"
+
+        alignA, alignB, score = result
+        return header + f"{alignA}\n{self.symbols(alignA, alignB)}\n{alignB}\nScore:  {score}\n\n"
+
+
+    def _jsonl(self, recordA, recordB, result, scoreOnly):
+        fields = {'idA': recordA[0], 'idB': recordB[0]}
+        if result is None:
+            fields['rejected'] = True
+        elif scoreOnly:
+            fields['score'] = result
+        else:
+            fields['alignA'], fields['alignB'], fields['score'] = result
+        return json.dumps(fields) + '\n'
+
+
+    def _cigar_line(self, recordA, recordB, result, scoreOnly):
+        if result is None:
+            score, cigar = '*', '*'
+        elif scoreOnly:
+            score, cigar = result, '*'
+        else:
+            score, cigar = result[2], self.cigar(result[0], result[1])
+        return f"{recordA[0]}\t{recordB[0]}\t{score}\t{cigar}\n"
+
+
+    def symbols(self, alignA, alignB):
+        """
+        Returns the line of symbols showing the matches, mismatches and gaps of an alignment
+        :rtype: str
+        """
+        gap = GlobalAlignerBase.GAP_SYMBOL
+        return ''.join(self.MATCH_SYMBOL if x == y
+                       else self.GAP_SYMBOL if x == gap or y == gap
+                       else self.MISMATCH_SYMBOL
+                       for x, y in zip(alignA, alignB))
+
+
+    def cigar(self, alignA, alignB):
+        """
+        Returns the CIGAR string of an alignment, its columns run-length encoded as
+        '=' (match), 'X' (mismatch), 'I' (gap in alignA) and 'D' (gap in alignB)
+        :rtype: str
+        """
+        gap = GlobalAlignerBase.GAP_SYMBOL
+        operations = ('I' if x == gap else 'D' if y == gap else '=' if x == y else 'X'
+                      for x, y in zip(alignA, alignB))
+        return ''.join(f"{sum(1 for _ in run)}{operation}" for operation, run in groupby(operations))
+
+
+    def flush(self):
+        """
+        Writes the collected text
+        """
+        if self._chunks:
+            self._stream.write(''.join(self._chunks).encode())
+            self._chunks = []
+            self._size = 0
+
+
+    def close(self):
+        """
+        Writes the collected text and closes the output, leaving stdout open
+        """
+        self.flush()
+        if self._gzip is not None:
+            self._gzip.close()
+        if self._file is not None:
+            self._file.close()
+        else:
+            sys.stdout.buffer.flush()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exception):
+        self.close()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+
+"""
+Contains the BandedEngine class
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+class BandedEngine:
+    """
+    Computes the alignment of an aligner's sequences using only the cells within a band
+    around the diagonal, doubling the band until its result is provably optimal.  A
+    path leaving a band of half-width k needs at least |m - n| + 2k + 2 gap characters
+    in at least two gaps, which bounds its cost.  Once the banded score beats that bound
+    every optimal path lies in the band, and the banded traceback is exactly the one of
+    GlobalAlignerBase.align, ties included.  Similar sequences only cost O(k * n) cells
+    """
+
+    INITIAL_BAND = 16
+
+    def __init__(self, aligner, initialBand=INITIAL_BAND):
+
+        self.aligner = aligner          # the GlobalAlignerBase providing sequences and scores
+        self.initialBand = initialBand  # half-width of the first band tried
+        self.band = 0                   # half-width of the band of the last alignment
+
+
+    def align(self):
+        """
+        Compute the alignment of the aligner's seqX and seqY
+        :return: an aligned seqX, an aligned seqY, and the score
+        :rtype: tuple
+        """
+        score, pointers, low, high = self._fill_exact(True)
+
+        # Row i of the band holds columns i + low .. i + high, so cell (i, j) is at
+        # (i - 1) * (high - low + 1) + j - i - low = (i - 1) * (high - low) + (j - 1) - low,
+        # which is the layout of walk_pointers for a width of high - low, shifted by -low
+        return self.aligner.traceback_pointers(memoryview(pointers)[-low:], score, high - low)
+
+
+    def score(self):
+        """
+        Compute only the score of the alignment of the aligner's seqX and seqY
+        :return: the score of the optimal alignment
+        """
+        return self._fill_exact(False)[0]
+
+
+    def _fill_exact(self, keepPointers):
+        """
+        Fills bands of doubling half-width until the banded score is provably optimal
+        :param keepPointers: whether to record the traceback pointers of the band
+        :return: the score, the pointers (or None), and the lowest and highest diagonal
+        offsets (j - i) of the band
+        :rtype: tuple
+        """
+        aligner = self.aligner
+        height = len(aligner.seqY)
+        width = len(aligner.seqX)
+        delta = width - height
+        pairBounds = self._pair_bounds()
+
+        band = self.initialBand
+        while True:
+            low = max(min(0, delta) - band, -height)
+            high = min(max(0, delta) + band, width)
+            pointers = aligner.arena.pointers(height * (high - low + 1)) if keepPointers else None
+            score = self._fill_band(low, high, pointers)
+
+            if (low == -height and high == width) or self._is_optimal(score, band, pairBounds):
+                self.band = band
+                return score, pointers, low, high
+            band = max(2 * band, 1)
+
+
+    def _pair_bounds(self):
+        """
+        Bounds the total score of the aligned pairs of any alignment by their number.  A
+        pair scores no better than the best score of either of its residues against the
+        other sequence, so p pairs score no better than the p best such scores of the
+        residues of either sequence
+        :return: bounds[p] for p = 0 .. min(m, n) pairs
+        :rtype: list
+        """
+        aligner = self.aligner
+        better = aligner.compare_function
+        table = aligner.scoreTable
+        codesX = set(aligner.blosum.encode(aligner.seqX))
+        codesY = set(aligner.codesY)
+        bestOf = min if better(0, 1) else max
+
+        gainsX = {x: bestOf(table[x][y] for y in codesY) for x in codesX}
+        gainsY = {y: bestOf(table[x][y] for x in codesX) for y in codesY}
+        sortedX = sorted((gainsX[x] for x in aligner.blosum.encode(aligner.seqX)), reverse=not better(0, 1))
+        sortedY = sorted((gainsY[y] for y in aligner.codesY), reverse=not better(0, 1))
+
+        bounds = [0]
+        totalX = totalY = 0
+        for gainX, gainY in zip(sortedX, sortedY):
+            totalX += gainX
+            totalY += gainY
+            bounds.append(totalY if better(totalX, totalY) else totalX)    # the tighter one
+        return bounds
+
+
+    def _is_optimal(self, score, band, pairBounds):
+        """
+        Checks whether a banded score beats every path leaving the band.  Such a path has
+        at least minGaps = |m - n| + 2 * band + 2 gap characters split over at least two
+        gaps, and its other residues form (m + n - gaps) / 2 aligned pairs.  Its cost is
+        then at least 2 * gini + gaps * gext plus the bound of its pairs (see
+        _pair_bounds), for some number of gaps in [minGaps, m + n]
+        :param pairBounds: the bounds of _pair_bounds
+        :return: True if no path leaving the band can match the score
+        """
+        aligner = self.aligner
+        better = aligner.compare_function
+        gapInit = aligner.gapInitCost
+        gapExtend = aligner.gapExtendCost
+        length = len(aligner.seqX) + len(aligner.seqY)
+        minGaps = abs(len(aligner.seqX) - len(aligner.seqY)) + (2 * band) + 2
+
+        if minGaps > length:
+            return True
+        if better(gapInit, 0) or better(gapExtend, 0):
+            return False    # gaps are rewarded, so paths leaving the band cannot be bounded
+
+        bound = None
+        for pairs in range((length - minGaps) // 2 + 1):
+            cost = (2 * gapInit) + ((length - (2 * pairs)) * gapExtend) + pairBounds[pairs]
+            if bound is None or better(cost, bound):
+                bound = cost
+        return better(score, bound)
+
+
+    def _fill_band(self, low, high, pointers):
+        """
+        Runs the DP over the cells (i, j) with low <= j - i <= high, cells outside of the
+        band being worse than any other value
+        :param low: the lowest diagonal offset of the band
+        :param high: the highest diagonal offset of the band
+        :param pointers: a bytearray of len(seqY) rows of (high - low + 1) pointers, or None
+        :return: the score of cell (len(seqY), len(seqX))
+        """
+        aligner = self.aligner
+        better = aligner.compare_function
+        profile = aligner.profile
+        codesY = aligner.codesY
+        gapInit = aligner.gapInitCost
+        gapExtend = aligner.gapExtendCost
+        gapOpen = gapInit + gapExtend
+        width = len(aligner.seqX)
+        bandWidth = high - low + 1
+        worst = float('inf') if better(0, 1) else float('-inf')
+
+        # first row of A and D, within the band.  Buffers are indexed by column; a column
+        # right of the band has never been written, so it still holds the worst value
+        lastA = [worst] * (width + 1)
+        lastA[0] = 0
+        for j in range(1, high + 1):
+            lastA[j] = gapInit + (j * gapExtend)
+        lastD = [cost + gapInit for cost in lastA]
+        rowA = [worst] * (width + 1)
+        rowD = [worst] * (width + 1)
+
+        for i in range(1, len(aligner.seqY) + 1):
+            profileRow = profile[codesY[i - 1]]
+            first = max(1, i + low)
+            last = min(width, i + high)
+            offset = (i - 1) * bandWidth - i - low     # pointer index of column j is offset + j
+
+            # first column of A and I, or the worst value left of the band
+            if i + low <= 0:
+                costLeftA = gapInit + (i * gapExtend)
+                costLeftI = costLeftA + gapInit
+                rowA[0] = costLeftA
+            else:
+                costLeftA = worst
+                costLeftI = worst
+
+            for j in range(first, last + 1):
+                bits = 0
+
+                # min/max ( D(i-1,j) + gext,  A(i-1,j) + gini + gext)
+                costD = lastD[j] + gapExtend
+                costA = lastA[j] + gapOpen
+                if not better(costD, costA):
+                    costD = costA
+                    bits = aligner.DELETION_FROM_ALIGNMENT
+
+                # min/max ( I(i,j-1) + gext,  A(i,j-1) + gini + gext)
+                costI = costLeftI + gapExtend
+                costA = costLeftA + gapOpen
+                if not better(costI, costA):
+                    costI = costA
+                    bits |= aligner.INSERTION_FROM_ALIGNMENT
+
+                # min/max ( D(i,j),  I(i,j),  A(i-1,j-1) + score(ai, bj))
+                costA = lastA[j - 1] + profileRow[j]
+                if better(costA, costI):
+                    if better(costA, costD):
+                        costLeftA = costA
+                    else:
+                        costLeftA = costD
+                        bits |= aligner.A_FROM_DELETION
+                else:
+                    if better(costI, costD):
+                        costLeftA = costI
+                        bits |= aligner.A_FROM_INSERTION
+                    else:
+                        costLeftA = costD
+                        bits |= aligner.A_FROM_DELETION
+
+                rowA[j] = costLeftA
+                rowD[j] = costD
+                costLeftI = costI
+                if pointers is not None:
+                    pointers[offset + j] = bits
+
+            lastA, rowA = rowA, lastA
+            lastD, rowD = rowD, lastD
+
+        return lastA[width]
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+
+"""
+Benchmarks the aligners on reproducible synthetic protein pairs, reporting wall time,
+DP cells per second and peak memory for each engine, mode and operation as JSON
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor  # used to run each case in a fresh process
+from multiprocessing import get_context
+from global_aligner_base import GlobalAlignerBase
+from global_distance_aligner import GlobalDistanceAligner
+from global_similarity_aligner import GlobalSimilarityAligner
+
+try:
+    import resource
+except ImportError:  # not available on Windows, peak memory is then not reported
+    resource = None
+
+
+LENGTHS = [100, 300, 1000, 3000, 10000, 20000]
+ALIGNERS = {'distance': GlobalDistanceAligner, 'similarity': GlobalSimilarityAligner}
+OPERATIONS = ['align', 'score']
+KINDS = ['random', 'mutated']
+
+SUBSTITUTION_RATE = 0.15    # mutated pairs: probability of substituting a residue
+INDEL_RATE = 0.05           # mutated pairs: probability of inserting or deleting a residue
+
+#=========================================================================
+
+# Define our program arguments
+
+parser = argparse.ArgumentParser(description='Global Alignment Benchmark')
+parser.add_argument('blosum_file', type=str, nargs='?', default='input_files/blosum62.txt',
+                    help="The path to the file containing the BLOSUM matrix and gap penalties.")
+parser.add_argument('--lengths', type=int, nargs='+', default=LENGTHS, metavar='N',
+                    help="Lengths of the first sequence of each pair.")
+parser.add_argument('--engines', type=str, nargs='+', choices=GlobalAlignerBase.ENGINES,
+                    default=list(GlobalAlignerBase.ENGINES), help="Engines to benchmark.")
+parser.add_argument('--modes', type=str, nargs='+', choices=list(ALIGNERS), default=list(ALIGNERS),
+                    help="Alignment modes to benchmark.")
+parser.add_argument('--operations', type=str, nargs='+', choices=OPERATIONS, default=OPERATIONS,
+                    help="Operations to benchmark: full alignments and/or scores only.")
+parser.add_argument('--kinds', type=str, nargs='+', choices=KINDS, default=KINDS,
+                    help="Pairs of unrelated random sequences and/or of a sequence and a mutated copy.")
+parser.add_argument('--max-cells', type=int, default=100_000_000, metavar='CELLS',
+                    help="Skip the runs of the pure Python engines above this number of DP cells.")
+parser.add_argument('--repeat', type=int, default=1, metavar='N',
+                    help="Number of runs of each case, the fastest one being reported.")
+parser.add_argument('--seed', type=int, default=0,
+                    help="Seed of the generated sequences.")
+parser.add_argument('--output', type=str, default=None, metavar='PATH',
+                    help="Write the JSON report to this file instead of stdout.")
+
+#=========================================================================
+
+# Generate the sequences
+
+def random_sequence(rng, alphabet, length):
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+def mutated_sequence(rng, alphabet, sequence):
+    # Substitutes, deletes and inserts residues at SUBSTITUTION_RATE and INDEL_RATE
+    residues = []
+    for residue in sequence:
+        draw = rng.random()
+        if draw < INDEL_RATE / 2:
+            continue
+        if draw < INDEL_RATE:
+            residues.append(rng.choice(alphabet))
+        residues.append(rng.choice(alphabet) if rng.random() < SUBSTITUTION_RATE else residue)
+    return ''.join(residues)
+
+def make_pair(alphabet, kind, length, seed):
+    # Every case gets its own generator, so a pair does not depend on the other cases
+    rng = random.Random(f"{seed}/{kind}/{length}")
+    seqA = random_sequence(rng, alphabet, length)
+    if kind == 'random':
+        return seqA, random_sequence(rng, alphabet, length)
+    return seqA, mutated_sequence(rng, alphabet, seqA)
+
+#=========================================================================
+
+# Run the cases
+
+def peak_rss():
+    # Peak resident set size of this process in bytes (ru_maxrss is in kB on Linux)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def run_case(case):
+    """
+    Runs one case in a fresh worker process, so that the peak memory of the process
+    is the peak memory of the case.  Returns the fastest time of the case's runs
+    """
+    blosumFile, engine, mode, operation, seqA, seqB, repeat = case
+    aligner = ALIGNERS[mode](blosumFile, engine=engine)
+    run = aligner.align if operation == 'align' else aligner.score
+    run(seqA[:1], seqB[:1])     # import the lazily imported engines before timing
+
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(seqA, seqB)
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    return seconds, peak_rss()
+
+def run_benchmark(args):
+    blosum = ALIGNERS['distance'](args.blosum_file).blosum
+    alphabet = list(blosum.residueCodes)
+    results = []
+
+    # A single-use process per case, as peak memory cannot be reset within a process.
+    # Unlike the workers of a multiprocessing pool, it is not daemonic, so that the
+    # tiled engine can start its tile workers
+    with ProcessPoolExecutor(1, mp_context=get_context('spawn'), max_tasks_per_child=1) as pool:
+        for kind in args.kinds:
+            for length in args.lengths:
+                seqA, seqB = make_pair(alphabet, kind, length, args.seed)
+                cells = len(seqA) * len(seqB)
+                for engine in args.engines:
+                    for mode in args.modes:
+                        for operation in args.operations:
+                            result = {'engine': engine, 'mode': mode, 'operation': operation, 'kind': kind,
+                                      'lengthA': len(seqA), 'lengthB': len(seqB), 'cells': cells}
+                            if engine != GlobalAlignerBase.NUMPY_ENGINE and cells > args.max_cells:
+                                result['skipped'] = "above --max-cells"
+                                results.append(result)
+                                continue
+
+                            try:
+                                seconds, peak = pool.submit(run_case, (args.blosum_file, engine, mode, operation,
+                                                                       seqA, seqB, args.repeat)).result()
+                            except ImportError as e:
+                                result['skipped'] = str(e)
+                                results.append(result)
+                                continue
+
+                            result['seconds'] = seconds
+                            result['gcups'] = cells / seconds / 1e9
+                            result['peakRssBytes'] = peak
+                            results.append(result)
+                            print(f"{engine:8} {mode:10} {operation:5} {kind:7} {length:6}: "
+                                  f"{seconds:9.3f} s {result['gcups']:.4f} GCUPS", file=sys.stderr)
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': numpy_version(),
+        'seed': args.seed,
+        'blosum': blosum.type,
+        'fingerprint': blosum.fingerprint(),
+        'results': results,
+    }
+
+def numpy_version():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy.__version__
+
+#=========================================================================
+
+# Run the program
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+    report = run_benchmark(args)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
@@ -9,7 +9,10 @@ Contains the BlosumReader class.
 @Data: November 23rd, 2022
 """
 
+import marshal                 # used to store compiled matrices
+import os
 import re
+from hashlib import sha256     # used to fingerprint the matrix contents
 
 
 class BlosumReader:
@@ -18,6 +21,13 @@ class BlosumReader:
     a BLOSUM matrix, which is stored hash table for quick access
     """
 
+    COMPILED_VERSION = 1            # version of the compiled form, bumped when the fields change
+    COMPILED_SUFFIX = ".compiled"   # suffix of the compiled forms
+
+    # Directory of the compiled forms read_compiled writes by default
+    CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                             'global-alignment')
+
     def __init__(self):
 
         # Fields are populated by the read_file() method
@@ -28,6 +38,12 @@ class BlosumReader:
         self.gapInitCost = 0             # Gap initiation cost
         self.gapExtendCost = 0           # Gap extension cost
 
+        # Dense forms of the matrices, indexed by the residue codes produced by encode()
+        self.residueCodes = {}           # { LabelA: 0, LabelB: 1, ... }
+        self.similarityArray = []        # [ [Score, Score, ...], [...], ... ]
+        self.distanceArray = []          # [ [Score, Score, ...], [...], ... ]
+        self._encodingTable = {}         # str.translate() table from labels to code characters
+
 
     def _next_line(self, file):
         """
@@ -55,6 +71,70 @@ class BlosumReader:
             nextLine = self._read_similarity_matrix(f)
             self._fill_distance_matrix()
             self._read_gaps(f, nextLine)
+        self._fill_dense_arrays()
+
+
+    def read_compiled(self, path, cacheDir=CACHE_DIR):
+        """
+        Populates this object like read_file, but from a compiled form of the file read
+        with a single read, compiling it first if needed.  The compiled form is valid while
+        the file keeps its modification time and size; otherwise the file is hashed, and
+        only parsed again if its contents changed.  Failing to write the compiled form is
+        not an error, the file is then parsed on every call
+        :param path: a text file containing a BLOSUM matrix, as read by read_file
+        :param cacheDir: the directory of the compiled forms, or None to parse the file
+        without reading or writing a compiled form
+        """
+        if cacheDir is None:
+            self.read_file(path)
+            return
+
+        compiledPath = self.compiled_path(path, cacheDir)
+        status = os.stat(path)
+        stamp = (status.st_mtime_ns, status.st_size)
+
+        # A compiled form of another version, or missing a field, is compiled again
+        try:
+            with open(compiledPath, 'rb') as f:
+                compiled = marshal.loads(f.read())
+            if compiled['version'] != self.COMPILED_VERSION:
+                compiled = None
+            else:
+                compiledStamp, compiledDigest, fields = compiled['stamp'], compiled['digest'], compiled['fields']
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            compiled = None
+
+        if compiled is not None and compiledStamp == stamp:
+            self.__dict__.update(fields)
+            return
+
+        with open(path, 'rb') as f:
+            digest = sha256(f.read()).hexdigest()
+        if compiled is not None and compiledDigest == digest:
+            self.__dict__.update(fields)   # the file was touched, not changed
+        else:
+            self.read_file(path)
+
+        compiled = {'version': self.COMPILED_VERSION, 'stamp': stamp, 'digest': digest, 'fields': vars(self)}
+        temporaryPath = f"{compiledPath}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(compiledPath) or '.', exist_ok=True)
+            with open(temporaryPath, 'wb') as f:
+                f.write(marshal.dumps(compiled))
+            os.replace(temporaryPath, compiledPath)
+        except OSError:
+            pass
+
+
+    def compiled_path(self, path, cacheDir=CACHE_DIR):
+        """
+        Returns the path of the compiled form of a BLOSUM file
+        :param path: the path of the BLOSUM file
+        :param cacheDir: the directory of the compiled forms
+        :rtype: str
+        """
+        name = sha256(os.path.abspath(path).encode()).hexdigest()[:32]
+        return os.path.join(cacheDir, name + self.COMPILED_SUFFIX)
 
 
     def _read_headers(self, f):
@@ -122,6 +202,16 @@ class BlosumReader:
                     self._distanceMatrix[b][a] = distanceScore
 
 
+    def _fill_dense_arrays(self):
+        """
+        Populate the residue codes and the dense similarity and distance arrays
+        """
+        self.residueCodes = {header: code for code, header in enumerate(self._headers)}
+        self._encodingTable = str.maketrans({header: chr(code) for header, code in self.residueCodes.items()})
+        self.similarityArray = [[self._similarityMatrix[a][b] for b in self._headers] for a in self._headers]
+        self.distanceArray = [[self._distanceMatrix[a][b] for b in self._headers] for a in self._headers]
+
+
     def _read_gaps(self, f, firstLine):
         """
         Reads the gap initiation and gap extension costs from file f, and stores the
@@ -162,3 +252,28 @@ class BlosumReader:
         """
         return self._distanceMatrix[a][b]
 
+
+    def fingerprint(self):
+        """
+        Returns a digest of the matrix contents and gap costs, which changes whenever any
+        score does, but not with the layout of the file
+        :return: a hexadecimal SHA-256 digest
+        :rtype: str
+        """
+        contents = repr((self._headers, self.similarityArray, self.gapInitCost, self.gapExtendCost))
+        return sha256(contents.encode()).hexdigest()
+
+
+    def encode(self, sequence):
+        """
+        Encodes an amino acid sequence as the residue codes indexing similarityArray and distanceArray
+        :param sequence: a string of amino acids of the BLOSUM matrix
+        :return: the residue code of each amino acid of the sequence
+        :rtype: bytes
+        """
+        unknown = set(sequence).difference(self.residueCodes)
+        if unknown:
+            position = min(sequence.index(residue) for residue in unknown)
+            raise ValueError(f"Unknown residue '{sequence[position]}' at position {position + 1} of sequence; "
+                             f"the {self.type} matrix only defines {''.join(self._headers)}")
+        return sequence.translate(self._encodingTable).encode('latin-1')
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+"""
+Contains the BufferArena class
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+from sys import getsizeof   # used to measure the buffers
+
+
+class BufferArena:
+    """
+    Keeps the DP buffers of an aligner between alignments.  Buffers grow geometrically
+    to the size of the largest pair seen and are then reused, so repeated alignments
+    stop allocating matrices after warm-up.  A reused buffer keeps the values of the
+    previous alignment: only the cells inside the requested size are meaningful, and
+    the caller must write each of them before reading it
+    """
+
+    GROWTH = 1.5    # factor by which a buffer that is too small grows, at least
+
+    def __init__(self):
+
+        self._matrices = {}     # { name: list of rows, every row of the same length }
+        self._pointers = bytearray()
+
+
+    def matrix(self, name, height, width):
+        """
+        Returns the matrix buffer called name, with at least height rows of at least
+        width cells
+        :param name: the name of the matrix, such as one of the matrix symbols
+        :param height: the number of rows needed
+        :param width: the number of columns needed
+        :return: the matrix, as a list of rows
+        :rtype: list
+        """
+        rows = self._matrices.setdefault(name, [])
+        rowWidth = len(rows[0]) if rows else 0
+
+        if width > rowWidth:
+            rowWidth = max(width, int(rowWidth * self.GROWTH))
+            for row in rows:
+                row.extend([None] * (rowWidth - len(row)))
+
+        if height > len(rows):
+            rows.extend([None] * rowWidth for _ in range(max(height, int(len(rows) * self.GROWTH)) - len(rows)))
+
+        return rows
+
+
+    def pointers(self, size):
+        """
+        Returns the pointer buffer, of at least size bytes
+        :param size: the number of bytes needed
+        :return: the pointer buffer
+        :rtype: bytearray
+        """
+        if size > len(self._pointers):
+            self._pointers.extend(bytes(max(size, int(len(self._pointers) * self.GROWTH)) - len(self._pointers)))
+        return self._pointers
+
+
+    def size(self):
+        """
+        Returns the number of bytes held by the buffers, not counting the values in them
+        :rtype: int
+        """
+        size = getsizeof(self._pointers)
+        for rows in self._matrices.values():
+            size += getsizeof(rows) + sum(getsizeof(row) for row in rows)
+        return size
+
+
+    def release(self):
+        """
+        Frees every buffer, the next alignments allocating them again
+        """
+        self._matrices = {}
+        self._pointers = bytearray()
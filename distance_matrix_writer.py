@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+"""
+Contains the DistanceMatrixWriter class
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+import os                   # used to create the matrix file atomically
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only required by this writer
+    np = None
+
+
+class DistanceMatrixWriter:
+    """
+    Writes pairwise alignment scores into a memory-mapped .npy file, either as the
+    condensed upper triangle (the layout of scipy.spatial.distance.squareform) or as
+    the full symmetric matrix, diagonal included.  The sequence ids are written one per
+    line next to it.  Entries not written yet hold NaN, so a run reopening the same
+    file only needs to compute the missing entries
+    """
+
+    CONDENSED = "condensed"
+    SQUARE = "square"
+    LAYOUTS = (CONDENSED, SQUARE)
+
+    FLUSH_INTERVAL = 10_000     # number of writes between two flushes to disk
+
+    def __init__(self, path, ids, layout=CONDENSED):
+
+        if np is None:
+            raise ImportError("Writing a distance matrix requires NumPy to be installed")
+        if layout not in self.LAYOUTS:
+            raise ValueError(f"Unknown layout '{layout}', expected one of {', '.join(self.LAYOUTS)}")
+
+        self.path = path                        # path of the .npy file
+        self.idsPath = path + ".ids.txt"        # path of the sequence ids file
+        self.layout = layout                    # CONDENSED or SQUARE
+        self.count = len(ids)                   # number of sequences
+        self._unflushed = 0                     # writes since the last flush
+
+        if layout == self.CONDENSED:
+            shape = (self.count * (self.count - 1) // 2,)
+        else:
+            shape = (self.count, self.count)
+
+        if os.path.exists(path):
+            self.matrix = np.lib.format.open_memmap(path, mode='r+')
+            self._check_resume(ids, shape)
+        else:
+            # the ids first, so that a matrix file never exists without them
+            self._write_ids(ids)
+            self.matrix = self._create(shape)
+
+
+    def _write_ids(self, ids):
+        """
+        Writes the sequence ids file, under a temporary name first so that an interrupted
+        write never leaves a truncated list of ids
+        """
+        temporaryPath = self.idsPath + ".tmp"
+        with open(temporaryPath, 'w') as f:
+            f.writelines(identifier + '\n' for identifier in ids)
+        os.replace(temporaryPath, self.idsPath)
+
+
+    def _create(self, shape):
+        """
+        Creates the matrix file filled with NaN, under a temporary name first so that an
+        interrupted creation never leaves a matrix that looks filled
+        :return: the memory-mapped matrix
+        """
+        temporaryPath = self.path + ".tmp"
+        matrix = np.lib.format.open_memmap(temporaryPath, mode='w+', dtype=np.float64, shape=shape)
+        matrix.fill(np.nan)
+        matrix.flush()
+        del matrix
+        os.replace(temporaryPath, self.path)
+        return np.lib.format.open_memmap(self.path, mode='r+')
+
+
+    def _check_resume(self, ids, shape):
+        """
+        Checks that an existing matrix file belongs to the same sequences and layout
+        """
+        if not os.path.exists(self.idsPath):
+            raise ValueError(f"{self.path} has no sequence ids file {self.idsPath}, so it cannot be resumed; "
+                             "remove it or choose another path")
+        with open(self.idsPath) as f:
+            existingIds = f.read().splitlines()
+        if existingIds != list(ids) or self.matrix.shape != shape:
+            raise ValueError(f"{self.path} was written for other sequences or another layout; "
+                             "remove it or choose another path")
+
+
+    def entry(self, i, j):
+        """
+        Returns the position of the score of sequences i and j in the matrix
+        :param i: the index of a sequence
+        :param j: the index of another sequence, j > i in the condensed layout
+        :return: an index of the matrix
+        """
+        if self.layout == self.CONDENSED:
+            return self.count * i - (i * (i + 1)) // 2 + (j - i - 1)
+        return i, j
+
+
+    def pairs(self):
+        """
+        Returns the pairs of sequences stored by the layout: i < j in the condensed layout,
+        i <= j in the square layout
+        :rtype: list
+        """
+        first = 1 if self.layout == self.CONDENSED else 0
+        return [(i, j) for i in range(self.count) for j in range(i + first, self.count)]
+
+
+    def is_filled(self, i, j):
+        """
+        Checks whether the score of sequences i and j was already written
+        :rtype: bool
+        """
+        return not np.isnan(self.matrix[self.entry(i, j)])
+
+
+    def write(self, i, j, score):
+        """
+        Writes the score of sequences i and j (and of j and i in the square layout)
+        """
+        self.matrix[self.entry(i, j)] = score
+        if self.layout == self.SQUARE:
+            self.matrix[j, i] = score
+
+        self._unflushed += 1
+        if self._unflushed >= self.FLUSH_INTERVAL:
+            self.flush()
+
+
+    def flush(self):
+        """
+        Writes the pending entries to disk
+        """
+        self.matrix.flush()
+        self._unflushed = 0
@@ -10,7 +10,9 @@ Contains the GlobalAlignerBase class
 """
 
 
+from operator import add, itemgetter    # used to bound rows of the matrices at C speed
 from blosum_reader import BlosumReader  # used to read BLOSUM file
+from buffer_arena import BufferArena    # used to reuse the matrices across alignments
 
 
 class GlobalAlignerBase:
@@ -24,13 +26,51 @@ class GlobalAlignerBase:
     INSERTION_SYMBOL = "I"
     GAP_SYMBOL = '-'
 
-    def __init__(self, blosumPath):
+    # Available DP engines
+    PYTHON_ENGINE = "python"
+    COMPACT_ENGINE = "compact"
+    BANDED_ENGINE = "banded"
+    NUMPY_ENGINE = "numpy"
+    TILED_ENGINE = "tiled"
+    ENGINES = (PYTHON_ENGINE, COMPACT_ENGINE, BANDED_ENGINE, NUMPY_ENGINE, TILED_ENGINE)
+
+    # Default directory of the compiled BLOSUM files (see BlosumReader.read_compiled)
+    BLOSUM_CACHE_DIR = BlosumReader.CACHE_DIR
+
+    # Default number of DP cells above which align() switches to the linear space
+    # engine, per engine (tuple matrices take ~200 bytes per cell, pointers one byte).
+    # The tiled engine only keeps the pointers of one tile at a time
+    LINEAR_SPACE_THRESHOLDS = {PYTHON_ENGINE: 10_000_000, COMPACT_ENGINE: 400_000_000,
+                               BANDED_ENGINE: 400_000_000, NUMPY_ENGINE: 400_000_000,
+                               TILED_ENGINE: float('inf')}
+
+    # Plans of alignments under memoryLimit, besides the engines themselves
+    LINEAR_SPACE_PLAN = "linear-space"
+    SCORE_ONLY_PLAN = "score-only"
+
+    # Estimated bytes per DP cell of the tuple matrices and of the packed pointers, and
+    # per column of the rolling rows of scores, used to plan alignments under memoryLimit
+    TUPLE_CELL_BYTES = 250
+    POINTER_CELL_BYTES = 1
+    ROW_COLUMN_BYTES = 200
+
+    # Traceback pointer bits, one byte per cell.  A cleared bit means the
+    # origin is the "same matrix" (None in the tuple matrices)
+    A_FROM_INSERTION = 0x1
+    A_FROM_DELETION = 0x2
+    INSERTION_FROM_ALIGNMENT = 0x4
+    DELETION_FROM_ALIGNMENT = 0x8
+
+    def __init__(self, blosumPath, engine=PYTHON_ENGINE, linearSpaceThreshold=None, cacheDir=BLOSUM_CACHE_DIR):
+
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {', '.join(self.ENGINES)}")
 
         self.seqX = ""                  # horizontal sequence
         self.seqY = ""                  # vertical sequence
 
         self.blosum = BlosumReader()        # BLOSUM file reader
-        self.blosum.read_file(blosumPath)   # read BLOSUM file at path
+        self.blosum.read_compiled(blosumPath, cacheDir)     # read BLOSUM file at path, compiled in cacheDir
 
         self.gapInitCost = 0            # gap initiation cost
         self.gapExtendCost = 0          # gap extension cost
@@ -39,56 +79,741 @@ class GlobalAlignerBase:
         self.deletionMatrix = []        # alignment ends with deletion (D)
         self.insertionMatrix = []       # alignment ends with insertion (I)
 
+        self.arena = BufferArena()      # buffers of the matrices, reused across alignments
+        self.pointerMatrix = None       # packed A/D/I traceback pointers (compact engine)
+        self.alignmentScore = None      # score of the last alignment (compact engine)
+
         self.matrixHeight = 0           # height of each matrix
         self.matrixWidth = 0            # width of each matrix
 
         self.compare_function = None    # lt / gt
         self.score_function = None      # blosum.get_similarity_score / blosum.get_distance_score
+        self.scoreTable = None          # blosum.similarityArray / blosum.distanceArray
+
+        self.profile = []               # query profile of seqX (see profile_rows)
+        self.codesY = b""               # residue codes of seqY
+        self._profile = None            # cached query profile, by residue code (see profile_rows)
+        self._profileSequence = None    # sequence of the cached query profile
+
+        self.threshold = None           # worst accepted score (max distance / min similarity), if any
+        self._pairBonus = None          # best substitution score if better than 0, else 0
+
+        self.cache = None               # AlignmentCache checked by align() and score(), if any
+        self.stats = None               # AlignerStats instrumenting this aligner, if any
+        self._cacheScheme = None        # scoring scheme part of the cache keys
+
+        self.engine = engine            # name of the DP engine used by align()
+        self._wavefrontEngine = None    # lazily created WavefrontEngine
+        self._bandedEngine = None       # lazily created BandedEngine
+        self._tiledEngine = None        # lazily created TiledEngine
+        self.tileJobs = None            # worker processes of the tiled engine, all CPUs if None
+        self._prefixScanEngine = None   # lazily created PrefixScanEngine
+        self.memoryLimit = None         # bytes of DP buffers an alignment may take, if limited
+        self.memoryPlan = None          # (plan, estimated bytes) of the last pair under memoryLimit
+        self.prefixSharing = False      # whether align_many / score_many share the rows of target prefixes
+
+        # align() uses the linear space engine above this number of cells
+        if linearSpaceThreshold is None:
+            linearSpaceThreshold = self.LINEAR_SPACE_THRESHOLDS[engine]
+        self.linearSpaceThreshold = linearSpaceThreshold
 
 
     def align(self, seqA, seqB):
         """
         Compute the alignment of seqA and seqB.  Requires that compare_function,
-        score_function, gapInitCost, and gapExtend cost are set to a valid value
+        scoreTable, gapInitCost, and gapExtend cost are set to a valid value.  Raises
+        a ValueError if a sequence contains a residue missing from the BLOSUM matrix.
+        If threshold is set, returns None (rejected) as soon as the score is proven
+        to be worse than threshold
         :param seqA: an amino acid sequence
         :type seqA: str
         :param seqB: an amino acid sequence
         :type seqB: str
-        :return: an aligned seqA, an aligned seqB, and the score
+        :return: an aligned seqA, an aligned seqB, and the score, or None if rejected
         :rtype: tuple
         """
 
         if not seqA or not seqB:
-            return seqA, seqB
+            score = self.score(seqA, seqB)
+            if score is None:
+                return None
+            return seqA or self.GAP_SYMBOL * len(seqB), seqB or self.GAP_SYMBOL * len(seqA), score
+
+        if self.cache is not None:
+            key = self.cache_key(seqA, seqB)
+            result = self.cache.get_alignment(key)
+            if result is None:
+                result = self._align(seqA, seqB)
+                if result is not None:
+                    self.cache.put_alignment(key, result)
+            return None if result is None or self.rejects(result[2]) else result
+        return self._align(seqA, seqB)
+
+
+    def _align(self, seqA, seqB):
+        """
+        Compute the alignment of two non-empty sequences with the engine chosen by
+        memory_plan
+        :return: an aligned seqA, an aligned seqB, and the score, or None if rejected
+        :rtype: tuple
+        """
 
         self.seqX = seqA
         self.seqY = seqB
+        self.profile = self.profile_rows(seqA)
+        self.codesY = self.blosum.encode(seqB)
+
+        plan, estimate = self.memory_plan(len(seqA), len(seqB))
+        if self.memoryLimit is not None:
+            self.memoryPlan = (plan, estimate)
+
+        if plan == self.LINEAR_SPACE_PLAN:
+            from linear_space_engine import LinearSpaceEngine
+            result = LinearSpaceEngine(self).align()
+        elif plan == self.NUMPY_ENGINE:
+            result = self.wavefront_engine().align()
+        elif plan == self.BANDED_ENGINE:
+            result = self.banded_engine().align()
+        elif plan == self.TILED_ENGINE:
+            result = self.tiled_engine().align()
+        else:
+            self.init_matrices(plan == self.COMPACT_ENGINE)
+            if not self.compute_matrices():
+                return None
+            result = self.traceback_matrices()
+
+        # engines without early termination are checked once done
+        return None if result is None or self.rejects(result[2]) else result
+
+
+    def score(self, seqA, seqB):
+        """
+        Compute only the score of the alignment of seqA and seqB.  Keeps two rolling
+        rows per matrix instead of the full matrices and skips the traceback, so it
+        needs O(min(len(seqA), len(seqB))) memory.  If threshold is set, returns None
+        (rejected) as soon as the score is proven to be worse than threshold
+        :param seqA: an amino acid sequence
+        :type seqA: str
+        :param seqB: an amino acid sequence
+        :type seqB: str
+        :return: the score of the optimal alignment, or None if rejected
+        """
+
+        if not seqA or not seqB:
+            length = len(seqA) + len(seqB)
+            score = self.gapInitCost + (length * self.gapExtendCost) if length else 0
+            return None if self.rejects(score) else score
+
+        if self.cache is not None:
+            key = self.cache_key(seqA, seqB)
+            score = self.cache.get_score(key)
+            if score is None:
+                score = self._score(seqA, seqB)
+                if score is not None:
+                    self.cache.put_score(key, score)
+            return None if score is None or self.rejects(score) else score
+        return self._score(seqA, seqB)
+
+
+    def _score(self, seqA, seqB):
+        """
+        Compute only the score of the alignment of two non-empty sequences with the
+        selected engine
+        :return: the score of the optimal alignment
+        """
+
+        if self.memoryLimit is not None:
+            self.memoryPlan = self.memory_plan(len(seqA), len(seqB), True)
+
+        if self.engine == self.NUMPY_ENGINE:
+            return self.wavefront_engine().score(seqA, seqB)
+
+        if self.engine in (self.BANDED_ENGINE, self.TILED_ENGINE):
+            self.seqX = seqA
+            self.seqY = seqB
+            self.profile = self.profile_rows(seqA)
+            self.codesY = self.blosum.encode(seqB)
+            if self.engine == self.TILED_ENGINE:
+                score = self.tiled_engine().score()
+            else:
+                score = self.banded_engine().score()
+            return None if self.rejects(score) else score
+
+        # Keep the shorter sequence along the rows.  Swapping the sequences transposes
+        # the matrices, which swaps the roles of I and D (and their tie order) in A
+        swapped = len(seqA) > len(seqB)
+        seqX, seqY = (seqB, seqA) if swapped else (seqA, seqB)
+
+        profile = self.profile_rows(seqX)
+        codesY = self.blosum.encode(seqY)
+
+        better = self.compare_function
+        gapInit = self.gapInitCost
+        gapExtend = self.gapExtendCost
+        gapOpen = gapInit + gapExtend
+        width = len(seqX) + 1
+        ramp = self.threshold_ramp(profile, codesY, len(seqX))
+
+        # first row of A and D
+        lastA = [gapInit + (j * gapExtend) for j in range(width)]
+        lastA[0] = 0
+        lastD = [cost + gapInit for cost in lastA]
+        rowA = [None] * width
+        rowD = [None] * width
+
+        for i in range(1, len(seqY) + 1):
+            profileRow = profile[codesY[i - 1]]
+
+            # first column of A and I
+            leftA = gapInit + (i * gapExtend)
+            leftI = leftA + gapInit
+            rowA[0] = leftA
+
+            for j in range(1, width):
+
+                # min/max ( D(i-1,j) + gext,  A(i-1,j) + gini + gext)
+                costD = lastD[j] + gapExtend
+                costA = lastA[j] + gapOpen
+                costD = costD if better(costD, costA) else costA
+
+                # min/max ( I(i,j-1) + gext,  A(i,j-1) + gini + gext)
+                costI = leftI + gapExtend
+                costA = leftA + gapOpen
+                costI = costI if better(costI, costA) else costA
+
+                # min/max ( D(i,j),  I(i,j),  A(i-1,j-1) + score(ai, bj))
+                # BLOSUM matrices are symmetric, so the score does not depend on the swap
+                costA = lastA[j - 1] + profileRow[j]
+                if swapped:
+                    tieFirst, tieSecond = costI, costD
+                else:
+                    tieFirst, tieSecond = costD, costI
+
+                if better(costA, tieSecond):
+                    leftA = costA if better(costA, tieFirst) else tieFirst
+                else:
+                    leftA = tieSecond if better(tieSecond, tieFirst) else tieFirst
+
+                rowA[j] = leftA
+                rowD[j] = costD
+                leftI = costI
+
+            if ramp is not None and self.row_rejects(ramp, i, len(seqY), rowA):
+                return None
+            lastA, rowA = rowA, lastA
+            lastD, rowD = rowD, lastD
+
+        return None if self.rejects(lastA[width - 1]) else lastA[width - 1]
+
+
+    def rejects(self, score):
+        """
+        Checks whether a score is worse than threshold
+        :param score: the score of an alignment
+        :return: True if threshold is set and the score is worse than it
+        :rtype: bool
+        """
+
+        return self.threshold is not None and self.compare_function(self.threshold, score)
+
+
+    def threshold_bonus(self):
+        """
+        Returns the best substitution score if it is better than 0, or else 0, which is
+        the most that an aligned pair can improve a score by
+        :return: the bonus, or None if there is no threshold or if gaps are rewarded, as
+        the rest of a path can then not be bounded
+        """
+
+        better = self.compare_function
+        if self.threshold is None or better(self.gapInitCost, 0) or better(self.gapExtendCost, 0):
+            return None
+
+        if self._pairBonus is None:
+            self._pairBonus = 0
+            for row in self.scoreTable:
+                for pairScore in row:
+                    if better(pairScore, self._pairBonus):
+                        self._pairBonus = pairScore
+        return self._pairBonus
+
+
+    def threshold_ramp(self, profile, codesY, width):
+        """
+        Prepares the row bounds of row_rejects for the alignment of a horizontal sequence
+        of the given width and query profile, and of the vertical sequence codesY.  Once
+        the path to cell (i, j) is known, the rest of the path still needs at least
+        |(height - i) - (width - j)| gap characters, and at most one aligned pair per row
+        left, none improving the score by more than the best score of the row's residue
+        against the horizontal sequence (or 0).  ramp[r + j] is the gap part of that bound
+        for the cells (i, j) of the rows with r = height - i rows left, and pairs[r] the
+        pair part
+        :return: the (ramp, pairs) bounds, or None if the threshold cannot be checked (see
+        threshold_bonus)
+        :rtype: tuple
+        """
+
+        if self.threshold_bonus() is None:
+            return None
+
+        bestOf = min if self.compare_function(0, 1) else max
+        gains = {code: bestOf(0, bestOf(profile[code][1:width + 1])) for code in set(codesY)}
+        height = len(codesY)
+        pairs = [0] * (height + 1)
+        for r in range(1, height + 1):
+            pairs[r] = pairs[r - 1] + gains[codesY[height - r]]
+
+        ramp = [abs(k - width) * self.gapExtendCost for k in range(height + width + 1)]
+        return ramp, pairs
+
+
+    def row_rejects(self, bounds, i, height, rowA):
+        """
+        Checks whether the A values of row i prove the score worse than threshold.  Every
+        path to the last cell goes through row i, and A holds the best value of any path
+        to each cell, so the score can be no better than the best over the row of A plus
+        the bound of the rest of the path (see threshold_ramp)
+        :param bounds: the (ramp, pairs) bounds of threshold_ramp
+        :param i: the row
+        :param height: the last row
+        :param rowA: the A values of row i, from column 0
+        :return: True if the alignment can be rejected
+        :rtype: bool
+        """
+
+        ramp, pairs = bounds
+        remaining = height - i
+        # the ramp slice ends at the last column, so rowA is never read past it
+        rowBounds = map(add, ramp[remaining:remaining + len(ramp) - height], rowA)
+        best = min(rowBounds) if self.compare_function(0, 1) else max(rowBounds)
+        return self.compare_function(self.threshold, best + pairs[remaining])
+
+
+    def diagonal_is_optimal(self):
+        """
+        Checks whether aligning a sequence with itself without gaps is always the only
+        optimal alignment, so that identical_alignment returns exactly the result of
+        align.  It is when gaps always cost something, no residue scores worse than 0
+        against itself, and s(a, b) is never better than (s(a, a) + s(b, b)) / 2: any
+        other alignment has a gap, and its aligned pairs score no better than half of
+        the diagonal scores of both of their residues
+        :rtype: bool
+        """
+
+        better = self.compare_function
+        table = self.scoreTable
+        if not better(0, self.gapInitCost + self.gapExtendCost) or better(self.gapExtendCost, 0):
+            return False
+
+        for a, row in enumerate(table):
+            if better(0, row[a]):
+                return False
+            for b, pairScore in enumerate(row):
+                if better(2 * pairScore, row[a] + table[b][b]):
+                    return False
+        return True
+
+
+    def identical_alignment(self, sequence):
+        """
+        Compute the alignment of a non-empty sequence with itself in O(n), without any
+        DP.  Only equal to align(sequence, sequence) if diagonal_is_optimal, the score
+        being summed in the order, and with the types, of the DP
+        :param sequence: an amino acid sequence
+        :type sequence: str
+        :return: the sequence twice and the score, or None if rejected
+        :rtype: tuple
+        """
+
+        table = self.scoreTable
+        score = 0
+        for code in self.blosum.encode(sequence):
+            score += table[code][code]
+        return None if self.rejects(score) else (sequence, sequence, score)
+
+
+    def memory_estimate(self, plan, lengthA, lengthB):
+        """
+        Estimates the bytes of DP buffers taken by the alignment of two sequences.  The
+        buffers kept in the arena may have grown by up to BufferArena.GROWTH times what
+        the pair needs, when a smaller pair grew them before it
+        :param plan: an engine, LINEAR_SPACE_PLAN or SCORE_ONLY_PLAN
+        :param lengthA: the length of the first sequence
+        :param lengthB: the length of the second sequence
+        :return: the estimated bytes
+        :rtype: int
+        """
+
+        cells = lengthA * lengthB
+        rows = (lengthA + lengthB + 2) * self.ROW_COLUMN_BYTES
+        if plan == self.PYTHON_ENGINE:
+            return int((lengthA + 1) * (lengthB + 1) * self.TUPLE_CELL_BYTES * BufferArena.GROWTH)
+        if plan == self.SCORE_ONLY_PLAN:
+            return (min(lengthA, lengthB) + 1) * self.ROW_COLUMN_BYTES
+        if plan == self.LINEAR_SPACE_PLAN:
+            from linear_space_engine import LinearSpaceEngine
+            return min(cells, LinearSpaceEngine.BLOCK_CELLS) * self.POINTER_CELL_BYTES + rows
+        if plan == self.TILED_ENGINE:
+            # the traceback refills one tile at a time, of at most 1/16 of the cells
+            return (cells // 16) * self.POINTER_CELL_BYTES + rows
+        return int(cells * self.POINTER_CELL_BYTES * BufferArena.GROWTH) + rows
+
+
+    def memory_plan(self, lengthA, lengthB, scoreOnly=False):
+        """
+        Chooses how to align two sequences: with the selected engine, unless the pair is
+        above linearSpaceThreshold, and under memoryLimit with the first of the selected
+        engine, the compact engine and the linear space engine whose estimate fits
+        (the linear space engine if none does).  Scores are always computed in rolling rows
+        :param lengthA: the length of the first sequence
+        :param lengthB: the length of the second sequence
+        :param scoreOnly: whether only the score is computed
+        :return: the plan (an engine, LINEAR_SPACE_PLAN or SCORE_ONLY_PLAN) and its estimate
+        :rtype: tuple
+        """
+
+        if scoreOnly:
+            plan = self.SCORE_ONLY_PLAN
+            return plan, self.memory_estimate(plan, lengthA, lengthB)
+
+        plans = [self.engine, self.COMPACT_ENGINE, self.LINEAR_SPACE_PLAN]
+        if (lengthA + 1) * (lengthB + 1) > self.linearSpaceThreshold:
+            plans = [self.LINEAR_SPACE_PLAN]
+        if self.memoryLimit is None:
+            plans = plans[:1]
+
+        for plan in plans:
+            estimate = self.memory_estimate(plan, lengthA, lengthB)
+            if self.memoryLimit is None or estimate <= self.memoryLimit:
+                break
+        return plan, estimate
+
+
+    def align_many(self, query, targets):
+        """
+        Compute the alignments of a query against many targets.  With prefixSharing, the
+        targets share the DP rows of their common prefixes (see PrefixScanEngine); otherwise
+        the numpy engine aligns batches of targets of similar lengths together, and the
+        other engines align each pair.  Under memoryLimit, each pair is planned and aligned
+        on its own
+        :param query: an amino acid sequence
+        :type query: str
+        :param targets: amino acid sequences
+        :type targets: list
+        :return: the result of align(query, target) for each target
+        :rtype: list
+        """
+
+        if self.memoryLimit is not None:
+            return [self.align(query, target) for target in targets]
+        if self.prefixSharing and query:
+            if self.cache is None:
+                return self.prefix_scan_engine().align_many(query, targets)
+            return self._cached_many(query, targets, self.cache.get_alignment, self.cache.put_alignment,
+                                     self.prefix_scan_engine().align_many, lambda result: result[2])
+        if self.engine == self.NUMPY_ENGINE and query:
+            if self.cache is None:
+                return self.wavefront_engine().align_many(query, targets)
+            return self._cached_many(query, targets, self.cache.get_alignment, self.cache.put_alignment,
+                                     self.wavefront_engine().align_many, lambda result: result[2])
+        return [self.align(query, target) for target in targets]
+
+
+    def score_many(self, query, targets):
+        """
+        Compute only the scores of the alignments of a query against many targets.  With
+        prefixSharing, the targets share the DP rows of their common prefixes; otherwise
+        the numpy engine scores batches of targets of similar lengths together.  Under
+        memoryLimit, each pair is scored on its own
+        :param query: an amino acid sequence
+        :type query: str
+        :param targets: amino acid sequences
+        :type targets: list
+        :return: the result of score(query, target) for each target
+        :rtype: list
+        """
+
+        if self.memoryLimit is not None:
+            return [self.score(query, target) for target in targets]
+        if self.prefixSharing and query:
+            if self.cache is None:
+                return self.prefix_scan_engine().score_many(query, targets)
+            return self._cached_many(query, targets, self.cache.get_score, self.cache.put_score,
+                                     self.prefix_scan_engine().score_many, lambda score: score)
+        if self.engine == self.NUMPY_ENGINE and query:
+            if self.cache is None:
+                return self.wavefront_engine().score_many(query, targets)
+            return self._cached_many(query, targets, self.cache.get_score, self.cache.put_score,
+                                     self.wavefront_engine().score_many, lambda score: score)
+        return [self.score(query, target) for target in targets]
 
-        self.init_matrices()
-        self.compute_matrices()
-        result = self.traceback_matrices()
-        return result
 
+    def _cached_many(self, query, targets, get, put, computeMany, scoreOf):
+        """
+        Looks up the results of a query against many targets in the cache, and computes
+        the missing ones together
+        :param get: looks up a result by key
+        :param put: stores a result by key
+        :param computeMany: computes the results of the query against a list of targets
+        :param scoreOf: returns the score of a result
+        :return: the result for each target
+        :rtype: list
+        """
+
+        keys = [self.cache_key(query, target) if target else None for target in targets]
+        results = [None if key is None else get(key) for key in keys]
+
+        # cached results were stored regardless of this aligner's threshold, whereas
+        # computed ones are already checked against it
+        missing = []
+        for k, result in enumerate(results):
+            if result is None:
+                missing.append(k)
+            elif self.rejects(scoreOf(result)):
+                results[k] = None
+
+        for k, result in zip(missing, computeMany(query, [targets[k] for k in missing])):
+            if keys[k] is not None and result is not None:
+                put(keys[k], result)
+            results[k] = result
+        return results
+
+
+    def cache_key(self, seqA, seqB):
+        """
+        Builds the cache key of the alignment of seqA and seqB, from the mode, the BLOSUM
+        matrix contents and the gap costs of this aligner
+        :return: a key of the cache
+        :rtype: str
+        """
+
+        if self._cacheScheme is None:
+            self._cacheScheme = '/'.join((type(self).__name__, self.blosum.fingerprint(),
+                                          repr(self.gapInitCost), repr(self.gapExtendCost)))
+        return self.cache.key(self._cacheScheme, seqA, seqB)
+
+
+    def profile_rows(self, sequence):
+        """
+        Computes the query profile of a horizontal sequence: for every residue code c, the
+        scores of each residue of the sequence against c, so that the score of column j of
+        the matrices against residue c is profile[c][j].  The last profile is cached, as
+        consecutive alignments often share their first sequence
+        :param sequence: an amino acid sequence
+        :type sequence: str
+        :return: the query profile, one row per residue code
+        :rtype: list
+        """
+
+        if sequence != self._profileSequence:
+            rows = [self.scoreTable[code] for code in self.blosum.encode(sequence)]
+            self._profile = [[None] + [row[c] for row in rows] for c in range(len(self.scoreTable))]
+            self._profileSequence = sequence
+        return self._profile
 
-    def init_matrices(self):
+
+    def fill_block(self, r0, c0, r1, c1, topA, topD, leftA, leftI, pointers=None, ramp=None):
         """
-        Initialize the three matrices
+        Populate rows r0+1..r1 and columns c0+1..c1 of the three matrices from the values
+        of row r0 and column c0, keeping a single rolling row of values.  Only the values
+        read by the recurrences are needed: A and D above the block, A and I left of it
+        :param r0: the row above the block
+        :param c0: the column left of the block
+        :param r1: the last row of the block
+        :param c1: the last column of the block
+        :param topA: the A values of row r0, columns c0..c1
+        :param topD: the D values of row r0, columns c0..c1
+        :param leftA: the A values of column c0, rows r0..r1
+        :param leftI: the I values of column c0, rows r0..r1
+        :param pointers: a bytearray of (r1 - r0) * (c1 - c0) bytes receiving the traceback
+        pointers of the block (see walk_pointers), or None to only compute the values
+        :param ramp: for a block of the whole matrix, the threshold_ramp used to stop as soon
+        as the threshold rejects the alignment, or None
+        :return: the A and D values of row r1 (columns c0..c1), and the A and I values of
+        column c1 (rows r0..r1), or None if rejected.  Values outside the block that are
+        not given are None
+        :rtype: tuple
+        """
+
+        better = self.compare_function
+        profile = self.profile
+        gapInit = self.gapInitCost
+        gapExtend = self.gapExtendCost
+        gapOpen = gapInit + gapExtend
+        width = c1 - c0
+
+        lastA = list(topA)
+        lastD = list(topD)
+        rowA = [None] * (width + 1)
+        rowD = [None] * (width + 1)
+        rightA = [lastA[width]]
+        rightI = [leftI[0] if width == 0 else None]
+
+        for i in range(r0 + 1, r1 + 1):
+            profileRow = profile[self.codesY[i - 1]]
+            offset = (i - r0 - 1) * width - 1     # pointer index of column c0 + k is offset + k
+
+            # column c0
+            costLeftA = leftA[i - r0]
+            costLeftI = leftI[i - r0]
+            rowA[0] = costLeftA
+
+            for k in range(1, width + 1):
+                bits = 0
+
+                # min/max ( D(i-1,j) + gext,  A(i-1,j) + gini + gext)
+                costD = lastD[k] + gapExtend
+                costA = lastA[k] + gapOpen
+                if not better(costD, costA):
+                    costD = costA
+                    bits = self.DELETION_FROM_ALIGNMENT
+
+                # min/max ( I(i,j-1) + gext,  A(i,j-1) + gini + gext)
+                costI = costLeftI + gapExtend
+                costA = costLeftA + gapOpen
+                if not better(costI, costA):
+                    costI = costA
+                    bits |= self.INSERTION_FROM_ALIGNMENT
+
+                # min/max ( D(i,j),  I(i,j),  A(i-1,j-1) + score(ai, bj))
+                costA = lastA[k - 1] + profileRow[c0 + k]
+                if better(costA, costI):
+                    if better(costA, costD):
+                        costLeftA = costA
+                    else:
+                        costLeftA = costD
+                        bits |= self.A_FROM_DELETION
+                else:
+                    if better(costI, costD):
+                        costLeftA = costI
+                        bits |= self.A_FROM_INSERTION
+                    else:
+                        costLeftA = costD
+                        bits |= self.A_FROM_DELETION
+
+                rowA[k] = costLeftA
+                rowD[k] = costD
+                costLeftI = costI
+                if pointers is not None:
+                    pointers[offset + k] = bits
+
+            if ramp is not None and self.row_rejects(ramp, i, r1, rowA):
+                return None
+            rightA.append(costLeftA)
+            rightI.append(costLeftI)
+            rowD[0] = None
+            lastA, rowA = rowA, lastA
+            lastD, rowD = rowD, lastD
+
+        return lastA, lastD, rightA, rightI
+
+
+    def wavefront_engine(self):
+        """
+        Returns the NumPy anti-diagonal engine bound to this aligner, creating it on first use
+        :return: the WavefrontEngine of this aligner
+        :rtype: WavefrontEngine
+        """
+        if self._wavefrontEngine is None:
+            from wavefront_engine import WavefrontEngine    # imported lazily, requires NumPy
+            self._wavefrontEngine = WavefrontEngine(self)
+        return self._wavefrontEngine
+
+
+    def banded_engine(self):
+        """
+        Returns the banded engine bound to this aligner, creating it on first use
+        :return: the BandedEngine of this aligner
+        :rtype: BandedEngine
+        """
+        if self._bandedEngine is None:
+            from banded_engine import BandedEngine
+            self._bandedEngine = BandedEngine(self)
+        return self._bandedEngine
+
+
+    def tiled_engine(self):
+        """
+        Returns the tiled parallel engine bound to this aligner, creating it on first use
+        with tileJobs worker processes
+        :return: the TiledEngine of this aligner
+        :rtype: TiledEngine
+        """
+        if self._tiledEngine is None:
+            from tiled_engine import TiledEngine
+            self._tiledEngine = TiledEngine(self, self.tileJobs)
+        return self._tiledEngine
+
+
+    def prefix_scan_engine(self):
+        """
+        Returns the prefix sharing engine of align_many and score_many bound to this
+        aligner, creating it on first use
+        :return: the PrefixScanEngine of this aligner
+        :rtype: PrefixScanEngine
+        """
+        if self._prefixScanEngine is None:
+            from prefix_scan_engine import PrefixScanEngine
+            self._prefixScanEngine = PrefixScanEngine(self)
+        return self._prefixScanEngine
+
+
+    def init_matrices(self, compact=None):
+        """
+        Initialize the three matrices.  Their buffers come from the arena and are reused
+        across alignments, so they may be larger than matrixHeight x matrixWidth, the
+        cells outside of it holding values of previous alignments
+        :param compact: whether to only keep the packed pointers (see init_pointer_matrix),
+        by default with the compact engine
         """
         self.matrixWidth = len(self.seqX) + 1
         self.matrixHeight = len(self.seqY) + 1
 
+        if compact is None:
+            compact = self.engine == self.COMPACT_ENGINE
+        if compact:
+            self.init_pointer_matrix()
+            return
+
+        self.pointerMatrix = None
         self.init_alignment_matrix()
         self.init_insertion_matrix()
         self.init_deletion_matrix()
 
 
+    def release(self):
+        """
+        Frees the matrices kept between alignments, shrinking the memory of the aligner
+        back to its size before the first alignment
+        """
+
+        self.arena.release()
+        self.alignmentMatrix = []
+        self.insertionMatrix = []
+        self.deletionMatrix = []
+        self.pointerMatrix = None
+
+
+    def init_pointer_matrix(self):
+        """
+        Initialize the packed pointer matrix, which holds the traceback pointers of all three
+        matrices in one byte per cell (see walk_pointers).  The scores themselves are only kept
+        for the current and previous rows while computing the matrices
+        """
+
+        self.alignmentMatrix = []
+        self.insertionMatrix = []
+        self.deletionMatrix = []
+        self.pointerMatrix = self.arena.pointers((self.matrixHeight - 1) * (self.matrixWidth - 1))
+
+
     def init_alignment_matrix(self):
         """
-        Initialize the alignment matrix (A) by allocating space for the matrix and setting
-        the values for the first row and the first column
+        Initialize the alignment matrix (A) by taking space for the matrix from the arena
+        and setting the values for the first row and the first column
         """
 
-        self.alignmentMatrix = [[None for j in range(self.matrixWidth)] for i in range(self.matrixHeight)]
+        self.alignmentMatrix = self.arena.matrix(self.ALIGNMENT_SYMBOL, self.matrixHeight, self.matrixWidth)
         self.alignmentMatrix[0][0] = (0, None)
 
         for i in range(1, self.matrixHeight):
@@ -100,11 +825,11 @@ class GlobalAlignerBase:
 
     def init_insertion_matrix(self):
         """
-        Initialize the insertion matrix (I) by allocating space for the matrix, and setting
-        the values of the first column
+        Initialize the insertion matrix (I) by taking space for the matrix from the arena,
+        and setting the values of the first column
         """
 
-        self.insertionMatrix = [[None for j in range(self.matrixWidth)] for i in range(self.matrixHeight)]
+        self.insertionMatrix = self.arena.matrix(self.INSERTION_SYMBOL, self.matrixHeight, self.matrixWidth)
 
         for i in range(self.matrixHeight):
             self.insertionMatrix[i][0] = (self.alignmentMatrix[i][0][0] + self.gapInitCost, None)
@@ -112,11 +837,11 @@ class GlobalAlignerBase:
 
     def init_deletion_matrix(self):
         """
-        Initialize the deletion matrix (D) by allocating space for the matrix, and setting
-        the values of the first row
+        Initialize the deletion matrix (D) by taking space for the matrix from the arena,
+        and setting the values of the first row
         """
 
-        self.deletionMatrix = [[None for j in range(self.matrixWidth)] for i in range(self.matrixHeight)]
+        self.deletionMatrix = self.arena.matrix(self.DELETION_SYMBOL, self.matrixHeight, self.matrixWidth)
 
         for j in range(self.matrixWidth):
             self.deletionMatrix[0][j] = (self.alignmentMatrix[0][j][0] + self.gapInitCost, None)
@@ -126,9 +851,16 @@ class GlobalAlignerBase:
         """
         Populate the three matrices using the affine indel gap model global sequence
         alignment algorithm
+        :return: False if the threshold rejected the alignment before the last row
+        :rtype: bool
         """
 
+        if self.pointerMatrix is not None:
+            return self.compute_pointer_matrix()
+
+        ramp = self.threshold_ramp(self.profile, self.codesY, self.matrixWidth - 1)
         for i in range(1, self.matrixHeight):
+            profileRow = self.profile[self.codesY[i - 1]]
             for j in range(1, self.matrixWidth):
 
                 # min/max ( D(i-1,j) + gext,  A(i-1,j) + gini + gext)
@@ -142,7 +874,7 @@ class GlobalAlignerBase:
                 self.insertionMatrix[i][j] = (costI, None) if self.compare_function(costI, costA) else (costA, self.ALIGNMENT_SYMBOL)
 
                 # min/max ( D(i,j),  I(i,j),  A(i-1,j-1) + score(ai, bj))
-                matchScore = self.score_function(self.seqX[j - 1], self.seqY[i - 1])
+                matchScore = profileRow[j]
                 costA = self.alignmentMatrix[i - 1][j - 1][0] + matchScore
                 costI = self.insertionMatrix[i][j][0]
                 costD = self.deletionMatrix[i][j][0]
@@ -152,6 +884,34 @@ class GlobalAlignerBase:
                 else:
                     self.alignmentMatrix[i][j] = (costI, self.INSERTION_SYMBOL) if self.compare_function(costI, costD) else (costD, self.DELETION_SYMBOL)
 
+            if ramp is not None and self.row_rejects(ramp, i, self.matrixHeight - 1,
+                                                     map(itemgetter(0), self.alignmentMatrix[i])):
+                return False
+
+        return True
+
+    def compute_pointer_matrix(self):
+        """
+        Populate the packed pointer matrix, keeping rolling rows of scores
+        :return: False if the threshold rejected the alignment before the last row
+        :rtype: bool
+        """
+
+        gapInit = self.gapInitCost
+        gapExtend = self.gapExtendCost
+        topA = [0] + [gapInit + (j * gapExtend) for j in range(1, self.matrixWidth)]
+        leftA = [0] + [gapInit + (i * gapExtend) for i in range(1, self.matrixHeight)]
+
+        rows = self.fill_block(0, 0, self.matrixHeight - 1, self.matrixWidth - 1,
+                               topA, [cost + gapInit for cost in topA],
+                               leftA, [cost + gapInit for cost in leftA], self.pointerMatrix,
+                               self.threshold_ramp(self.profile, self.codesY, self.matrixWidth - 1))
+        if rows is None:
+            return False
+        self.alignmentScore = rows[0][self.matrixWidth - 1]
+        return True
+
+
     def traceback_matrices(self):
         """
         Traceback the three matrices in order to compute the alignment
@@ -159,6 +919,9 @@ class GlobalAlignerBase:
         :rtype: tuple
         """
 
+        if self.pointerMatrix is not None:
+            return self.traceback_pointers(self.pointerMatrix, self.alignmentScore)
+
         i = self.matrixHeight - 1
         j = self.matrixWidth - 1
         prevMatrix = self.ALIGNMENT_SYMBOL
@@ -209,6 +972,92 @@ class GlobalAlignerBase:
                 alignY.append(self.seqY[i - 1])
                 i -= 1
 
+        score = self.alignmentMatrix[self.matrixHeight - 1][self.matrixWidth - 1][0]
+        return self._finish_traceback(alignX, alignY, i, j, score)
+
+
+    def traceback_pointers(self, pointers, score, width=None):
+        """
+        Traceback a packed pointer matrix in order to compute the alignment
+        :param pointers: the pointer bytes of rows 1..len(seqY) and columns 1..len(seqX),
+        row by row (see walk_pointers)
+        :param score: the score of the alignment
+        :param width: the number of pointers per row, len(seqX) by default
+        :return: an aligned seqX, an aligned seqY, and the score
+        :rtype: tuple
+        """
+
+        alignX = []
+        alignY = []
+        i, j, _ = self.walk_pointers(pointers, 0, 0, len(self.seqY), len(self.seqX),
+                                     len(self.seqX) if width is None else width,
+                                     self.ALIGNMENT_SYMBOL, alignX, alignY)
+        return self._finish_traceback(alignX, alignY, i, j, score)
+
+
+    def walk_pointers(self, pointers, r0, c0, i, j, width, currentMatrix, alignX, alignY):
+        """
+        Follows the packed traceback pointers of a block of cells, starting from cell (i, j)
+        of matrix currentMatrix, until the traceback reaches row r0 or column c0.  Each
+        pointer is a byte made of the A_FROM_*, INSERTION_FROM_* and DELETION_FROM_* bits,
+        and the pointer of cell (i, j) is pointers[(i - r0 - 1) * width + (j - c0 - 1)]
+        :param pointers: the pointer bytes of the block
+        :param r0: the row above the block
+        :param c0: the column left of the block
+        :param i: the row of the starting cell
+        :param j: the column of the starting cell
+        :param width: the number of columns of the block
+        :param currentMatrix: the matrix symbol of the starting cell
+        :param alignX: receives the reversed characters of the aligned seqX
+        :param alignY: receives the reversed characters of the aligned seqY
+        :return: the row, column and matrix symbol at which the traceback left the block
+        :rtype: tuple
+        """
+
+        while i > r0 and j > c0:
+
+            cell = pointers[(i - r0 - 1) * width + (j - c0 - 1)]
+
+            if currentMatrix == self.ALIGNMENT_SYMBOL:
+                if cell & self.A_FROM_INSERTION:
+                    currentMatrix = self.INSERTION_SYMBOL
+                elif cell & self.A_FROM_DELETION:
+                    currentMatrix = self.DELETION_SYMBOL
+                else:  # same matrix (A)
+                    alignX.append(self.seqX[j - 1])
+                    alignY.append(self.seqY[i - 1])
+                    j -= 1
+                    i -= 1
+
+            elif currentMatrix == self.INSERTION_SYMBOL:
+                if cell & self.INSERTION_FROM_ALIGNMENT:
+                    currentMatrix = self.ALIGNMENT_SYMBOL
+                alignX.append(self.seqX[j - 1])
+                alignY.append(self.GAP_SYMBOL)
+                j -= 1
+
+            else:  # currentMatrix == self.DELETION_SYMBOL
+                if cell & self.DELETION_FROM_ALIGNMENT:
+                    currentMatrix = self.ALIGNMENT_SYMBOL
+                alignX.append(self.GAP_SYMBOL)
+                alignY.append(self.seqY[i - 1])
+                i -= 1
+
+        return i, j, currentMatrix
+
+
+    def _finish_traceback(self, alignX, alignY, i, j, score):
+        """
+        Adds the final gaps to a (reversed) partial traceback and builds the aligned strings
+        :param alignX: the reversed characters of the aligned seqX collected so far
+        :param alignY: the reversed characters of the aligned seqY collected so far
+        :param i: the row at which the traceback stopped
+        :param j: the column at which the traceback stopped
+        :param score: the score of the alignment
+        :return: an aligned seqX, an aligned seqY, and the score
+        :rtype: tuple
+        """
+
         # add in final gaps
         while i > 0:
             alignX.append(self.GAP_SYMBOL)
@@ -221,7 +1070,6 @@ class GlobalAlignerBase:
 
         alignX = ''.join(alignX[::-1])
         alignY = ''.join(alignY[::-1])
-        score = self.alignmentMatrix[self.matrixHeight - 1][self.matrixWidth - 1][0]
 
         return alignX, alignY, score
 
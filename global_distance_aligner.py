@@ -20,12 +20,15 @@ class GlobalDistanceAligner(GlobalAlignerBase):
     the affine indel gap model fit sequence alignment
     """
 
-    def __init__(self, blosumPath):
-        GlobalAlignerBase.__init__(self, blosumPath)
+    def __init__(self, blosumPath, engine=GlobalAlignerBase.PYTHON_ENGINE, linearSpaceThreshold=None,
+                 maxDistance=None, cacheDir=GlobalAlignerBase.BLOSUM_CACHE_DIR):
+        GlobalAlignerBase.__init__(self, blosumPath, engine, linearSpaceThreshold, cacheDir)
 
         self.compare_function = lt
         self.score_function = self.blosum.get_distance_score
+        self.scoreTable = self.blosum.distanceArray
         self.gapInitCost = -self.blosum.gapInitCost
         self.gapExtendCost = -self.blosum.gapExtendCost
+        self.threshold = maxDistance    # largest accepted distance, alignments beyond it are rejected
 
 
@@ -20,11 +20,14 @@ class GlobalSimilarityAligner(GlobalAlignerBase):
     the affine indel gap model fit sequence alignment
     """
 
-    def __init__(self, blosumPath):
-        GlobalAlignerBase.__init__(self, blosumPath)
+    def __init__(self, blosumPath, engine=GlobalAlignerBase.PYTHON_ENGINE, linearSpaceThreshold=None,
+                 minSimilarity=None, cacheDir=GlobalAlignerBase.BLOSUM_CACHE_DIR):
+        GlobalAlignerBase.__init__(self, blosumPath, engine, linearSpaceThreshold, cacheDir)
 
         self.compare_function = gt
         self.score_function = self.blosum.get_similarity_score
+        self.scoreTable = self.blosum.similarityArray
         self.gapInitCost = self.blosum.gapInitCost
         self.gapExtendCost = self.blosum.gapExtendCost
+        self.threshold = minSimilarity    # smallest accepted similarity, alignments beyond it are rejected
 
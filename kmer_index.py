@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+"""
+Contains the KmerIndex class
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+from array import array             # used to store the posting lists compactly
+from collections import Counter     # used to count the k-mers shared by each pair
+from itertools import combinations  # used to enumerate the pairs of a posting list
+from time import perf_counter       # used to time the index build
+
+
+class KmerIndex:
+    """
+    An inverted index from each k-mer to the sequences containing it, used to find the
+    pairs of sequences sharing enough k-mers to be worth aligning.  K-mers may be taken
+    over a reduced alphabet, which groups similar residues so that related sequences
+    still share k-mers despite conservative substitutions
+    """
+
+    FULL_ALPHABET = "full"
+
+    # Reduced alphabets, as groups of residues mapped to the group's first residue
+    REDUCED_ALPHABETS = {
+        # Murphy, Wallqvist & Levy (2000), 10 groups
+        "murphy10": ("LVIM", "C", "A", "G", "ST", "P", "FYW", "EDNQ", "KR", "H"),
+        # Murphy, Wallqvist & Levy (2000), 4 groups
+        "murphy4": ("LVIMC", "AGSTP", "FYW", "EDNQKRH"),
+    }
+    ALPHABETS = (FULL_ALPHABET,) + tuple(REDUCED_ALPHABETS)
+
+    def __init__(self, k, alphabet=FULL_ALPHABET):
+
+        if k < 1:
+            raise ValueError(f"The k-mer length must be positive, not {k}")
+        if alphabet not in self.ALPHABETS:
+            raise ValueError(f"Unknown alphabet '{alphabet}', expected one of {', '.join(self.ALPHABETS)}")
+
+        self.k = k                  # length of the k-mers
+        self.alphabet = alphabet    # name of the alphabet of the k-mers
+        self.postings = {}          # { k-mer: array of the indices of the sequences containing it }
+        self.count = 0              # number of indexed sequences
+        self.buildSeconds = 0.0     # time spent building the index
+
+        self._translation = None    # str.translate table of the reduced alphabet, if any
+        if alphabet != self.FULL_ALPHABET:
+            self._translation = str.maketrans({residue: group[0]
+                                               for group in self.REDUCED_ALPHABETS[alphabet]
+                                               for residue in group})
+
+
+    def kmers(self, sequence):
+        """
+        Returns the distinct k-mers of a sequence, over the index's alphabet
+        :param sequence: an amino acid sequence
+        :type sequence: str
+        :rtype: set
+        """
+        if self._translation is not None:
+            sequence = sequence.translate(self._translation)
+        k = self.k
+        return {sequence[p:p + k] for p in range(len(sequence) - k + 1)}
+
+
+    def add(self, index, sequence):
+        """
+        Indexes the k-mers of a sequence.  Sequences must be added by increasing index
+        :param index: the index of the sequence
+        :param sequence: an amino acid sequence
+        """
+        for kmer in self.kmers(sequence):
+            posting = self.postings.get(kmer)
+            if posting is None:
+                posting = self.postings[kmer] = array('l')
+            posting.append(index)
+        self.count = max(self.count, index + 1)
+
+
+    def build(self, reader):
+        """
+        Indexes every sequence of a SequenceReader, timing the build in buildSeconds
+        :param reader: a SequenceReader, read or indexed
+        """
+        start = perf_counter()
+        for i in range(reader.count):
+            self.add(i, reader.get_sequence(i))
+        self.buildSeconds += perf_counter() - start
+
+
+    def shared_counts(self):
+        """
+        Counts the distinct k-mers shared by each pair of indexed sequences, only
+        enumerating the pairs that share at least one
+        :return: { (i, j): number of shared k-mers } with i < j
+        :rtype: Counter
+        """
+        counts = Counter()
+        for posting in self.postings.values():
+            counts.update(combinations(posting, 2))
+        return counts
+
+
+    def candidate_pairs(self, minShared=1):
+        """
+        Returns the pairs of indexed sequences sharing at least minShared k-mers
+        :param minShared: the number of distinct shared k-mers needed
+        :return: the (i, j) pairs, with i < j
+        :rtype: set
+        """
+        if minShared < 1:
+            return set(combinations(range(self.count), 2))
+        return {pair for pair, shared in self.shared_counts().items() if shared >= minShared}
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+"""
+Contains the LinearSpaceEngine class
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+class LinearSpaceEngine:
+    """
+    Computes the alignment of an aligner's sequences in linear memory, using a divide
+    and conquer traceback in the spirit of Myers and Miller.  Instead of matching the
+    forward pass against a reverse pass, the forward pass propagates for every cell
+    where the traceback starting there first reaches the middle row.  This yields the
+    exact traceback of GlobalAlignerBase.align, ties included, so both return the same
+    aligned strings.  Blocks of at most blockCells cells are traced back directly
+    """
+
+    BLOCK_CELLS = 1 << 20
+
+    def __init__(self, aligner, blockCells=BLOCK_CELLS):
+
+        self.aligner = aligner          # the GlobalAlignerBase providing sequences and scores
+        self.blockCells = blockCells    # largest block traced back with a pointer matrix
+
+
+    def align(self):
+        """
+        Compute the alignment of the aligner's seqX and seqY
+        :return: an aligned seqX, an aligned seqY, and the score
+        :rtype: tuple
+        """
+        aligner = self.aligner
+        gapInit = aligner.gapInitCost
+        gapExtend = aligner.gapExtendCost
+
+        # first row and first column of the three matrices
+        topA = [0] + [gapInit + (j * gapExtend) for j in range(1, len(aligner.seqX) + 1)]
+        leftA = [0] + [gapInit + (i * gapExtend) for i in range(1, len(aligner.seqY) + 1)]
+        topD = [cost + gapInit for cost in topA]
+        leftI = [cost + gapInit for cost in leftA]
+
+        alignX = []
+        alignY = []
+        i, j, _, score = self._traceback(0, 0, len(aligner.seqY), len(aligner.seqX), aligner.ALIGNMENT_SYMBOL,
+                                         topA, topD, leftA, leftI, alignX, alignY)
+        return aligner._finish_traceback(alignX, alignY, i, j, score)
+
+
+    def _traceback(self, r0, c0, r1, c1, currentMatrix, topA, topD, leftA, leftI, alignX, alignY):
+        """
+        Traceback the block of rows r0+1..r1 and columns c0+1..c1, from cell (r1, c1) of
+        matrix currentMatrix until reaching row r0 or column c0
+        :param topA: the A values of row r0, columns c0..c1
+        :param topD: the D values of row r0, columns c0..c1
+        :param leftA: the A values of column c0, rows r0..r1
+        :param leftI: the I values of column c0, rows r0..r1
+        :param alignX: receives the reversed characters of the aligned seqX
+        :param alignY: receives the reversed characters of the aligned seqY
+        :return: the row, column and matrix symbol at which the traceback left the block,
+        and the A value of cell (r1, c1)
+        :rtype: tuple
+        """
+        aligner = self.aligner
+
+        if (r1 - r0) * (c1 - c0) <= self.blockCells or r1 - r0 < 2:
+            width = c1 - c0
+            pointers = bytearray((r1 - r0) * width)
+            bottomA, _, _, _ = aligner.fill_block(r0, c0, r1, c1, topA, topD, leftA, leftI, pointers)
+            i, j, currentMatrix = aligner.walk_pointers(pointers, r0, c0, r1, c1, width, currentMatrix, alignX, alignY)
+            return i, j, currentMatrix, bottomA[width]
+
+        # Find where the traceback first reaches the middle row
+        mid = (r0 + r1) // 2
+        midA, midD, _, _ = aligner.fill_block(r0, c0, mid, c1, topA, topD, leftA[:mid - r0 + 1], leftI[:mid - r0 + 1])
+        leftBelowA = leftA[mid - r0:]
+        leftBelowI = leftI[mid - r0:]
+        (midRow, midCol, midMatrix), cornerA = self._first_arrival(mid, c0, r1, c1, currentMatrix,
+                                                                   midA, midD, leftBelowA, leftBelowI)
+
+        if midRow > mid:
+            # the traceback leaves through column c0 before reaching the middle row
+            i, j, currentMatrix, _ = self._traceback(mid, c0, r1, c1, currentMatrix,
+                                                     midA, midD, leftBelowA, leftBelowI, alignX, alignY)
+            return i, j, currentMatrix, cornerA
+
+        # Below the middle row the traceback never visits a column left of midCol, so the
+        # lower block starts at column midCol - 1, whose A and I values are computed first
+        split = max(midCol - 1, c0)
+        if split > c0:
+            _, _, leftBelowA, leftBelowI = aligner.fill_block(mid, c0, r1, split, midA[:split - c0 + 1],
+                                                              midD[:split - c0 + 1], leftBelowA, leftBelowI)
+        self._traceback(mid, split, r1, c1, currentMatrix, midA[split - c0:], midD[split - c0:],
+                        leftBelowA, leftBelowI, alignX, alignY)
+
+        i, j, currentMatrix, _ = self._traceback(r0, c0, mid, midCol, midMatrix, topA[:midCol - c0 + 1],
+                                                 topD[:midCol - c0 + 1], leftA[:mid - r0 + 1],
+                                                 leftI[:mid - r0 + 1], alignX, alignY)
+        return i, j, currentMatrix, cornerA
+
+
+    def _first_arrival(self, r0, c0, r1, c1, currentMatrix, topA, topD, leftA, leftI):
+        """
+        Runs the DP over rows r0+1..r1 and columns c0+1..c1 like GlobalAlignerBase.fill_block,
+        and propagates along with each value the first cell of row r0 or column c0 that the
+        traceback starting from that value reaches.  Cells are labelled by
+        (row * (len(seqX) + 1) + column) * 3 + matrix, with matrices A, I, D as 0, 1, 2
+        :return: the row, column and matrix symbol that the traceback from cell (r1, c1) of
+        matrix currentMatrix reaches first, and the A value of cell (r1, c1)
+        :rtype: tuple
+        """
+        aligner = self.aligner
+        better = aligner.compare_function
+        profile = aligner.profile
+        gapInit = aligner.gapInitCost
+        gapExtend = aligner.gapExtendCost
+        gapOpen = gapInit + gapExtend
+        stride = len(aligner.seqX) + 1
+        width = c1 - c0
+
+        lastA = list(topA)
+        lastD = list(topD)
+        rowA = [None] * (width + 1)
+        rowD = [None] * (width + 1)
+
+        # the traceback from a cell of row r0 is already there
+        lastLabelA = [(r0 * stride + c0 + k) * 3 for k in range(width + 1)]
+        lastLabelD = [label + 2 for label in lastLabelA]
+        rowLabelA = [None] * (width + 1)
+        rowLabelD = [None] * (width + 1)
+
+        for i in range(r0 + 1, r1 + 1):
+            profileRow = profile[aligner.codesY[i - 1]]
+
+            # the traceback from a cell of column c0 is already there
+            costLeftA = leftA[i - r0]
+            costLeftI = leftI[i - r0]
+            labelLeftA = (i * stride + c0) * 3
+            labelLeftI = labelLeftA + 1
+            rowA[0] = costLeftA
+            rowLabelA[0] = labelLeftA
+
+            for k in range(1, width + 1):
+
+                # min/max ( D(i-1,j) + gext,  A(i-1,j) + gini + gext)
+                costD = lastD[k] + gapExtend
+                costA = lastA[k] + gapOpen
+                if better(costD, costA):
+                    labelD = lastLabelD[k]
+                else:
+                    costD = costA
+                    labelD = lastLabelA[k]
+
+                # min/max ( I(i,j-1) + gext,  A(i,j-1) + gini + gext)
+                costI = costLeftI + gapExtend
+                costA = costLeftA + gapOpen
+                if not better(costI, costA):
+                    costI = costA
+                    labelLeftI = labelLeftA
+
+                # min/max ( D(i,j),  I(i,j),  A(i-1,j-1) + score(ai, bj))
+                costA = lastA[k - 1] + profileRow[c0 + k]
+                if better(costA, costI):
+                    if better(costA, costD):
+                        costLeftA = costA
+                        labelLeftA = lastLabelA[k - 1]
+                    else:
+                        costLeftA = costD
+                        labelLeftA = labelD
+                else:
+                    if better(costI, costD):
+                        costLeftA = costI
+                        labelLeftA = labelLeftI
+                    else:
+                        costLeftA = costD
+                        labelLeftA = labelD
+
+                rowA[k] = costLeftA
+                rowD[k] = costD
+                rowLabelA[k] = labelLeftA
+                rowLabelD[k] = labelD
+                costLeftI = costI
+
+            lastA, rowA = rowA, lastA
+            lastD, rowD = rowD, lastD
+            lastLabelA, rowLabelA = rowLabelA, lastLabelA
+            lastLabelD, rowLabelD = rowLabelD, lastLabelD
+
+        if currentMatrix == aligner.ALIGNMENT_SYMBOL:
+            label = lastLabelA[width]
+        elif currentMatrix == aligner.INSERTION_SYMBOL:
+            label = labelLeftI
+        else:
+            label = lastLabelD[width]
+
+        cell, matrix = divmod(label, 3)
+        row, column = divmod(cell, stride)
+        matrix = (aligner.ALIGNMENT_SYMBOL, aligner.INSERTION_SYMBOL, aligner.DELETION_SYMBOL)[matrix]
+        return (row, column, matrix), lastA[width]
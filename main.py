@@ -1,25 +1,54 @@
 #!/usr/bin/env python
 
 import argparse
+import sys
+from hashlib import sha256
 from os import path
+from contextlib import nullcontext
+from aligner_stats import AlignerStats
+from alignment_writer import AlignmentWriter
+from kmer_index import KmerIndex
+from top_k_search import TopKSearch
 from sequence_reader import SequenceReader
+from global_aligner_base import GlobalAlignerBase
 from global_distance_aligner import GlobalDistanceAligner
 from global_similarity_aligner import GlobalSimilarityAligner
 
+try:
+    import resource
+except ImportError:  # peak memory is not reported where resource is missing (Windows)
+    resource = None
 
-MATCH_SYMBOL = '*'
-MISMATCH_SYMBOL = '|'
-GAP_SYMBOL = ' '
 
 #=========================================================================
 
-# Define our program arguments
+# Define our program arguments.  Modules that are slow to import (NumPy, sqlite3,
+# multiprocessing) are only imported by the options needing them, so that --help and
+# small runs start quickly
 
 def is_valid_file(parser, filePath):
     if path.exists(filePath):
         return filePath
     parser.error("The file %s does not exist!" % filePath)
 
+def positive_int(parser, value):
+    if value.isdigit() and int(value) > 0:
+        return int(value)
+    parser.error("%s is not a positive integer!" % value)
+
+def memory_size(parser, value):
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    digits, unit = (value[:-1], units[value[-1].upper()]) if value[-1:].upper() in units else (value, 1)
+    if digits.isdigit() and int(digits) > 0:
+        return int(digits) * unit
+    parser.error("%s is not a memory size!" % value)
+
+def number(parser, value):
+    try:
+        return float(value)
+    except ValueError:
+        parser.error("%s is not a number!" % value)
+
 parser = argparse.ArgumentParser(description='Global Alignment Program')
 parser.add_argument('mode', type=str, choices=['distance', 'similarity'],
                     help="The type of global alignment to be performed.")
@@ -27,52 +56,468 @@ parser.add_argument('blosum_file', type=lambda x: is_valid_file(parser, x),
                     help="The path to the file containing the BLOSUM matrix and gap penalties.")
 parser.add_argument('sequences_file', type=lambda x: is_valid_file(parser, x),
                     help="The path to the file containing the two sequences to be compared.")
+parser.add_argument('--engine', type=str, choices=GlobalAlignerBase.ENGINES, default=GlobalAlignerBase.PYTHON_ENGINE,
+                    help="The DP engine used to compute the alignments (numpy requires NumPy).")
+parser.add_argument('--linear-space-threshold', type=int, default=None, metavar='CELLS',
+                    help="Number of DP cells above which alignments are traced back in linear memory.")
+parser.add_argument('--score-only', action='store_true',
+                    help="Only compute and print the scores, using linear memory and no traceback.")
+parser.add_argument('--jobs', type=lambda x: positive_int(parser, x), default=1, metavar='N',
+                    help="Number of worker processes aligning pairs in parallel (with the tiled engine, the tiles of each pair).")
+parser.add_argument('--memory-limit', type=lambda x: memory_size(parser, x), default=None, metavar='SIZE',
+                    help="Bytes (or K, M, G) of DP buffers the alignments may take: each pair uses the fastest engine that fits, and "
+                         "only as many jobs as fit run together. The engine and memory of each pair are reported on stderr.")
+parser.add_argument('--top-k', type=lambda x: positive_int(parser, x), default=None, metavar='K',
+                    help="Only report the K best scoring other sequences of each sequence, pruning the candidates that cannot make it.")
+parser.add_argument('--index', action='store_true',
+                    help="Memory-map the sequences file and read the sequences through an offset index instead of loading them.")
+parser.add_argument('--matrix', type=str, default=None, metavar='PATH',
+                    help="Write the scores into a memory-mapped .npy matrix instead of printing them (resumable, requires NumPy).")
+parser.add_argument('--matrix-layout', type=str, choices=['condensed', 'square'], default='condensed',
+                    help="Store the condensed upper triangle or the full symmetric matrix.")
+parser.add_argument('--max-distance', type=lambda x: number(parser, x), default=None, metavar='T',
+                    help="Distance mode: stop aligning a pair as soon as its distance is proven above T, reporting it as rejected.")
+parser.add_argument('--min-similarity', type=lambda x: number(parser, x), default=None, metavar='T',
+                    help="Similarity mode: stop aligning a pair as soon as its similarity is proven below T, reporting it as rejected.")
+parser.add_argument('--prefilter', type=lambda x: positive_int(parser, x), default=None, metavar='K',
+                    help="Only align the pairs sharing enough k-mers of length K, found through an inverted k-mer index.")
+parser.add_argument('--prefilter-min-shared', type=lambda x: positive_int(parser, x), default=1, metavar='N',
+                    help="Number of distinct k-mers a pair must share to be aligned with --prefilter.")
+parser.add_argument('--prefilter-alphabet', type=str, choices=KmerIndex.ALPHABETS, default=KmerIndex.FULL_ALPHABET,
+                    help="Take the --prefilter k-mers over the full residue alphabet or over a reduced alphabet.")
+parser.add_argument('--prefix-sharing', action='store_true',
+                    help="Align each sequence against its pairs in sorted order, reusing the DP rows of the prefixes they share.")
+parser.add_argument('--output', type=str, default=None, metavar='PATH',
+                    help="Write the results to PATH instead of stdout (gzip compressed if PATH ends with .gz).")
+parser.add_argument('--output-format', type=str, choices=AlignmentWriter.FORMATS, default=AlignmentWriter.TEXT,
+                    help="Write the alignments as text, as JSON Lines, or as tab separated CIGAR strings.")
+parser.add_argument('--gzip', action='store_true',
+                    help="Compress the results with gzip while writing them.")
+parser.add_argument('--stats', action='store_true',
+                    help="Time each phase and count the pairs, DP cells and matrix bytes, and print a summary on stderr.")
+parser.add_argument('--profile', type=str, default=None, metavar='PATH',
+                    help="Write a cProfile/pstats file of the run (of the main process only with --jobs).")
+parser.add_argument('--cache', type=str, default=None, metavar='PATH',
+                    help="SQLite file caching the results across runs; hit and miss counts are reported on stderr.")
+parser.add_argument('--cache-size', type=lambda x: positive_int(parser, x), default=None, metavar='N',
+                    help="Number of cached results above which the least recently used ones are evicted (1000000 by default).")
+parser.add_argument('--no-cache', action='store_true',
+                    help="Bypass the cache given by --cache, neither reading nor writing it.")
+parser.add_argument('--clear-cache', action='store_true',
+                    help="Remove every entry of the cache given by --cache before aligning.")
+parser.add_argument('--blosum-cache', type=str, default=GlobalAlignerBase.BLOSUM_CACHE_DIR, metavar='DIR',
+                    help="Directory of the compiled BLOSUM files, loaded instead of parsing the BLOSUM file again.")
+parser.add_argument('--no-blosum-cache', action='store_true',
+                    help="Parse the BLOSUM file on every run, neither reading nor writing its compiled form.")
+
+#=========================================================================
+
+# Align pairs, in this process or in worker processes
+
+aligner = None      # the aligner of this process
+reader = None       # the SequenceReader of this process
+searcher = None     # the TopKSearch of this process, with --top-k
+
+def create_aligner(args, withCache=True):
+    cacheDir = None if args.no_blosum_cache else args.blosum_cache
+    if args.mode == 'similarity':
+        newAligner = GlobalSimilarityAligner(args.blosum_file, engine=args.engine,
+                                             linearSpaceThreshold=args.linear_space_threshold,
+                                             minSimilarity=args.min_similarity, cacheDir=cacheDir)
+    else:
+        newAligner = GlobalDistanceAligner(args.blosum_file, engine=args.engine,
+                                           linearSpaceThreshold=args.linear_space_threshold,
+                                           maxDistance=args.max_distance, cacheDir=cacheDir)
+    newAligner.tileJobs = args.jobs
+    newAligner.prefixSharing = args.prefix_sharing
+    newAligner.memoryLimit = args.memory_limit
+    if withCache and args.cache and not args.no_cache:
+        from alignment_cache import AlignmentCache
+        newAligner.cache = AlignmentCache(args.cache, args.cache_size or AlignmentCache.MAX_ENTRIES)
+    return newAligner
+
+def init_worker(args, workerReader):
+    # Each worker reads the BLOSUM file once, then aligns many pairs
+    global aligner, reader, searcher
+    if args.stats:
+        stats = AlignerStats()
+        with stats.phase('read_blosum'):
+            aligner = create_aligner(args)
+        stats.instrument(aligner)
+    else:
+        aligner = create_aligner(args)
+    reader = workerReader
+    searcher = TopKSearch(aligner, args.top_k) if args.top_k else None
+
+def job_counts():
+    # The cache hits and misses, the DP rows computed and scanned by prefix sharing,
+    # and the candidates of the top-k searches: considered, aligned, abandoned, pruned
+    # and reused
+    counts = [0] * 9
+    if aligner.cache is not None:
+        counts[0:2] = aligner.cache.hits, aligner.cache.misses
+    if aligner._prefixScanEngine is not None:
+        counts[2:4] = aligner._prefixScanEngine.rowsComputed, aligner._prefixScanEngine.rowsTotal
+    if searcher is not None:
+        counts[4:9] = searcher.candidates, searcher.aligned, searcher.abandoned, searcher.pruned, searcher.reused
+    return counts
+
+def peak_memory():
+    # The peak resident memory of this process in bytes, if known
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+def align_query(job):
+    # Returns the results of the job, the counts of the job (see job_counts), the stats
+    # of the job if the aligner is instrumented, and under a memory limit the
+    # (pairIndex, plan, estimated bytes, whether over the limit, bytes by which the pair
+    # raised the peak of the process, peak bytes of the process so far) of each pair
+    # aligned.  The peak of a process cannot be reset, so a pair taking less than the
+    # peak of an earlier pair of the same process raises it by 0
+    pairIndices, i, js, scoreOnly = job
+    query = reader.get_sequence(i)
+    targets = [reader.get_sequence(j) for j in js]
+    counts = job_counts()
+    memory = []
+    if aligner.memoryLimit is not None:
+        results = []
+        for pairIndex, target in zip(pairIndices, targets):
+            aligner.memoryPlan = None
+            before = peak_memory()
+            results.append(aligner.score(query, target) if scoreOnly else aligner.align(query, target))
+            if aligner.memoryPlan is not None:    # None if cached
+                plan, estimate = aligner.memoryPlan
+                peak = peak_memory()
+                growth = None if peak is None else peak - before
+                memory.append((pairIndex, plan, estimate, estimate > aligner.memoryLimit, growth, peak))
+        aligner.release()   # so that the buffers of this job do not outlive it
+    elif scoreOnly:
+        results = aligner.score_many(query, targets)
+    else:
+        results = aligner.align_many(query, targets)
+    counts = [new - old for new, old in zip(job_counts(), counts)]
+    stats = None if aligner.stats is None else aligner.stats.drain()
+    return list(zip(pairIndices, results)), counts, stats, memory
+
+def search_query(job):
+    # Returns the nearest neighbours of a sequence with their results, the counts of the
+    # job (see job_counts), the stats of the job if the aligner is instrumented, and no
+    # memory report
+    i, scoreOnly = job
+    query = reader.get_sequence(i)
+    counts = job_counts()
+    neighbours = searcher.search(query, [(j, reader.get_sequence(j)) for j in range(reader.count) if j != i], i)
+    if not scoreOnly:
+        neighbours = [(j, aligner.align(query, reader.get_sequence(j))) for j, _ in neighbours]
+    counts = [new - old for new, old in zip(job_counts(), counts)]
+    stats = None if aligner.stats is None else aligner.stats.drain()
+    return (i, neighbours), counts, stats, []
+
+def search_neighbours(args, runCounts, runStats=None):
+    """
+    Yields (i, [(j, result)]) for every sequence i, with its args.top_k best scoring
+    other sequences j from the best, in the order of the sequences.  Adds the counts
+    of all the searches (see job_counts) to runCounts, and their stats to runStats
+    """
+    jobs = [(i, args.score_only) for i in range(reader.count)]
+    if args.jobs == 1 or args.engine == GlobalAlignerBase.TILED_ENGINE:
+        init_worker(args, reader)
+        finished = map(search_query, jobs)
+        yield from search_results(runCounts, runStats, finished)
+        return
+
+    from multiprocessing import Pool
+    with Pool(args.jobs, initializer=init_worker, initargs=(args, reader)) as pool:
+        yield from search_results(runCounts, runStats, pool.imap(search_query, jobs))
+
+def search_results(runCounts, runStats, finished):
+    for neighbours, *counts in finished:
+        add_job_counts(runCounts, runStats, *counts, None)
+        yield neighbours
+
+def add_job_counts(runCounts, runStats, counts, stats, memory, pairs):
+    for k, count in enumerate(counts):
+        runCounts[k] += count
+    if stats is not None:
+        runStats.merge(stats)
+
+    megabytes = lambda size: "unknown" if size is None else f"{size / (1 << 20):.1f} MB"
+    for pairIndex, plan, estimate, over, growth, peak in memory:
+        i, j = pairs[pairIndex]
+        print(f"Memory: {reader.get_record(i)[0]} / {reader.get_record(j)[0]}: {plan}, "
+              f"estimated {megabytes(estimate)}{' (over the limit)' if over else ''}, "
+              f"peak RSS growth {megabytes(growth)}, process peak RSS {megabytes(peak)}", file=sys.stderr)
+
+def admit_jobs(args, jobs, lengths):
+    """
+    Yields the results of the jobs run in a process pool, only running jobs together
+    while the sum of their largest pair's memory estimate fits in args.memory_limit.  A
+    job that does not fit with any other runs alone.  A worker killed during a job,
+    such as by the out-of-memory killer, stops the run with an error instead of
+    leaving it waiting for the job
+    """
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    from concurrent.futures.process import BrokenProcessPool
+    planner = create_aligner(args, withCache=False)
+    estimates = [max(planner.memory_plan(lengths[i], lengths[j], scoreOnly)[1] for j in js)
+                 for _, i, js, scoreOnly in jobs]
+
+    pending = list(range(len(jobs)))
+    running = {}                # { future of a job: its estimate }
+    with ProcessPoolExecutor(args.jobs, initializer=init_worker, initargs=(args, reader)) as pool:
+        while pending or running:
+            for k in admit(args, estimates, pending, list(running.values())):
+                pending.remove(k)
+                running[pool.submit(align_query, jobs[k])] = estimates[k]
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                del running[future]
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    raise RuntimeError("A worker process ended abruptly, possibly killed for lack of memory; "
+                                       "try a lower --memory-limit or fewer --jobs") from e
+                yield result
+
+def admit(args, estimates, pending, running):
+    """
+    Returns the pending jobs to start besides the running ones, in the order of pending:
+    while fewer than args.jobs run, each job whose estimate fits in what the running
+    and admitted jobs leave of args.memory_limit, or the first pending job if none runs
+    """
+    admitted = []
+    used = sum(running)
+    for k in pending:
+        if len(running) + len(admitted) == args.jobs:
+            break
+        if not (running or admitted) or used + estimates[k] <= args.memory_limit:
+            admitted.append(k)
+            used += estimates[k]
+    return admitted
+
+def align_pairs(args, pairs, runCounts, runStats=None):
+    """
+    Yields (pairIndex, result) for every pair, in any order.  The numpy engine, and
+    prefix sharing, align each sequence against all of its pairs in one batch job.
+    With several jobs the largest jobs are scheduled first, so that no worker is left
+    with a big job at the end of the run, and under a memory limit only as many as fit
+    in it (see admit_jobs).  Adds the counts of all the jobs (see job_counts) to
+    runCounts, and their stats to runStats
+    """
+    batched = args.engine == GlobalAlignerBase.NUMPY_ENGINE or args.prefix_sharing
+    jobs = []
+    for pairIndex, (i, j) in enumerate(pairs):
+        if batched and jobs and jobs[-1][1] == i:
+            jobs[-1][0].append(pairIndex)
+            jobs[-1][2].append(j)
+        else:
+            jobs.append(([pairIndex], i, [j], args.score_only))
 
-args = parser.parse_args()
+    # The tiled engine aligns each pair with args.jobs processes of its own
+    if args.jobs == 1 or args.engine == GlobalAlignerBase.TILED_ENGINE:
+        init_worker(args, reader)
+        for job in jobs:
+            results, *counts = align_query(job)
+            add_job_counts(runCounts, runStats, *counts, pairs)
+            yield from results
+        return
+
+    lengths = [len(reader.get_sequence(i)) for i in range(reader.count)]
+    jobs.sort(key=lambda job: lengths[job[1]] * sum(lengths[j] for j in job[2]), reverse=True)
+    if args.memory_limit is not None:
+        for results, *counts in admit_jobs(args, jobs, lengths):
+            add_job_counts(runCounts, runStats, *counts, pairs)
+            yield from results
+        return
+
+    from multiprocessing import Pool
+    with Pool(args.jobs, initializer=init_worker, initargs=(args, reader)) as pool:
+        for results, *counts in pool.imap_unordered(align_query, jobs):
+            add_job_counts(runCounts, runStats, *counts, pairs)
+            yield from results
+
+def plan_pairs(args, sr, pairs):
+    """
+    Plans the alignment of pairs.  Every sequence is hashed and represented by the first
+    sequence with the same hash, so that the pairs of duplicate sequences map to the
+    same pair of representatives, aligned only once.  Pairs of identical sequences are
+    answered in O(n) without DP when the gapless alignment is provably the only optimal
+    one (see GlobalAlignerBase.diagonal_is_optimal).  Returns the pairs to align, the
+    indices of the pairs sharing the result of each of them, and the results of the
+    pairs of identical sequences by pair index
+    """
+    shortcut = create_aligner(args, withCache=False)
+    canShortcut = shortcut.diagonal_is_optimal()
+
+    firstIndex = {}     # { sequence hash: index of the first sequence with that hash }
+    representatives = []
+    for i in range(sr.count):
+        digest = sha256(sr.get_sequence(i).encode()).digest()
+        representatives.append(firstIndex.setdefault(digest, i))
+
+    uniqueIndices = {}  # { pair of representatives: index in uniquePairs }
+    uniquePairs = []
+    sharing = []
+    identical = {}
+    identicalResults = {}   # { representative: its result against itself }
+    for pairIndex, (i, j) in enumerate(pairs):
+        pair = (representatives[i], representatives[j])
+
+        if pair[0] == pair[1] and canShortcut and sr.get_sequence(i):
+            if pair[0] not in identicalResults:
+                result = shortcut.identical_alignment(sr.get_sequence(i))
+                identicalResults[pair[0]] = result[2] if args.score_only and result is not None else result
+            identical[pairIndex] = identicalResults[pair[0]]
+            continue
+
+        if pair not in uniqueIndices:
+            uniqueIndices[pair] = len(uniquePairs)
+            uniquePairs.append(pair)
+            sharing.append([])
+        sharing[uniqueIndices[pair]].append(pairIndex)
+
+    return uniquePairs, sharing, identical
+
+def fan_out(identical, sharing, results):
+    """
+    Yields (pairIndex, result) for the pairs of identical sequences, then for every pair
+    sharing each (uniqueIndex, result) of results
+    """
+    yield from identical.items()
+    for uniqueIndex, result in results:
+        for pairIndex in sharing[uniqueIndex]:
+            yield pairIndex, result
+
+def in_order(results):
+    """
+    Reorders (pairIndex, result) tuples by pairIndex, yielding each result as soon as
+    all the previous ones are available
+    """
+    pending = {}
+    nextIndex = 0
+    for pairIndex, result in results:
+        pending[pairIndex] = result
+        while nextIndex in pending:
+            yield nextIndex, pending.pop(nextIndex)
+            nextIndex += 1
 
 #=========================================================================
 
 # Run the program
 
-sr = SequenceReader()
-sr.set_sequences(args.sequences_file)
-
-aligner = None
-if args.mode == 'similarity':
-    aligner = GlobalSimilarityAligner(args.blosum_file)
-else:
-    aligner = GlobalDistanceAligner(args.blosum_file)
-
-for i in range(sr.count - 1):
-    for j in range(i + 1, sr.count):
-        seqA = sr.sequences[i]
-        seqB = sr.sequences[j]
-        alignA, alignB, score = aligner.align(seqA, seqB)
-
-        # Print names
-        print(f"Alignment of {sr.proteinNames[i]} ({sr.speciesNames[i]}) and {sr.proteinNames[j]} ({sr.speciesNames[j]})")
-
-        # Print the first alignment
-        print(alignA)
-
-        # Print a row of symbols representing character matches
-        symbol = ''
-        for k in range(len(alignA)):
-            if alignA[k] == alignB[k]:
-                symbol = MATCH_SYMBOL
-            elif alignA[k] == aligner.GAP_SYMBOL or alignB[k] == aligner.GAP_SYMBOL:
-                symbol = GAP_SYMBOL
-            else:
-                symbol = MISMATCH_SYMBOL
-            print(symbol, end="")
-        print()
-
-        # Print the second alignment
-        print(alignB)
-
-        # Print the score
-        print("Score: ", score)
-        print()
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+    if args.max_distance is not None and args.mode != 'distance':
+        parser.error("--max-distance requires the distance mode")
+    if args.min_similarity is not None and args.mode != 'similarity':
+        parser.error("--min-similarity requires the similarity mode")
+    if args.top_k and (args.matrix or args.prefilter):
+        parser.error("--top-k cannot be used with --matrix or --prefilter")
+
+    runStats = AlignerStats() if args.stats else None
+    phase = runStats.phase if runStats else lambda name: nullcontext()
+
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    sr = SequenceReader()
+    with phase('read_sequences'):
+        if args.index:
+            sr.index_file(args.sequences_file)
+        else:
+            sr.set_sequences(args.sequences_file)
+    reader = sr
+
+    if args.cache and args.clear_cache:
+        from alignment_cache import AlignmentCache
+        AlignmentCache(args.cache).clear()
+
+    runCounts = [0] * 9
+    compress = args.gzip or (args.output is not None and args.output.endswith('.gz'))
+    if args.top_k:
+        with AlignmentWriter(args.output, args.output_format, compress) as writer:
+            for i, neighbours in search_neighbours(args, runCounts, runStats):
+                for j, result in neighbours:
+                    with phase('print'):
+                        writer.write(sr.get_record(i), sr.get_record(j), result, args.score_only)
+        candidates, aligned, abandoned, pruned, reused = runCounts[4:9]
+        print(f"Top-{args.top_k}: {sr.count} sequences, {candidates} candidates, {aligned} aligned, "
+              f"{abandoned} abandoned early, {pruned} pruned by their bound, {reused} reused", file=sys.stderr)
+    else:
+        if args.matrix:
+            # Only compute the entries that an interrupted run did not write
+            args.score_only = True
+            from distance_matrix_writer import DistanceMatrixWriter
+            try:
+                matrix = DistanceMatrixWriter(args.matrix, [sr.get_record(i)[0] for i in range(sr.count)],
+                                              args.matrix_layout)
+            except ValueError as e:
+                parser.error(str(e))
+            allPairs = matrix.pairs()
+            pairs = [(i, j) for i, j in allPairs if not matrix.is_filled(i, j)]
+        else:
+            pairs = [(i, j) for i in range(sr.count - 1) for j in range(i + 1, sr.count)]
+
+        filteredPairs = []
+        if args.prefilter:
+            # Pairs of a sequence with itself are never filtered out
+            index = KmerIndex(args.prefilter, args.prefilter_alphabet)
+            with phase('prefilter'):
+                index.build(sr)
+                candidates = index.candidate_pairs(args.prefilter_min_shared)
+            filteredPairs = [(i, j) for i, j in pairs if i != j and (i, j) not in candidates]
+            pairs = [(i, j) for i, j in pairs if i == j or (i, j) in candidates]
+            print(f"Prefilter: {len(index.postings)} {args.prefilter}-mers ({args.prefilter_alphabet} alphabet) indexed "
+                  f"in {index.buildSeconds:.3f} s, {len(pairs)} candidate pairs, {len(filteredPairs)} filtered out",
+                  file=sys.stderr)
+
+        with phase('plan'):
+            uniquePairs, sharing, identical = plan_pairs(args, sr, pairs)
+        saved = len(pairs) - len(uniquePairs)
+        print(f"Plan: {len(pairs)} pairs, {len(uniquePairs)} aligned, {saved - len(identical)} duplicate pairs reused, "
+              f"{len(identical)} identical pairs without DP ({saved} alignments saved)", file=sys.stderr)
+
+        results = fan_out(identical, sharing, align_pairs(args, uniquePairs, runCounts, runStats))
+        if args.matrix:
+            # Pairs rejected by a threshold or filtered out by the prefilter are written as
+            # the worst score, +inf or -inf
+            rejectedScore = float('-inf') if args.mode == 'similarity' else float('inf')
+            try:
+                for i, j in filteredPairs:
+                    matrix.write(i, j, rejectedScore)
+                for pairIndex, result in results:
+                    i, j = pairs[pairIndex]
+                    matrix.write(i, j, rejectedScore if result is None else result)
+            finally:
+                matrix.flush()
+            print(f"Matrix: {len(pairs) + len(filteredPairs)} scores written, "
+                  f"{len(allPairs) - len(pairs) - len(filteredPairs)} already filled", file=sys.stderr)
+        else:
+            with AlignmentWriter(args.output, args.output_format, compress) as writer:
+                for pairIndex, result in in_order(results):
+                    i, j = pairs[pairIndex]
+                    with phase('print'):
+                        writer.write(sr.get_record(i), sr.get_record(j), result, args.score_only)
+
+    if args.cache and not args.no_cache:
+        print(f"Cache: {runCounts[0]} hits, {runCounts[1]} misses", file=sys.stderr)
+
+    if args.prefix_sharing:
+        rowsComputed, rowsTotal = runCounts[2:4]
+        saved = 1 - (rowsComputed / rowsTotal) if rowsTotal else 0.0
+        print(f"Prefix sharing: {rowsComputed} of {rowsTotal} DP rows computed ({saved:.1%} saved)", file=sys.stderr)
+
+    if args.profile:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+
+    if runStats:
+        print(runStats.summary(), file=sys.stderr)
 
 
 ''' TESTING
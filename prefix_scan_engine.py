@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+"""
+Contains the PrefixScanEngine class
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+class PrefixScanEngine:
+    """
+    Aligns one query against many targets, sharing the DP rows of common target
+    prefixes.  The query runs along the horizontal axis and each target along the
+    vertical axis, so row i of the matrices only depends on the first i residues of the
+    target.  Targets are visited in sorted order, which is the depth-first order of
+    their trie: each target restarts from the deepest row it shares with the previous
+    one, whose values and pointers are kept.  Rows are computed with
+    GlobalAlignerBase.fill_block, so the results are those of align(query, target)
+    """
+
+    def __init__(self, aligner):
+
+        self.aligner = aligner      # the GlobalAlignerBase providing scores
+        self.rowsTotal = 0          # DP rows of every target scanned
+        self.rowsComputed = 0       # DP rows actually computed
+
+
+    def rows_saved(self):
+        """
+        Returns the fraction of the DP rows of the targets scanned so far that were
+        reused from a previous target instead of being computed
+        :rtype: float
+        """
+        return 1 - (self.rowsComputed / self.rowsTotal) if self.rowsTotal else 0.0
+
+
+    def align_many(self, query, targets):
+        """
+        Compute the alignments of a query against many targets
+        :param query: an amino acid sequence, laid along the horizontal axis
+        :param targets: a list of amino acid sequences
+        :return: the result of align(query, target) for each target
+        :rtype: list
+        """
+        return self._scan(query, targets, True)
+
+
+    def score_many(self, query, targets):
+        """
+        Compute only the scores of the alignments of a query against many targets
+        :param query: an amino acid sequence, laid along the horizontal axis
+        :param targets: a list of amino acid sequences
+        :return: the result of score(query, target) for each target
+        :rtype: list
+        """
+        return self._scan(query, targets, False)
+
+
+    def _scan(self, query, targets, keepPointers):
+        """
+        Runs the DP of the query against every target in sorted order.  The rows at which
+        later targets branch off the current one are kept as checkpoints: the next target
+        restarts from the row of the prefix it shares with the current one, and the ones
+        after it from rows no deeper than that
+        :param keepPointers: whether to keep the pointers of the rows and trace back
+        """
+        aligner = self.aligner
+        gapInit = aligner.gapInitCost
+        gapExtend = aligner.gapExtendCost
+        width = len(query)
+        results = [None] * len(targets)
+
+        # empty targets, and alignments too large for their pointers, are left to the aligner
+        scanned = []
+        for t, target in enumerate(targets):
+            if not target or (keepPointers and (len(target) + 1) * (width + 1) > aligner.linearSpaceThreshold):
+                results[t] = aligner.align(query, target) if keepPointers else aligner.score(query, target)
+            else:
+                scanned.append(t)
+        order = sorted(scanned, key=targets.__getitem__)
+
+        # shared[k]: length of the prefix shared by the k-th and (k+1)-th sorted targets.
+        # lower[k]: the first k' > k with shared[k'] < shared[k], so that the rows needed
+        # after the k-th target are at the depths shared[k], shared[lower[k]], ...
+        shared = [self._shared_prefix(targets[t], targets[u]) for t, u in zip(order, order[1:])] + [0]
+        lower = [None] * len(order)
+        stack = []
+        for k in reversed(range(len(order))):
+            while stack and shared[stack[-1]] >= shared[k]:
+                stack.pop()
+            lower[k] = stack[-1] if stack else None
+            stack.append(k)
+
+        aligner.seqX = query
+        aligner.profile = aligner.profile_rows(query)
+        longest = max((len(targets[t]) for t in order), default=0)
+        pointers = memoryview(aligner.arena.pointers(longest * width)) if keepPointers else None
+
+        topA = [0] + [gapInit + (j * gapExtend) for j in range(1, width + 1)]
+        checkpoints = {0: (topA, [cost + gapInit for cost in topA])}     # { row: (A values, D values) }
+        start = 0
+
+        for k, t in enumerate(order):
+            target = targets[t]
+            aligner.seqY = target
+            aligner.codesY = aligner.blosum.encode(target)
+
+            needed = set()
+            m = k
+            while m is not None:
+                needed.add(shared[m])
+                m = lower[m]
+            for row in [row for row in checkpoints if row > start]:
+                del checkpoints[row]
+
+            rowA, rowD = checkpoints[start]
+            for i in range(start + 1, len(target) + 1):
+                leftA = [gapInit + ((i - 1) * gapExtend) if i > 1 else 0, gapInit + (i * gapExtend)]
+                rowPointers = pointers[(i - 1) * width:i * width] if keepPointers else None
+                rowA, rowD, _, _ = aligner.fill_block(i - 1, 0, i, width, rowA, rowD, leftA,
+                                                      [cost + gapInit for cost in leftA], rowPointers)
+                if i in needed:
+                    checkpoints[i] = (rowA, rowD)
+
+            self.rowsTotal += len(target)
+            self.rowsComputed += len(target) - start
+            start = shared[k]
+
+            score = rowA[width]
+            if not aligner.rejects(score):
+                results[t] = aligner.traceback_pointers(pointers, score) if keepPointers else score
+
+        return results
+
+
+    def _shared_prefix(self, seqA, seqB):
+        """
+        Returns the length of the longest common prefix of two sequences
+        :rtype: int
+        """
+        length = 0
+        for x, y in zip(seqA, seqB):
+            if x != y:
+                break
+            length += 1
+        return length
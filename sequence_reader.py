@@ -10,13 +10,22 @@ Contains the SequenceReader class
 """
 
 
+import mmap                 # used to read sequence files lazily
+import re                   # used to recognise PIR ID lines
+from array import array     # used to store the offset index compactly
+
+
 class SequenceReader:
     """
-    A class for reading sequence files, whereas a sequence file is a .txt file
-    with the first two non-empty lines each containing an amino acid sequence.
+    A class for reading sequence files, whereas a sequence file is a .txt file of
+    PIR-like records (an ID line, a name/species line, and a sequence ending with '*')
+    or a FASTA file (a '>' header line followed by the sequence lines)
     """
 
     NAME_DELIMITER = '-'
+    RECORD_START = b'>'
+    PIR_TERMINATOR = b'*'
+    PIR_HEADER = re.compile(r'>[A-Z0-9]{2};')  # the '>' and two-letter code of a PIR ID line
 
     def __init__(self):
 
@@ -28,6 +37,11 @@ class SequenceReader:
         self.sequences = []         # list of sequences
         self.count = 0              # total number of registered sequences
 
+        self.offsets = None         # byte offset of each record of the indexed file
+        self.indexPath = None       # path of the indexed file
+        self._file = None           # the indexed file
+        self._map = None            # memory map of the indexed file
+
 
     def set_sequences(self, path):
         """
@@ -37,33 +51,208 @@ class SequenceReader:
         :param path: the file path
         :type path: str
         """
-        with open(path, 'r') as f:
+        for identifier, protein, species, sequence in self.records(path):
+            self.ids.append(identifier)
+            self.proteinNames.append(protein)
+            self.speciesNames.append(species)
+            self.sequences.append(sequence)
+            self.count += 1
+
+
+    def records(self, path):
+        """
+        Yields the records of a sequence file one at a time, reading the file through a
+        memory map, so that files larger than the memory can be scanned
+        :param path: the file path
+        :type path: str
+        :return: an (id, protein name, species name, sequence) tuple for each record
+        :rtype: generator
+        """
+        with open(path, 'rb') as f:
+            if not self._file_size(f):
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                offset = self._skip_blank_lines(data, 0)
+                while offset < len(data):
+                    record, offset = self._parse_record(data, offset)
+                    yield record
+
+
+    def index_file(self, path):
+        """
+        Memory-maps a sequence file and records the byte offset of each of its records,
+        so that get_record and get_sequence can read any record without parsing the
+        records before it and without holding the sequences in memory.  Sets count
+        :param path: the file path
+        :type path: str
+        """
+        self.close()
+        self.indexPath = path
+        self.offsets = array('q')
+        self._open_map()
+
+        offset = 0 if self._map is None else self._skip_blank_lines(self._map, 0)
+        while self._map is not None and offset < len(self._map):
+            self.offsets.append(offset)
+            _, offset = self._parse_record(self._map, offset)
+        self.count = len(self.offsets)
+
+
+    def _open_map(self):
+        """
+        Opens the memory map of the indexed file, which stays None for an empty file
+        """
+        self._file = open(self.indexPath, 'rb')
+        if self._file_size(self._file):
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+    def __getstate__(self):
+        """
+        Pickles the reader without its memory map, so that an indexed reader can be sent
+        to worker processes, which map the file again instead of indexing it again
+        """
+        state = self.__dict__.copy()
+        state['_file'] = None
+        state['_map'] = None
+        return state
+
+
+    def __setstate__(self, state):
+        """
+        Unpickles a reader, mapping its indexed file again
+        """
+        self.__dict__.update(state)
+        if self.indexPath is not None:
+            self._open_map()
 
-            # sequences come in groups of 3 lines (one line for the ID,
-            # another for the name/species, and a third for the sequence)
-            # keep track of which line we should be reading
-            lineNum = 0
 
-            for line in f:
+    def close(self):
+        """
+        Releases the memory map of the indexed file, if any
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+    def get_record(self, i):
+        """
+        Returns record i, from the offset index if the file was indexed, or else from the
+        lists filled by set_sequences
+        :param i: the index of the record
+        :type i: int
+        :return: the id, protein name, species name and sequence of the record
+        :rtype: tuple
+        """
+        if self.offsets is not None:
+            return self._parse_record(self._map, self.offsets[i])[0]
+        return self.ids[i], self.proteinNames[i], self.speciesNames[i], self.sequences[i]
+
+
+    def get_sequence(self, i):
+        """
+        Returns the sequence of record i (see get_record)
+        :param i: the index of the record
+        :type i: int
+        :return: an amino acid sequence
+        :rtype: str
+        """
+        return self.get_record(i)[3]
+
+
+    def _file_size(self, f):
+        """
+        Returns the size of an open file, as empty files cannot be memory-mapped
+        """
+        f.seek(0, 2)
+        return f.tell()
 
-                # remove unnecessary whitespaces
-                line = line.strip()
 
-                # skip empty lines
-                if not line:
-                    continue
+    def _read_line(self, data, offset):
+        """
+        Reads the line of data starting at offset
+        :return: the stripped line, and the offset of the next line
+        :rtype: tuple
+        """
+        end = data.find(b'\n', offset)
+        if end < 0:
+            end = len(data)
+        return data[offset:end].strip(), end + 1
+
+
+    def _skip_blank_lines(self, data, offset):
+        """
+        Returns the offset of the first non-empty line at or after offset, or len(data)
+        """
+        while offset < len(data):
+            line, nextOffset = self._read_line(data, offset)
+            if line:
+                return offset
+            offset = nextOffset
+        return len(data)
+
 
-                n = lineNum % 3
-                if n == 0:          # First Line: ID
-                    self.ids.append(line)
-                elif n == 1:
-                    protein, species = line.rsplit(self.NAME_DELIMITER, 1)
-                    self.proteinNames.append(protein.rstrip())
-                    self.speciesNames.append(species.lstrip())
-                else: # n == 2
-                    assert line.endswith("*")
-                    self.sequences.append(line[:-1])
-                    self.count += 1
+    def _parse_record(self, data, offset):
+        """
+        Parses the record starting at offset.  A PIR-like record starts with a '>XX;'
+        line, or any ID line not starting with '>', then holds its name/species line,
+        then its sequence until a '*', which must come before the next '>' line (or a
+        ValueError is raised).  Any other record is read as FASTA, whose header
+        is the id followed by the description, and whose sequence runs until the next
+        '>' line, a final '*' being left out
+        :param data: the contents of the file
+        :param offset: the offset of the first line of the record
+        :return: the (id, protein name, species name, sequence) record, and the offset of
+        the next record
+        :rtype: tuple
+        """
+        header, offset = self._read_line(data, offset)
+        header = header.decode()
+        offset = self._skip_blank_lines(data, offset)
+        parts = []
+
+        if not header.startswith(self.RECORD_START.decode()) or self.PIR_HEADER.match(header):
+            # PIR-like record: ID line, name/species line, sequence line(s) ending with '*'
+            identifier = header
+            line, offset = self._read_line(data, offset)
+            protein, species = self._split_names(line.decode())
+            while True:
+                offset = self._skip_blank_lines(data, offset)
+                if offset >= len(data) or data[offset:offset + 1] == self.RECORD_START:
+                    raise ValueError(f"The sequence of record '{identifier}' does not end with "
+                                     f"'{self.PIR_TERMINATOR.decode()}' before the next record")
+                line, offset = self._read_line(data, offset)
+                if line.endswith(self.PIR_TERMINATOR):
+                    parts.append(line[:-1])
+                    break
+                parts.append(line)
+
+        else:
+            # FASTA record: header line, sequence lines until the next header
+            identifier, _, description = header.partition(' ')
+            protein, species = self._split_names(description)
+            while offset < len(data) and data[offset:offset + 1] != self.RECORD_START:
+                line, offset = self._read_line(data, offset)
+                parts.append(line)
+                offset = self._skip_blank_lines(data, offset)
+            if parts and parts[-1].endswith(self.PIR_TERMINATOR):
+                parts[-1] = parts[-1][:-1]
 
-                lineNum += 1
+        return (identifier, protein, species, b''.join(parts).decode()), self._skip_blank_lines(data, offset)
 
+
+    def _split_names(self, line):
+        """
+        Splits a "protein - species" line, the species being empty if there is no delimiter
+        :return: the protein name and the species name
+        :rtype: tuple
+        """
+        line = line.strip()
+        if self.NAME_DELIMITER not in line:
+            return line, ""
+        protein, species = line.rsplit(self.NAME_DELIMITER, 1)
+        return protein.rstrip(), species.lstrip()
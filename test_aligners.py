@@ -0,0 +1,817 @@
+#!/usr/bin/env python
+
+"""
+Contains the tests of the aligners, each engine and API being checked against the
+python engine
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+import argparse
+import asyncio
+import gzip
+import json
+import marshal
+import os
+import pickle
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import unittest
+from multiprocessing import get_context    # used to align in a daemonic process
+from alignment_writer import AlignmentWriter
+from blosum_reader import BlosumReader
+from global_aligner_base import GlobalAlignerBase
+from global_distance_aligner import GlobalDistanceAligner
+from global_similarity_aligner import GlobalSimilarityAligner
+from kmer_index import KmerIndex
+from sequence_reader import SequenceReader
+from top_k_search import TopKSearch
+
+try:
+    import numpy
+except ImportError:  # the numpy engine and the matrix writer are then not tested
+    numpy = None
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BLOSUM_PATH = os.path.join(ROOT, 'input_files', 'blosum62.txt')
+SEQUENCES_PATH = os.path.join(ROOT, 'input_files', 'sequences.txt')
+ALIGNERS = (GlobalDistanceAligner, GlobalSimilarityAligner)
+RESIDUES = "CSTPAGNDEQHRKMILVFYW"
+
+
+def random_sequences(count, seed, shortest=1, longest=40):
+    """
+    Returns random sequences, half of them mutated copies of the others, so that both
+    close and distant pairs are aligned
+    """
+    rnd = random.Random(seed)
+    sequences = []
+    for _ in range(count):
+        if sequences and rnd.random() < 0.5:
+            parent = rnd.choice(sequences)
+            sequence = ''.join(rnd.choice(RESIDUES) if rnd.random() < 0.2 else c
+                               for c in parent if rnd.random() > 0.1)
+        else:
+            sequence = ''.join(rnd.choice(RESIDUES) for _ in range(rnd.randint(shortest, longest)))
+        sequences.append(sequence or rnd.choice(RESIDUES))
+    return sequences
+
+
+def random_pairs(count, seed):
+    sequences = random_sequences(2 * count, seed)
+    return list(zip(sequences[::2], sequences[1::2]))
+
+
+def engines():
+    """
+    Returns the engines that can run here
+    """
+    return [engine for engine in GlobalAlignerBase.ENGINES
+            if engine != GlobalAlignerBase.NUMPY_ENGINE or numpy is not None]
+
+
+def align_in_worker(engine, pairs):
+    # Aligns pairs with two tile workers, from a daemonic pool worker
+    aligner = GlobalDistanceAligner(BLOSUM_PATH, engine=engine)
+    aligner.tileJobs = 2
+    return [aligner.align(seqA, seqB) for seqA, seqB in pairs]
+
+
+class EngineTest(unittest.TestCase):
+    """
+    Every engine returns the alignments and scores of the python engine, ties included
+    """
+
+    def setUp(self):
+        self.pairs = random_pairs(12, seed=1)
+
+
+    def create(self, alignerClass, engine):
+        aligner = alignerClass(BLOSUM_PATH, engine=engine)
+        aligner.tileJobs = 2
+        return aligner
+
+
+    def check_engine(self, engine):
+        for alignerClass in ALIGNERS:
+            reference = alignerClass(BLOSUM_PATH)
+            aligner = self.create(alignerClass, engine)
+            for seqA, seqB in self.pairs:
+                with self.subTest(mode=alignerClass.__name__, pair=(seqA, seqB)):
+                    expected = reference.align(seqA, seqB)
+                    self.assertEqual(aligner.align(seqA, seqB), expected)
+                    self.assertEqual(aligner.score(seqA, seqB), expected[2])
+                    self.assertIs(type(aligner.score(seqA, seqB)), type(expected[2]))
+
+        # with cheap gaps, the distance of some pairs is a sum of gap costs alone, which
+        # has the type of the gap costs
+        reference = GlobalDistanceAligner(BLOSUM_PATH)
+        aligner = self.create(GlobalDistanceAligner, engine)
+        for gapped in (reference, aligner):
+            gapped.gapInitCost, gapped.gapExtendCost = 0, 1
+        for seqA, seqB in self.pairs + [("WW", "CC"), ("WWW", "C")]:
+            with self.subTest(mode="cheap gaps", pair=(seqA, seqB)):
+                expected = reference.align(seqA, seqB)
+                self.assertEqual(aligner.align(seqA, seqB), expected)
+                self.assertIs(type(aligner.align(seqA, seqB)[2]), type(expected[2]))
+                self.assertIs(type(aligner.score(seqA, seqB)), type(expected[2]))
+
+
+    def test_python_engine(self):
+        self.check_engine(GlobalAlignerBase.PYTHON_ENGINE)
+
+
+    @unittest.skipIf(numpy is None, "the numpy engine requires NumPy")
+    def test_numpy_engine(self):
+        self.check_engine(GlobalAlignerBase.NUMPY_ENGINE)
+
+
+    def test_compact_engine(self):
+        self.check_engine(GlobalAlignerBase.COMPACT_ENGINE)
+
+
+    def test_banded_engine(self):
+        self.check_engine(GlobalAlignerBase.BANDED_ENGINE)
+
+
+    def test_banded_engine_proves_similar_pairs_early(self):
+        # HAHU and HABOG are proven optimal in the first band
+        reader = SequenceReader()
+        reader.set_sequences(SEQUENCES_PATH)
+        aligner = GlobalSimilarityAligner(BLOSUM_PATH, engine=GlobalAlignerBase.BANDED_ENGINE)
+        aligner.align(reader.get_sequence(0), reader.get_sequence(3))
+        self.assertEqual(aligner.banded_engine().band, aligner.banded_engine().initialBand)
+
+
+    def test_tiled_engine(self):
+        self.check_engine(GlobalAlignerBase.TILED_ENGINE)
+
+
+    def test_tiled_engine_in_daemonic_process(self):
+        # a daemonic process cannot start the tile workers, so the tiles are filled in turn
+        reference = GlobalDistanceAligner(BLOSUM_PATH)
+        with get_context('spawn').Pool(1) as pool:
+            results = pool.apply(align_in_worker, (GlobalAlignerBase.TILED_ENGINE, self.pairs[:3]))
+        self.assertEqual(results, [reference.align(seqA, seqB) for seqA, seqB in self.pairs[:3]])
+
+
+    def test_linear_space(self):
+        for alignerClass in ALIGNERS:
+            reference = alignerClass(BLOSUM_PATH)
+            aligner = alignerClass(BLOSUM_PATH, linearSpaceThreshold=50)
+            for seqA, seqB in self.pairs:
+                with self.subTest(mode=alignerClass.__name__, pair=(seqA, seqB)):
+                    self.assertEqual(aligner.align(seqA, seqB), reference.align(seqA, seqB))
+
+
+    def check_many(self, prefixSharing):
+        query = self.pairs[0][0]
+        targets = [seqB for _, seqB in self.pairs] + [query[:5], query[:5] + 'W', query]
+        for alignerClass in ALIGNERS:
+            reference = alignerClass(BLOSUM_PATH)
+            expected = [reference.align(query, target) for target in targets]
+            for engine in engines():
+                aligner = self.create(alignerClass, engine)
+                aligner.prefixSharing = prefixSharing
+                with self.subTest(mode=alignerClass.__name__, engine=engine):
+                    self.assertEqual(aligner.align_many(query, targets), expected)
+                    self.assertEqual(aligner.score_many(query, targets), [result[2] for result in expected])
+
+
+    def test_align_many_and_score_many(self):
+        self.check_many(False)
+
+
+    def test_prefix_sharing(self):
+        self.check_many(True)
+
+
+    def test_empty_sequences(self):
+        # An empty sequence is aligned against gaps only
+        for alignerClass in ALIGNERS:
+            for engine in engines():
+                aligner = self.create(alignerClass, engine)
+                seqA = self.pairs[0][0]
+                score = aligner.score(seqA, '')
+                with self.subTest(mode=alignerClass.__name__, engine=engine):
+                    self.assertEqual(aligner.align(seqA, ''), (seqA, '-' * len(seqA), score))
+                    self.assertEqual(aligner.align('', seqA), ('-' * len(seqA), seqA, score))
+                    self.assertEqual(aligner.align('', ''), ('', '', 0))
+                    self.assertEqual(aligner.align_many(seqA, ['']), [(seqA, '-' * len(seqA), score)])
+
+
+    def test_identical_alignment(self):
+        # without gaps when that is the only optimal alignment of a sequence with itself
+        for alignerClass in ALIGNERS:
+            reference = alignerClass(BLOSUM_PATH)
+            self.assertTrue(reference.diagonal_is_optimal())
+            for seqA, _ in self.pairs:
+                with self.subTest(mode=alignerClass.__name__, sequence=seqA):
+                    self.assertEqual(reference.identical_alignment(seqA), reference.align(seqA, seqA))
+
+            free = alignerClass(BLOSUM_PATH)
+            free.gapInitCost = free.gapExtendCost = 0   # gaps cost nothing
+            self.assertFalse(free.diagonal_is_optimal())
+            mismatched = alignerClass(BLOSUM_PATH)
+            table = mismatched.scoreTable = [list(row) for row in mismatched.scoreTable]
+            better = mismatched.compare_function
+            bestMatch = table[0][0] if better(table[0][0], table[1][1]) else table[1][1]
+            table[0][1] = bestMatch + (1 if better(1, 0) else -1)     # a mismatch better than both matches
+            self.assertFalse(mismatched.diagonal_is_optimal())
+
+
+    def test_threshold(self):
+        # A pair strictly worse than the threshold is rejected, any other one is unchanged
+        for alignerClass in ALIGNERS:
+            reference = alignerClass(BLOSUM_PATH)
+            expected = [reference.align(seqA, seqB) for seqA, seqB in self.pairs]
+            scores = sorted(result[2] for result in expected)
+            threshold = scores[len(scores) // 2]
+            for engine in engines():
+                aligner = self.create(alignerClass, engine)
+                aligner.threshold = threshold
+                kept = [None if aligner.rejects(result[2]) else result for result in expected]
+                with self.subTest(mode=alignerClass.__name__, engine=engine):
+                    self.assertEqual([aligner.align(seqA, seqB) for seqA, seqB in self.pairs], kept)
+                    self.assertEqual([aligner.score(seqA, seqB) for seqA, seqB in self.pairs],
+                                     [None if result is None else result[2] for result in kept])
+                    self.assertEqual(aligner.score_many(self.pairs[0][0], [seqB for _, seqB in self.pairs]),
+                                     [None if aligner.rejects(score) else score
+                                      for score in (reference.score(self.pairs[0][0], seqB) for _, seqB in self.pairs)])
+
+
+class MemoryPlanTest(unittest.TestCase):
+    """
+    Under a memory limit, each pair takes the first plan whose estimate fits, and jobs
+    only run together while their estimates fit
+    """
+
+    def test_memory_plan(self):
+        aligner = GlobalDistanceAligner(BLOSUM_PATH)
+        estimate = lambda plan: aligner.memory_estimate(plan, 100, 200)
+        self.assertEqual(aligner.memory_plan(100, 200), (aligner.PYTHON_ENGINE, estimate(aligner.PYTHON_ENGINE)))
+        self.assertEqual(aligner.memory_plan(100, 200, True), (aligner.SCORE_ONLY_PLAN, estimate(aligner.SCORE_ONLY_PLAN)))
+
+        plans = (aligner.PYTHON_ENGINE, aligner.COMPACT_ENGINE, aligner.LINEAR_SPACE_PLAN)
+        self.assertTrue(estimate(plans[0]) > estimate(plans[1]) > estimate(plans[2]))
+        for limit, plan in ((estimate(plans[0]), plans[0]), (estimate(plans[0]) - 1, plans[1]),
+                            (estimate(plans[1]) - 1, plans[2]), (1, plans[2])):
+            aligner.memoryLimit = limit
+            self.assertEqual(aligner.memory_plan(100, 200), (plan, estimate(plan)))
+
+        aligner.memoryLimit = None
+        aligner.linearSpaceThreshold = 101 * 201 - 1
+        self.assertEqual(aligner.memory_plan(100, 200)[0], aligner.LINEAR_SPACE_PLAN)
+
+
+    def test_align_under_limit(self):
+        pairs = random_pairs(6, seed=5)
+        for alignerClass in ALIGNERS:
+            reference = alignerClass(BLOSUM_PATH)
+            for limit in (None, 1 << 30, 1000, 1):
+                aligner = alignerClass(BLOSUM_PATH)
+                aligner.memoryLimit = limit
+                for seqA, seqB in pairs:
+                    with self.subTest(mode=alignerClass.__name__, limit=limit, pair=(seqA, seqB)):
+                        self.assertEqual(aligner.align(seqA, seqB), reference.align(seqA, seqB))
+                        if limit is not None:
+                            self.assertEqual(aligner.memoryPlan, aligner.memory_plan(len(seqA), len(seqB)))
+
+
+    def test_admission(self):
+        import main
+        args = argparse.Namespace(jobs=3, memory_limit=100)
+        estimates = [80, 50, 30, 20]
+        self.assertEqual(main.admit(args, estimates, [0, 1, 2, 3], []), [0, 3])
+        self.assertEqual(main.admit(args, estimates, [1, 2, 3], [60]), [2])
+        self.assertEqual(main.admit(args, estimates, [1, 2, 3], [30]), [1, 3])
+        self.assertEqual(main.admit(args, estimates, [0], [30]), [])
+        self.assertEqual(main.admit(args, [200], [0], []), [0])     # too large, so alone
+        self.assertEqual(main.admit(argparse.Namespace(jobs=2, memory_limit=1000), estimates, [0, 1, 2], []), [0, 1])
+
+
+class TopKSearchTest(unittest.TestCase):
+    """
+    The top-k search returns the ranking of an exhaustive scan, ties by index
+    """
+
+    def setUp(self):
+        self.sequences = random_sequences(16, seed=2, shortest=10)
+        self.sequences += self.sequences[:2]    # identical sequences, for ties
+
+
+    def expected(self, aligner, scores, q, k):
+        better = aligner.compare_function
+        ranked = [(scores[q, j], j) for j in range(len(self.sequences))
+                  if j != q and (aligner.threshold is None or not aligner.rejects(scores[q, j]))]
+        ranked.sort(key=lambda entry: (-entry[0] if better(1, 0) else entry[0], entry[1]))
+        return [(j, score) for score, j in ranked[:k]]
+
+
+    def test_search(self):
+        for alignerClass in ALIGNERS:
+            reference = alignerClass(BLOSUM_PATH)
+            scores = {}
+            for i, seqA in enumerate(self.sequences):
+                for j in range(i + 1, len(self.sequences)):
+                    scores[i, j] = scores[j, i] = reference.score(seqA, self.sequences[j])
+            median = sorted(scores.values())[len(scores) // 2]
+
+            for engine in (GlobalAlignerBase.PYTHON_ENGINE, GlobalAlignerBase.COMPACT_ENGINE) + \
+                          ((GlobalAlignerBase.NUMPY_ENGINE,) if numpy is not None else ()):
+                for k in (1, 3):
+                    for threshold in (None, median):
+                        for shared in (False, True):
+                            aligner = alignerClass(BLOSUM_PATH, engine=engine)
+                            aligner.threshold = threshold
+                            search = TopKSearch(aligner, k)
+                            with self.subTest(mode=alignerClass.__name__, engine=engine, k=k,
+                                              threshold=threshold, shared=shared):
+                                for q in reversed(range(len(self.sequences))):
+                                    candidates = [(j, s) for j, s in enumerate(self.sequences) if j != q]
+                                    found = search.search(self.sequences[q], candidates, q if shared else None)
+                                    self.assertEqual(found, self.expected(aligner, scores, q, k))
+                                self.assertEqual(aligner.threshold, threshold)
+
+
+    def test_bound(self):
+        for alignerClass in ALIGNERS:
+            reference = alignerClass(BLOSUM_PATH)
+            search = TopKSearch(reference, 1)
+            better = reference.compare_function
+            for seqA, seqB in random_pairs(20, seed=3):
+                self.assertFalse(better(reference.score(seqA, seqB), search.bound(seqA, seqB)))
+
+
+@unittest.skipIf(numpy is None, "the distance matrix writer requires NumPy")
+class DistanceMatrixWriterTest(unittest.TestCase):
+    """
+    An interrupted matrix is resumed, and refused for other sequences or without its ids
+    """
+
+    def setUp(self):
+        from distance_matrix_writer import DistanceMatrixWriter
+        self.writerClass = DistanceMatrixWriter
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'scores.npy')
+        self.ids = ['a', 'b', 'c', 'd']
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def test_resume(self):
+        for layout in self.writerClass.LAYOUTS:
+            with self.subTest(layout=layout):
+                writer = self.writerClass(self.path, self.ids, layout)
+                pairs = writer.pairs()
+                for i, j in pairs[:3]:
+                    writer.write(i, j, float(i + j))
+                writer.flush()
+                del writer
+
+                writer = self.writerClass(self.path, self.ids, layout)
+                self.assertEqual([pair for pair in pairs if not writer.is_filled(*pair)], pairs[3:])
+                self.assertEqual(writer.matrix[writer.entry(0, 1)], 1.0)
+                if layout == self.writerClass.SQUARE:
+                    self.assertEqual(writer.matrix[1, 0], 1.0)
+                del writer
+                os.remove(self.path)
+
+
+    def test_refuses_other_matrices(self):
+        writer = self.writerClass(self.path, self.ids)
+        del writer
+        with self.assertRaises(ValueError):
+            self.writerClass(self.path, self.ids[:3])
+        with self.assertRaises(ValueError):
+            self.writerClass(self.path, self.ids, self.writerClass.SQUARE)
+
+
+    def test_refuses_a_matrix_without_ids(self):
+        writer = self.writerClass(self.path, self.ids)
+        del writer
+        os.remove(self.path + ".ids.txt")
+        with self.assertRaises(ValueError):
+            self.writerClass(self.path, self.ids)
+
+
+class BlosumReaderTest(unittest.TestCase):
+    """
+    The compiled form of a BLOSUM file is only loaded while its file and its version
+    are unchanged
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'blosum.txt')
+        self.cacheDir = os.path.join(self.directory.name, 'cache')
+        shutil.copy(BLOSUM_PATH, self.path)
+        self.compiledPath = BlosumReader().compiled_path(self.path, self.cacheDir)
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def read(self):
+        # Returns the gap initiation cost read through the compiled form
+        reader = BlosumReader()
+        reader.read_compiled(self.path, self.cacheDir)
+        return reader.gapInitCost
+
+
+    def tamper(self, **changes):
+        # Makes the compiled form hold a gap initiation cost of 99, and the given changes
+        with open(self.compiledPath, 'rb') as f:
+            compiled = marshal.loads(f.read())
+        compiled['fields']['gapInitCost'] = 99
+        compiled.update(changes)
+        compiled = {key: value for key, value in compiled.items() if value is not None}
+        with open(self.compiledPath, 'wb') as f:
+            f.write(marshal.dumps(compiled))
+
+
+    def test_unchanged_file(self):
+        self.assertEqual(self.read(), -10)
+        self.tamper()
+        self.assertEqual(self.read(), 99)
+
+
+    def test_touched_file(self):
+        # the file is hashed, and its compiled form kept with the new stamp
+        self.read()
+        self.tamper()
+        os.utime(self.path, ns=(0, 0))
+        self.assertEqual(self.read(), 99)
+        self.assertEqual(self.read(), 99)
+
+
+    def test_changed_file(self):
+        self.read()
+        with open(self.path) as f:
+            text = f.read()
+        with open(self.path, 'w') as f:
+            f.write(text.replace("Gap_initiation = -10", "Gap_initiation = -11"))
+        os.utime(self.path, ns=(0, 0))
+        self.assertEqual(self.read(), -11)
+
+
+    def test_invalid_compiled_forms(self):
+        for changes in ({'version': BlosumReader.COMPILED_VERSION + 1}, {'stamp': None}, {'digest': None}):
+            with self.subTest(changes=changes):
+                self.read()
+                self.tamper(**changes)
+                self.assertEqual(self.read(), -10)
+
+
+    def test_without_cache(self):
+        reader = BlosumReader()
+        reader.read_compiled(self.path, None)
+        self.assertEqual(reader.gapInitCost, -10)
+        self.assertFalse(os.path.exists(self.cacheDir))
+        aligner = GlobalSimilarityAligner(self.path, cacheDir=None)
+        self.assertEqual(aligner.align("WHRK", "WHK"), GlobalSimilarityAligner(BLOSUM_PATH).align("WHRK", "WHK"))
+        self.assertFalse(os.path.exists(self.cacheDir))
+
+
+class SequenceReaderTest(unittest.TestCase):
+    """
+    PIR and FASTA records are read alike by set_sequences and through the offset index
+    """
+
+    PIR = (">P1;HAHU | 1114\nhemoglobin alpha chain - human\nVLSPAD\nKTNV*\n\n"
+           ">F1;GPPMI\nleghemoglobin I - garden pea\nGFTDK*\n"
+           "MYBAO\nmyoglobin\n*\n")
+    FASTA = ">HAHU hemoglobin alpha chain - human\nVLSPAD\n\nKTNV\n>GPPMI\nGFTDK*\n>MYBAO myoglobin\n"
+    RECORDS = [('HAHU', 'hemoglobin alpha chain', 'human', 'VLSPADKTNV'), ('GPPMI', '', '', 'GFTDK'),
+               ('MYBAO', 'myoglobin', '', '')]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def read(self, text, indexed):
+        # Returns the records of a file holding text
+        path = os.path.join(self.directory.name, 'sequences.txt')
+        with open(path, 'w') as sequences:
+            sequences.write(text)
+        reader = SequenceReader()
+        if indexed:
+            reader.index_file(path)
+        else:
+            reader.set_sequences(path)
+        records = [reader.get_record(i) for i in range(reader.count)]
+        reader.close()
+        return records
+
+
+    def test_pir(self):
+        for indexed in (False, True):
+            with self.subTest(indexed=indexed):
+                self.assertEqual(self.read(self.PIR, indexed),
+                                 [('>P1;HAHU | 1114',) + self.RECORDS[0][1:],
+                                  ('>F1;GPPMI', 'leghemoglobin I', 'garden pea', 'GFTDK'), self.RECORDS[2]])
+
+
+    def test_fasta(self):
+        for indexed in (False, True):
+            with self.subTest(indexed=indexed):
+                self.assertEqual(self.read(self.FASTA, indexed),
+                                 [('>' + record[0],) + record[1:] for record in self.RECORDS])
+
+
+    def test_index(self):
+        loaded = SequenceReader()
+        loaded.set_sequences(SEQUENCES_PATH)
+        indexed = SequenceReader()
+        indexed.index_file(SEQUENCES_PATH)
+        unpickled = pickle.loads(pickle.dumps(indexed))     # as sent to the worker processes
+        self.assertEqual(indexed.count, loaded.count)
+        for i in reversed(range(loaded.count)):
+            self.assertEqual(indexed.get_record(i), loaded.get_record(i))
+            self.assertEqual(unpickled.get_record(i), loaded.get_record(i))
+        indexed.close()
+        unpickled.close()
+
+
+    def test_unterminated_record(self):
+        # a PIR record without its '*' does not take in the records after it
+        for text in (self.PIR.replace('KTNV*', 'KTNV'), self.PIR.replace('myoglobin\n*', 'myoglobin')):
+            for indexed in (False, True):
+                with self.subTest(text=text, indexed=indexed):
+                    with self.assertRaises(ValueError):
+                        self.read(text, indexed)
+
+
+class KmerIndexTest(unittest.TestCase):
+    """
+    The prefilter keeps exactly the pairs sharing enough distinct k-mers
+    """
+
+    def test_candidate_pairs(self):
+        sequences = random_sequences(20, seed=4, shortest=5)
+        for alphabet in KmerIndex.ALPHABETS:
+            for k in (1, 3):
+                index = KmerIndex(k, alphabet)
+                for i, sequence in enumerate(sequences):
+                    index.add(i, sequence)
+                kmers = [index.kmers(sequence) for sequence in sequences]
+                for minShared in (0, 1, 3):
+                    with self.subTest(alphabet=alphabet, k=k, minShared=minShared):
+                        self.assertEqual(index.candidate_pairs(minShared),
+                                         {(i, j) for i in range(len(sequences)) for j in range(i + 1, len(sequences))
+                                          if len(kmers[i] & kmers[j]) >= minShared})
+
+
+    def test_reduced_alphabet(self):
+        # conservative substitutions keep the k-mers of a reduced alphabet
+        self.assertEqual(KmerIndex(3).kmers("LVIST"), {"LVI", "VIS", "IST"})
+        self.assertEqual(KmerIndex(3, "murphy10").kmers("LVIST"), KmerIndex(3, "murphy10").kmers("IMLTS"))
+        self.assertEqual(KmerIndex(5).kmers("LVIST"), {"LVIST"})
+        self.assertEqual(KmerIndex(6).kmers("LVIST"), set())
+
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            KmerIndex(0)
+        with self.assertRaises(ValueError):
+            KmerIndex(3, "murphy5")
+
+
+class AlignmentCacheTest(unittest.TestCase):
+    """
+    The cache evicts its least recently used entries, and can be cleared
+    """
+
+    def setUp(self):
+        from alignment_cache import AlignmentCache
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = AlignmentCache(os.path.join(self.directory.name, 'cache.sqlite'), maxEntries=3)
+
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+
+    def test_eviction(self):
+        for k in range(3):
+            self.cache.put_alignment(str(k), ('A', 'A', k))
+        self.cache.get_alignment('0')      # 1 is now the least recently used entry
+        self.cache.put_score('3', 3)
+        self.assertIsNone(self.cache.get_score('1'))
+        self.assertEqual([self.cache.get_score(key) for key in '023'], [0, 2, 3])
+        self.assertEqual(self.cache.get_alignment('0'), ('A', 'A', 0))
+        self.assertIsNone(self.cache.get_alignment('3'))    # only its score is cached
+
+
+    def test_clear(self):
+        self.cache.put_alignment('0', ('A', 'A', 0))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get_alignment('0'))
+        self.assertEqual(self.cache._count(), 0)
+
+
+class AlignmentWriterTest(unittest.TestCase):
+    """
+    Each format writes every result, also when compressed or larger than the buffer
+    """
+
+    RECORD_A = ('>P1;A', 'protein a', 'human', 'WHRKE')
+    RECORD_B = ('>P1;B', 'protein b', 'mouse', 'WHKQ')
+    ALIGNMENT = ('WHRKE', 'WH-KQ', 12)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def write(self, format, results, scoreOnly=False, compress=False, name='pairs.txt'):
+        # Returns the lines written for the results
+        path = os.path.join(self.directory.name, name)
+        with AlignmentWriter(path, format, compress) as writer:
+            for result in results:
+                writer.write(self.RECORD_A, self.RECORD_B, result, scoreOnly)
+        self.assertEqual(writer.pairs, len(results))
+        with (gzip.open if compress else open)(path, 'rt') as f:
+            return f.read().splitlines()
+
+
+    def test_cigar(self):
+        self.assertEqual(AlignmentWriter().cigar('WHRKE', 'WH-KQ'), '2=1D1=1X')
+        self.assertEqual(AlignmentWriter().cigar('--WH', 'CCWW'), '2I1=1X')
+        self.assertEqual(self.write(AlignmentWriter.CIGAR, [self.ALIGNMENT, None]),
+                         ['>P1;A\t>P1;B\t12\t2=1D1=1X', '>P1;A\t>P1;B\t*\t*'])
+        self.assertEqual(self.write(AlignmentWriter.CIGAR, [12.5], scoreOnly=True), ['>P1;A\t>P1;B\t12.5\t*'])
+
+
+    def test_jsonl(self):
+        lines = self.write(AlignmentWriter.JSONL, [self.ALIGNMENT, None])
+        self.assertEqual([json.loads(line) for line in lines],
+                         [{'idA': '>P1;A', 'idB': '>P1;B', 'alignA': 'WHRKE', 'alignB': 'WH-KQ', 'score': 12},
+                          {'idA': '>P1;A', 'idB': '>P1;B', 'rejected': True}])
+        lines = self.write(AlignmentWriter.JSONL, [12.5], scoreOnly=True)
+        self.assertEqual([json.loads(line) for line in lines], [{'idA': '>P1;A', 'idB': '>P1;B', 'score': 12.5}])
+
+
+    def test_gzip(self):
+        # more results than fit in the buffer, so that it is written several times
+        results = [self.ALIGNMENT] * (AlignmentWriter.BUFFER_SIZE // 40)
+        for format in AlignmentWriter.FORMATS:
+            with self.subTest(format=format):
+                self.assertEqual(self.write(format, results, compress=True, name='pairs.gz'),
+                                 self.write(format, results))
+
+
+class AlignmentServerTest(unittest.TestCase):
+    """
+    The server only replaces the socket of a server that is no longer running
+    """
+
+    def setUp(self):
+        from alignment_server import AlignmentServer
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'server.sock')
+        self.server = AlignmentServer(BLOSUM_PATH, jobs=1)
+
+
+    def tearDown(self):
+        self.server.close()
+        self.directory.cleanup()
+
+
+    def test_socket_in_use(self):
+        listener = socket.socket(socket.AF_UNIX)
+        listener.bind(self.path)
+        listener.listen()
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.server.serve(self.path))
+        self.assertTrue(os.path.exists(self.path))
+
+        listener.close()    # leaves the socket file behind
+        asyncio.run(self.server._remove_stale_socket(self.path))
+        self.assertFalse(os.path.exists(self.path))
+
+
+    def test_not_a_socket(self):
+        with open(self.path, 'w'):
+            pass
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.server.serve(self.path))
+        self.assertTrue(os.path.exists(self.path))
+
+
+class MainTest(unittest.TestCase):
+    """
+    main.py aligns every pair of records of a file, including empty records
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'sequences.txt')
+        with open(SEQUENCES_PATH) as source, open(self.path, 'w') as sequences:
+            lines = source.readlines()
+            sequences.write(''.join(lines[:3]) + ">P1;EMPTY | 1114\nempty record - test\n*\n" + ''.join(lines[3:6]))
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def run_main(self, *options):
+        # Returns the JSON Lines results of main.py on the sequences
+        command = [sys.executable, os.path.join(ROOT, 'main.py'), 'distance', BLOSUM_PATH, self.path,
+                   '--output-format', 'jsonl'] + list(options)
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        return [json.loads(line) for line in output.splitlines()]
+
+
+    def expected(self):
+        reader = SequenceReader()
+        reader.set_sequences(self.path)
+        aligner = GlobalDistanceAligner(BLOSUM_PATH)
+        results = []
+        for i in range(reader.count - 1):
+            for j in range(i + 1, reader.count):
+                alignA, alignB, score = aligner.align(reader.get_sequence(i), reader.get_sequence(j))
+                results.append({'idA': reader.get_record(i)[0], 'idB': reader.get_record(j)[0],
+                                'alignA': alignA, 'alignB': alignB, 'score': score})
+        return results
+
+
+    def test_plan_pairs(self):
+        # duplicate sequences are aligned once, and identical ones without DP
+        import main
+        reader = SequenceReader()
+        reader.set_sequences(self.path)
+        with open(self.path, 'a') as sequences:
+            sequences.write(">P1;COPY1\nhemoglobin copy - test\n" + reader.get_sequence(0) + "*\n"
+                            ">P1;COPY2\nmyoglobin copy - test\n" + reader.get_sequence(2) + "*\n")
+        reader = SequenceReader()
+        reader.set_sequences(self.path)
+        pairs = [(i, j) for i in range(reader.count - 1) for j in range(i + 1, reader.count)]
+        aligner = GlobalDistanceAligner(BLOSUM_PATH)
+
+        for scoreOnly in ([], ['--score-only']):
+            args = main.parser.parse_args(['distance', BLOSUM_PATH, self.path] + scoreOnly)
+            with self.subTest(scoreOnly=scoreOnly):
+                uniquePairs, sharing, identical = main.plan_pairs(args, reader, pairs)
+                self.assertEqual(uniquePairs, [(0, 1), (0, 2), (1, 2), (1, 0), (2, 0)])
+                self.assertEqual(sorted(sum(sharing, []) + list(identical)), list(range(len(pairs))))
+                self.assertEqual(sorted(identical), [pairs.index((0, 3)), pairs.index((2, 4))])
+                for pairIndex, result in identical.items():
+                    i, j = pairs[pairIndex]
+                    expected = aligner.align(reader.get_sequence(i), reader.get_sequence(j))
+                    self.assertEqual(result, expected[2] if scoreOnly else expected)
+                for (i, j), shared in zip(uniquePairs, sharing):
+                    self.assertTrue(all(reader.get_sequence(i) == reader.get_sequence(pairs[k][0]) and
+                                        reader.get_sequence(j) == reader.get_sequence(pairs[k][1]) for k in shared))
+
+
+    def test_empty_record(self):
+        results = self.run_main()
+        self.assertEqual(results, self.expected())
+        self.assertEqual(results[0]['alignB'], '-' * len(results[0]['alignA']))
+
+
+    def test_memory_limit(self):
+        # the jobs admitted together under the limit return the results of the engine
+        for limit in ('1K', '1G'):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.run_main('--memory-limit', limit, '--jobs', '2'), self.expected())
+
+
+    def test_empty_record_with_cache(self):
+        # the cached runs align the empty target apart from the others
+        cache = os.path.join(self.directory.name, 'cache.sqlite')
+        options = [['--prefix-sharing']] + ([['--engine', GlobalAlignerBase.NUMPY_ENGINE]] if numpy is not None else [])
+        for option in options:
+            for scoreOnly in ([], ['--score-only']):
+                with self.subTest(option=option, scoreOnly=scoreOnly):
+                    expected = self.expected()
+                    if scoreOnly:
+                        expected = [{'idA': r['idA'], 'idB': r['idB'], 'score': r['score']} for r in expected]
+                    for _ in range(2):      # computed, then cached
+                        self.assertEqual(self.run_main('--cache', cache, *option, *scoreOnly), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+
+"""
+Contains the TiledEngine class
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+import os
+from array import array                                        # used to lay out the boundaries
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import current_process, shared_memory      # used to share the boundaries
+
+
+class TiledEngine:
+    """
+    Computes the alignment of a single large pair in parallel.  The DP is split into a
+    grid of rectangular tiles, and a tile is filled by a worker process as soon as the
+    tiles above and left of it are done, so that the tiles of an anti-diagonal run in
+    parallel.  Workers only exchange the last row (A and D) and the last column (A and
+    I) of each tile, through shared memory, which is all that the recurrences read
+    across tiles, and the query profile and residue codes of the pair, which are read
+    once per alignment by each worker.  The workers are started on the first alignment
+    and kept for the next ones until close().  In a daemonic process, which cannot
+    start workers, the tiles are filled in turn.  The traceback then refills the tiles
+    that the path crosses from their stored boundaries, one at a time, with
+    GlobalAlignerBase.fill_block and walk_pointers, so it returns exactly the
+    alignment of the serial engines
+    """
+
+    # Tiles per worker along each axis.  More tiles keep the workers busier at the start
+    # and end of the wavefront, and make the traceback refill a smaller part of the DP
+    TILES_PER_JOB = 4
+
+    def __init__(self, aligner, jobs=None):
+
+        self.aligner = aligner                      # the GlobalAlignerBase providing sequences and scores
+        self.jobs = jobs or os.cpu_count() or 1     # number of worker processes
+        self._pool = None                           # the workers, started on first use
+
+
+    def align(self):
+        """
+        Compute the alignment of the aligner's seqX and seqY
+        :return: an aligned seqX, an aligned seqY, and the score
+        :rtype: tuple
+        """
+        aligner = self.aligner
+        with _Boundaries(aligner, self._cuts(len(aligner.seqY)), self._cuts(len(aligner.seqX))) as boundaries:
+            self._fill(boundaries)
+            score = boundaries.rowA(len(boundaries.rowCuts) - 1)[-1]
+
+            alignX = []
+            alignY = []
+            i, j, currentMatrix = len(aligner.seqY), len(aligner.seqX), aligner.ALIGNMENT_SYMBOL
+            a, b = len(boundaries.rowCuts) - 2, len(boundaries.colCuts) - 2
+            while i > 0 and j > 0:
+                # the tile holding cell (i, j), which is on its last row or column
+                while boundaries.rowCuts[a] >= i:
+                    a -= 1
+                while boundaries.colCuts[b] >= j:
+                    b -= 1
+                r0, r1 = boundaries.rowCuts[a], boundaries.rowCuts[a + 1]
+                c0, c1 = boundaries.colCuts[b], boundaries.colCuts[b + 1]
+                pointers = bytearray((r1 - r0) * (c1 - c0))
+                aligner.fill_block(r0, c0, r1, c1, *boundaries.inputs(a, b), pointers)
+                i, j, currentMatrix = aligner.walk_pointers(pointers, r0, c0, i, j, c1 - c0,
+                                                            currentMatrix, alignX, alignY)
+
+        return aligner._finish_traceback(alignX, alignY, i, j, score)
+
+
+    def score(self):
+        """
+        Compute only the score of the alignment of the aligner's seqX and seqY
+        :return: the score of the optimal alignment
+        """
+        aligner = self.aligner
+        with _Boundaries(aligner, self._cuts(len(aligner.seqY)), self._cuts(len(aligner.seqX))) as boundaries:
+            self._fill(boundaries)
+            return boundaries.rowA(len(boundaries.rowCuts) - 1)[-1]
+
+
+    def _cuts(self, length):
+        """
+        Splits 0..length into the rows (or columns) bounding the tiles
+        :return: the increasing cut positions, from 0 to length
+        :rtype: list
+        """
+        count = max(1, min(length, self.TILES_PER_JOB * self.jobs))
+        return [(k * length) // count for k in range(count + 1)]
+
+
+    def _fill(self, boundaries):
+        """
+        Fills every tile, in worker processes once a tile's top and left neighbours are done
+        """
+        rows = len(boundaries.rowCuts) - 1
+        cols = len(boundaries.colCuts) - 1
+
+        if self.jobs == 1 or rows * cols == 1 or current_process().daemon:
+            for a in range(rows):
+                for b in range(cols):
+                    boundaries.fill_tile(a, b)
+            return
+
+        aligner = self.aligner
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.jobs)
+        fields = (type(aligner), {name: getattr(aligner, name) for name in _Boundaries.ALIGNER_FIELDS},
+                  boundaries.shape())
+
+        done = set()
+        running = {self._pool.submit(_fill_tile, *fields, 0, 0): (0, 0)}
+        try:
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    future.result()
+                    a, b = running.pop(future)
+                    done.add((a, b))
+                    if a + 1 < rows and (b == 0 or (a + 1, b - 1) in done):
+                        running[self._pool.submit(_fill_tile, *fields, a + 1, b)] = (a + 1, b)
+                    if b + 1 < cols and (a == 0 or (a - 1, b + 1) in done):
+                        running[self._pool.submit(_fill_tile, *fields, a, b + 1)] = (a, b + 1)
+        except BaseException:
+            # the boundaries are removed on return, so no tile may still be writing them
+            wait(running)
+            raise
+
+
+    def close(self):
+        """
+        Stops the worker processes, which the next alignment starts again
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+class _Boundaries:
+    """
+    The last row (A and D) of every tile row and the last column (A and I) of every tile
+    column, followed by the query profile and the residue codes of the vertical
+    sequence, in a shared memory block.  Values are stored as 64-bit integers when every
+    score is an integer, and as doubles otherwise, both holding the scores exactly.  When
+    the substitution scores and the gap costs have different types, as for the float
+    distances and the integer gap costs of a BLOSUM file, a value of the serial engines
+    only has the type of the substitution scores if its path has an aligned pair.  Each
+    value is then stored with a flag of whether it has that type, the has-pair flag
+    for integer gap costs, so that the values and scores keep their types
+    """
+
+    # the fields of the aligner read by fill_block, besides the profile and codes
+    ALIGNER_FIELDS = ('compare_function', 'gapInitCost', 'gapExtendCost')
+
+    def __init__(self, aligner, rowCuts, colCuts, name=None, typecode=None, codes=None, pairType=None):
+
+        self.aligner = aligner
+        self.rowCuts = rowCuts      # rows bounding the tiles
+        self.colCuts = colCuts      # columns bounding the tiles
+        self.width = colCuts[-1] + 1
+        self.height = rowCuts[-1] + 1
+        self.codes = len(aligner.profile) if codes is None else codes     # residue codes of the profile
+
+        if typecode is None:
+            integers = all(isinstance(value, int) for value in (aligner.scoreTable[0][0], aligner.gapInitCost,
+                                                                 aligner.gapExtendCost))
+            typecode = 'q' if integers else 'd'
+            pairType = type(aligner.scoreTable[0][0])
+        self.typecode = typecode
+        self.pairType = pairType                                    # type of the values with an aligned pair
+        self.gapType = type(aligner.gapInitCost + aligner.gapExtendCost)  # type of the other values
+        self.trackPairs = pairType is not self.gapType              # whether the values have type flags
+
+        # the type flags follow the values, in the same layout
+        self._flags = self._codes() + self.height - 1
+        size = self._flags * (2 if self.trackPairs else 1) * array(typecode).itemsize
+
+        self._owner = name is None
+        self._memory = shared_memory.SharedMemory(name, create=self._owner, size=size if self._owner else 0)
+        self._values = self._memory.buf.cast(typecode)
+        if self._owner:
+            self._init_edges()
+            for code, row in enumerate(aligner.profile):
+                self._store(self._profile(code), row[1:], 1)
+            self._store(self._codes(), list(aligner.codesY))
+        else:
+            # rebuild the profile and codes of the pair in this process
+            aligner.profile = [[None] + self._load(self._profile(code), 1, self.width - 1)
+                               for code in range(self.codes)]
+            aligner.codesY = bytes(int(code) for code in self._load(self._codes(), 0, self.height - 2))
+
+
+    def shape(self):
+        """
+        Returns the arguments reopening these boundaries in another process
+        :rtype: tuple
+        """
+        return self.rowCuts, self.colCuts, self._memory.name, self.typecode, self.codes, self.pairType
+
+
+    def _init_edges(self):
+        """
+        Stores row 0 and column 0 of the matrices
+        """
+        gapInit = self.aligner.gapInitCost
+        gapExtend = self.aligner.gapExtendCost
+        top = [0] + [gapInit + (j * gapExtend) for j in range(1, self.width)]
+        left = [0] + [gapInit + (i * gapExtend) for i in range(1, self.height)]
+        self._store(self._rowA(0), top)
+        self._store(self._rowD(0), [cost + gapInit for cost in top])
+        self._store(self._colA(0), left)
+        self._store(self._colI(0), [cost + gapInit for cost in left])
+
+        # the boundaries of the tiles along the edges start with a cell of column 0 or row 0
+        for a, row in enumerate(self.rowCuts):
+            self._store(self._rowA(a), [left[row]])
+        for b, column in enumerate(self.colCuts):
+            self._store(self._colA(b), [top[column]])
+
+
+    # Offsets of the boundaries in the shared values
+    def _rowA(self, a):
+        return a * self.width
+    def _rowD(self, a):
+        return (len(self.rowCuts) + a) * self.width
+    def _colA(self, b):
+        return 2 * len(self.rowCuts) * self.width + b * self.height
+    def _colI(self, b):
+        return 2 * len(self.rowCuts) * self.width + (len(self.colCuts) + b) * self.height
+    def _profile(self, code):
+        return 2 * (len(self.rowCuts) * self.width + len(self.colCuts) * self.height) + code * self.width
+    def _codes(self):
+        return self._profile(self.codes)
+
+    def _store(self, offset, values, first=0):
+        self._values[offset + first:offset + first + len(values)] = array(self.typecode, values)
+        if self.trackPairs:
+            offset += self._flags
+            self._values[offset + first:offset + first + len(values)] = array(
+                self.typecode, [type(value) is self.pairType for value in values])
+
+    def _load(self, offset, first, last):
+        values = self._values[offset + first:offset + last + 1].tolist()
+        if not self.trackPairs:
+            return values
+        offset += self._flags
+        flags = self._values[offset + first:offset + last + 1].tolist()
+        pairType, gapType = self.pairType, self.gapType
+        return [pairType(value) if hasPair else gapType(value) for value, hasPair in zip(values, flags)]
+
+
+    def rowA(self, a):
+        """
+        Returns the A values of the last row of tile row a - 1 (row 0 for a = 0)
+        """
+        return self._load(self._rowA(a), 0, self.width - 1)
+
+
+    def inputs(self, a, b):
+        """
+        Returns the topA, topD, leftA and leftI arguments of fill_block for tile (a, b)
+        """
+        r0, r1 = self.rowCuts[a], self.rowCuts[a + 1]
+        c0, c1 = self.colCuts[b], self.colCuts[b + 1]
+        return (self._load(self._rowA(a), c0, c1), self._load(self._rowD(a), c0, c1),
+                self._load(self._colA(b), r0, r1), self._load(self._colI(b), r0, r1))
+
+
+    def fill_tile(self, a, b):
+        """
+        Fills tile (a, b) from its top and left boundaries, storing its last row and column
+        """
+        r0, r1 = self.rowCuts[a], self.rowCuts[a + 1]
+        c0, c1 = self.colCuts[b], self.colCuts[b + 1]
+        bottomA, bottomD, rightA, rightI = self.aligner.fill_block(r0, c0, r1, c1, *self.inputs(a, b))
+
+        # the first value of each is the corner shared with a neighbour tile
+        self._store(self._rowA(a + 1), bottomA[1:], c0 + 1)
+        self._store(self._rowD(a + 1), bottomD[1:], c0 + 1)
+        self._store(self._colA(b + 1), rightA[1:], r0 + 1)
+        self._store(self._colI(b + 1), rightI[1:], r0 + 1)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exception):
+        self._values.release()
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+
+#=========================================================================
+
+# Fill tiles in the worker processes
+
+boundaries = None   # the _Boundaries of the last alignment of this worker process
+
+def _fill_tile(alignerClass, state, shape, a, b):
+    # Each worker rebuilds the fields of the aligner read by fill_block, and attaches
+    # to the shared boundaries, once per alignment
+    global boundaries
+    if boundaries is None or boundaries.shape() != shape:
+        if boundaries is not None:
+            boundaries.__exit__()
+        aligner = alignerClass.__new__(alignerClass)
+        aligner.__dict__.update(state)
+        boundaries = _Boundaries(aligner, *shape)
+    boundaries.fill_tile(a, b)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+
+"""
+Contains the TopKSearch class
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+from collections import Counter     # used to count the residues of the sequences
+from kmer_index import KmerIndex
+
+
+class TopKSearch:
+    """
+    Finds the k candidates scoring best against a query, without aligning every
+    candidate to completion.  Candidates are visited from the one sharing the most
+    k-mers with the query, so that the best candidates tend to come first.  Once k
+    candidates are found, the k-th best score is used as the aligner's threshold, so
+    that the DP of a candidate that cannot make the top k is abandoned early, and a
+    candidate is skipped without DP when a bound on its score is worse: the gap cost of
+    the length difference plus the best substitution scores allowed by the residues of
+    both sequences.  When every sequence is searched against all the others, each pair
+    is aligned once for both of its searches.  Ties are broken by candidate index, so
+    the result is that of an exhaustive scan
+    """
+
+    KMER_LENGTH = 3     # length of the k-mers ordering the candidates
+
+    def __init__(self, aligner, k):
+
+        if k < 1:
+            raise ValueError(f"The number of neighbours must be positive, not {k}")
+
+        self.aligner = aligner      # the GlobalAlignerBase scoring the candidates
+        self.k = k                  # number of neighbours searched
+        self.candidates = 0         # candidates considered
+        self.aligned = 0            # candidates aligned to completion
+        self.abandoned = 0          # candidates whose DP was abandoned by the cutoff
+        self.pruned = 0             # candidates skipped because of their bound
+        self.reused = 0             # candidates whose outcome was known from another search
+
+        self._compositions = {}     # { sequence: Counter of its residue codes }
+        self._kmers = {}            # { sequence: set of its k-mers }
+        self._index = KmerIndex(self.KMER_LENGTH)
+        self._outcomes = {}         # { (indexA, indexB): (score, None), or (None, cutoff) if worse than cutoff }
+        self._rankings = {}         # { index: its k best (score, index) found so far, from the best }
+        self._searched = set()      # indices of the queries searched
+
+
+    def composition(self, sequence):
+        """
+        Returns the number of occurrences of each residue code of a sequence
+        :rtype: Counter
+        """
+        composition = self._compositions.get(sequence)
+        if composition is None:
+            composition = self._compositions[sequence] = Counter(self.aligner.blosum.encode(sequence))
+        return composition
+
+
+    def shared_kmers(self, seqA, seqB):
+        """
+        Returns the number of distinct k-mers shared by two sequences
+        :rtype: int
+        """
+        kmersA = self._kmers.get(seqA)
+        if kmersA is None:
+            kmersA = self._kmers[seqA] = self._index.kmers(seqA)
+        kmersB = self._kmers.get(seqB)
+        if kmersB is None:
+            kmersB = self._kmers[seqB] = self._index.kmers(seqB)
+        return len(kmersA & kmersB)
+
+
+    def bound(self, seqA, seqB):
+        """
+        Returns a bound on the score of the alignment of two sequences, which no
+        alignment scores better than.  Each residue of a sequence is at best aligned
+        with the residue of the other sequence it scores best against (or left out, for
+        0), and the longer sequence has at least one gap as long as the length
+        difference.  Only valid when gaps always cost something
+        :return: the bound, or None if gaps may be rewarded
+        """
+        aligner = self.aligner
+        better = aligner.compare_function
+        gapInit = aligner.gapInitCost
+        gapExtend = aligner.gapExtendCost
+        if better(gapInit, 0) or better(gapExtend, 0):
+            return None
+
+        table = aligner.scoreTable
+        compositionA = self.composition(seqA)
+        compositionB = self.composition(seqB)
+
+        boundA = 0
+        for a, count in compositionA.items():
+            best = 0
+            for b in compositionB:
+                if better(table[a][b], best):
+                    best = table[a][b]
+            boundA += count * best
+
+        boundB = 0
+        for b, count in compositionB.items():
+            best = 0
+            for a in compositionA:
+                if better(table[a][b], best):
+                    best = table[a][b]
+            boundB += count * best
+
+        difference = abs(len(seqA) - len(seqB))
+        gaps = gapInit + (difference * gapExtend) if difference else 0
+        return (boundB if better(boundA, boundB) else boundA) + gaps
+
+
+    def search(self, query, candidates, queryIndex=None):
+        """
+        Finds the k candidates scoring best against a query.  A threshold already set on
+        the aligner is kept, candidates worse than it not being returned.  With
+        queryIndex, the outcome of each pair is kept for the search of its other
+        sequence, and a pair is only abandoned when it can make neither top k; the
+        searches must then all be over the same indexed sequences, each query against
+        all the others
+        :param query: an amino acid sequence
+        :param candidates: (index, sequence) pairs
+        :param queryIndex: the index of the query among the candidates of the other searches
+        :return: the (index, score) of the best candidates, from the best, ties by index
+        :rtype: list
+        """
+        aligner = self.aligner
+        better = aligner.compare_function
+        threshold = aligner.threshold
+        self.candidates += len(candidates)
+
+        # the pairs of the candidates already aligned by the search of a candidate come first
+        best = []   # (score, index) of the best candidates so far, from the best
+        ordered = []
+        for index, sequence in candidates:
+            score, _ = self._outcomes.get(self._key(queryIndex, index), (None, None))
+            if score is not None and not aligner.rejects(score):
+                self.reused += 1
+                self._rank(best, score, index)
+            else:
+                ordered.append((index, sequence))
+        ordered.sort(key=lambda candidate: -self.shared_kmers(query, candidate[1]))     # most shared k-mers first
+
+        try:
+            for index, sequence in ordered:
+                cutoff = self._cutoff(best, queryIndex, index, threshold)
+                key = self._key(queryIndex, index)
+                _, known = self._outcomes.get(key, (None, None))
+                if known is not None and cutoff is not None and not better(known, cutoff):
+                    self.reused += 1    # worse than a cutoff at least as bad as this one
+                    continue
+
+                bound = self.bound(query, sequence) if cutoff is not None else None
+                if bound is not None and better(cutoff, bound):
+                    self.pruned += 1
+                    score = None
+                else:
+                    aligner.threshold = cutoff
+                    score = aligner.score(*self._pair(key, queryIndex, query, sequence))
+                    if score is None:
+                        self.abandoned += 1
+                    else:
+                        self.aligned += 1
+
+                if queryIndex is not None:
+                    self._outcomes[key] = (score, None) if score is not None else (None, cutoff)
+                    if score is not None:
+                        self._rank(self._rankings.setdefault(index, []), score, queryIndex)
+                if score is not None:
+                    self._rank(best, score, index)
+        finally:
+            aligner.threshold = threshold
+
+        if queryIndex is not None:
+            self._searched.add(queryIndex)
+        return [(index, score) for score, index in best]
+
+
+    def _cutoff(self, best, queryIndex, index, threshold):
+        """
+        Returns the threshold of the pair of the query and a candidate: the k-th best
+        score of the query, or with queryIndex the worse of it and the k-th best score
+        found so far for the candidate, if its search is still to come, and at least the
+        threshold of the search
+        """
+        better = self.aligner.compare_function
+        cutoff = best[-1][0] if len(best) == self.k else None
+        if cutoff is not None and queryIndex is not None and index not in self._searched:
+            ranking = self._rankings.get(index, [])
+            if len(ranking) < self.k:
+                cutoff = None
+            elif better(cutoff, ranking[-1][0]):
+                cutoff = ranking[-1][0]
+
+        if threshold is not None and (cutoff is None or better(threshold, cutoff)):
+            return threshold
+        return cutoff
+
+
+    def _rank(self, ranking, score, index):
+        """
+        Inserts a candidate into a ranking of at most k (score, index), from the best,
+        ties by index
+        """
+        better = self.aligner.compare_function
+        rank = len(ranking)
+        while rank > 0 and (better(score, ranking[rank - 1][0]) or
+                            (score == ranking[rank - 1][0] and index < ranking[rank - 1][1])):
+            rank -= 1
+        ranking.insert(rank, (score, index))
+        del ranking[self.k:]
+
+
+    def _key(self, queryIndex, index):
+        """
+        Returns the key of the outcome of a pair, None without queryIndex
+        """
+        if queryIndex is None:
+            return None
+        return (queryIndex, index) if queryIndex < index else (index, queryIndex)
+
+
+    def _pair(self, key, queryIndex, query, sequence):
+        """
+        Returns the sequences of a pair in the order of their indices, as an exhaustive
+        scan aligns them
+        """
+        if key is None or key[0] == queryIndex:
+            return query, sequence
+        return sequence, query
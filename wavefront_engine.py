@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+
+"""
+Contains the WavefrontEngine class
+"""
+
+"""
+@Author: global-alignment contributors
+@Data: October 17th, 2026
+"""
+
+
+from operator import lt, gt                  # used to map compare functions to NumPy
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only required by this engine
+    np = None
+
+
+class WavefrontEngine:
+    """
+    Computes the affine indel gap model global alignment of an aligner's sequences
+    one anti-diagonal at a time, using whole-array NumPy operations.  Every cell of an
+    anti-diagonal only depends on the two previous anti-diagonals, so the cells of a
+    diagonal can be computed together.  Ties are broken exactly like
+    GlobalAlignerBase.compute_matrices, so both engines return the same alignments
+    """
+
+    BATCH_SIZE = 64             # largest number of targets aligned together
+    BATCH_CELLS = 1 << 26       # largest number of pointers kept by a batch of alignments
+
+    def __init__(self, aligner):
+
+        if np is None:
+            raise ImportError("The numpy engine requires NumPy to be installed")
+
+        self.aligner = aligner          # the GlobalAlignerBase providing sequences and scores
+        self._table = None              # aligner.scoreTable as an array
+        self._tableSource = None        # the scoreTable that _table was built from
+
+
+    def _better_function(self):
+        """
+        Returns the NumPy ufunc matching the aligner's compare_function
+        :return: np.less or np.greater
+        """
+        if self.aligner.compare_function is lt:
+            return np.less
+        if self.aligner.compare_function is gt:
+            return np.greater
+        raise ValueError("The numpy engine only supports the lt and gt compare functions")
+
+
+    def _encode(self, sequence):
+        """
+        Encodes a sequence as an array of residue codes
+        :return: the codes of the sequence
+        """
+        return np.frombuffer(self.aligner.blosum.encode(sequence), dtype=np.uint8).astype(np.intp)
+
+
+    def _encode_batch(self, sequences):
+        """
+        Encodes sequences as the rows of a 2-D array of residue codes, padding the shorter
+        ones with code 0.  The padding rows are computed and ignored, as no cell of a
+        sequence depends on the rows below it
+        :return: the codes of the sequences, one row per sequence
+        """
+        codes = np.zeros((len(sequences), max(len(sequence) for sequence in sequences)), dtype=np.intp)
+        for k, sequence in enumerate(sequences):
+            codes[k, :len(sequence)] = self._encode(sequence)
+        return codes
+
+
+    def align(self):
+        """
+        Compute the alignment of the aligner's seqX and seqY
+        :return: an aligned seqX, an aligned seqY, and the score
+        :rtype: tuple
+        """
+        aligner = self.aligner
+        size = len(aligner.seqY) * len(aligner.seqX)
+        pointers = aligner.arena.pointers(size)
+        matrix = np.frombuffer(pointers, dtype=np.uint8, count=size).reshape(1, len(aligner.seqY), len(aligner.seqX))
+        score, = self._fill(self._encode(aligner.seqX), self._encode_batch([aligner.seqY]),
+                            [len(aligner.seqY)], matrix)
+        del matrix      # the arena can only grow the buffer once no array views it
+
+        if score is None:
+            return None
+        return aligner.traceback_pointers(pointers, score)
+
+
+    def score(self, seqA, seqB):
+        """
+        Compute only the score of the alignment of seqA and seqB, keeping the last two
+        anti-diagonals of each matrix.  The shorter sequence is laid along the vertical axis
+        so the diagonals stay O(min(len(seqA), len(seqB))) long
+        :return: the score of the optimal alignment
+        """
+        if len(seqB) > len(seqA):
+            seqA, seqB = seqB, seqA
+            transposed = True
+        else:
+            transposed = False
+        return self._fill(self._encode(seqA), self._encode_batch([seqB]), [len(seqB)], None, transposed)[0]
+
+
+    def align_many(self, query, targets, batchSize=BATCH_SIZE):
+        """
+        Compute the alignments of a query against many targets, advancing the DP of a
+        batch of targets of similar lengths together.  Returns the same alignments as
+        aligning each pair with GlobalAlignerBase.align(query, target)
+        :param query: an amino acid sequence, laid along the horizontal axis
+        :param targets: a list of amino acid sequences
+        :param batchSize: the largest number of targets aligned together
+        :return: an aligned query, an aligned target, and the score, for each target, or
+        None for the targets rejected by the aligner's threshold
+        :rtype: list
+        """
+        aligner = self.aligner
+        results = [None] * len(targets)
+        codesX = self._encode(query)
+        width = len(query)
+
+        # Pairs above the linear space threshold keep their own (linear space) alignment
+        small = []
+        for t, target in enumerate(targets):
+            if not target or (width + 1) * (len(target) + 1) > aligner.linearSpaceThreshold:
+                results[t] = aligner.align(query, target)
+            else:
+                small.append(t)
+
+        maxCount = lambda height: min(batchSize, max(1, self.BATCH_CELLS // (height * width)))
+        for batch in self._buckets(targets, small, maxCount):
+            lengths = [len(targets[t]) for t in batch]
+            pointers = np.zeros((len(batch), max(lengths), width), dtype=np.uint8)
+            scores = self._fill(codesX, self._encode_batch([targets[t] for t in batch]), lengths, pointers)
+
+            aligner.seqX = query
+            for k, t in enumerate(batch):
+                if scores[k] is not None:
+                    aligner.seqY = targets[t]
+                    results[t] = aligner.traceback_pointers(memoryview(pointers[k].reshape(-1)), scores[k])
+
+        return results
+
+
+    def score_many(self, query, targets, batchSize=BATCH_SIZE):
+        """
+        Compute only the scores of the alignments of a query against many targets,
+        advancing the DP of a batch of targets of similar lengths together
+        :param query: an amino acid sequence, laid along the horizontal axis
+        :param targets: a list of amino acid sequences
+        :param batchSize: the largest number of targets aligned together
+        :return: the score of the optimal alignment of the query with each target, or None
+        for the targets rejected by the aligner's threshold
+        :rtype: list
+        """
+        results = [None] * len(targets)
+        codesX = self._encode(query)
+
+        small = []
+        for t, target in enumerate(targets):
+            if not target:
+                results[t] = self.aligner.score(query, target)
+            else:
+                small.append(t)
+
+        for batch in self._buckets(targets, small, lambda height: batchSize):
+            lengths = [len(targets[t]) for t in batch]
+            scores = self._fill(codesX, self._encode_batch([targets[t] for t in batch]), lengths, None)
+            for t, score in zip(batch, scores):
+                results[t] = score
+
+        return results
+
+
+    def _buckets(self, targets, indices, maxCount):
+        """
+        Groups target indices into batches of similar lengths, from the longest targets
+        to the shortest.  A batch only takes targets at least half as long as its first
+        (longest) target, which bounds the padding to half of its cells
+        :param targets: a list of sequences
+        :param indices: the indices of the targets to group
+        :param maxCount: returns the largest batch size for a given longest target length
+        :return: lists of target indices
+        :rtype: generator
+        """
+        batch = []
+        for t in sorted(indices, key=lambda t: len(targets[t]), reverse=True):
+            if batch and (len(batch) >= maxCount(len(targets[batch[0]]))
+                          or 2 * len(targets[t]) < len(targets[batch[0]])):
+                yield batch
+                batch = []
+            batch.append(t)
+        if batch:
+            yield batch
+
+
+    def _fill(self, codesX, codesY, lengths, pointers, transposed=False):
+        """
+        Runs the anti-diagonal DP of one horizontal sequence against a batch of vertical
+        sequences, the first axis of every array being the batch
+        :param codesX: the residue codes of the horizontal sequence
+        :param codesY: the padded residue codes of the vertical sequences, one row each
+        :param lengths: the length of each vertical sequence
+        :param pointers: a batch x max(lengths) x len(codesX) uint8 array receiving the
+        traceback pointers of rows 1..len(seqY) and columns 1..len(seqX) of each
+        alignment, or None to only compute the scores
+        :param transposed: whether seqX and seqY were swapped, which swaps the roles of
+        I and D in A, including the order in which their ties are broken
+        :return: the score of the optimal alignment against each vertical sequence, or None
+        if the aligner's threshold rejected it
+        :rtype: list
+        """
+        aligner = self.aligner
+        batch, height = codesY.shape    # batch size, last row (m)
+        width = len(codesX)             # last column (n)
+
+        table = self._score_table()
+        better = self._better_function()
+        dtype = np.result_type(table.dtype, type(aligner.gapInitCost), type(aligner.gapExtendCost))
+
+        gapInit = aligner.gapInitCost
+        gapExtend = aligner.gapExtendCost
+        gapOpen = gapInit + gapExtend
+
+        # The Python engine only adds gap costs along a path without any aligned residue
+        # pair, so such a score keeps the type of the gap costs.  When the substitution
+        # scores are of another type, track which cells have an aligned pair on their path
+        trackPairs = table.dtype.kind != np.asarray(gapOpen).dtype.kind
+
+        # the batch entries whose last cell (length, width) is on each diagonal
+        ends = {}
+        for k, length in enumerate(lengths):
+            ends.setdefault(length + width, []).append(k)
+        scores = [None] * batch
+
+        # With a threshold, bound every path through the last two diagonals (see
+        # GlobalAlignerBase.row_rejects; a path may step over one diagonal, not two)
+        bonus = aligner.threshold_bonus()
+        if bonus is not None:
+            worst = np.inf if better(0, 1) else -np.inf
+            best = np.min if better(0, 1) else np.max
+            heights = np.array(lengths)[:, None]
+            rejected = np.zeros(batch, dtype=bool)
+
+            # pairs[k, i]: the most that the rows below row i of the k-th alignment can
+            # improve a score by, one aligned pair per row (see threshold_ramp)
+            gains = best(table[codesX], axis=0)
+            gains = np.where(better(gains, 0), gains, 0)[codesY]
+            gains[np.arange(height)[None, :] >= heights] = 0
+            pairs = np.zeros((batch, height + 1), dtype=gains.dtype)
+            pairs[:, :height] = np.cumsum(gains[:, ::-1], axis=1)[:, ::-1]
+            lastBound = np.abs(heights[:, 0] - width) * gapExtend + pairs[:, 0]     # diagonal 0
+
+        # Each diagonal is stored by row index i, cell (i, d - i).  Only the I values
+        # of the first column and the D values of the first row are ever read
+        prevA = np.zeros((batch, height + 1), dtype=dtype)      # diagonal d - 2
+        lastA = np.zeros((batch, height + 1), dtype=dtype)      # diagonal d - 1
+        lastI = np.zeros((batch, height + 1), dtype=dtype)
+        lastD = np.zeros((batch, height + 1), dtype=dtype)
+        lastA[:, 0] = 0
+        lastI[:, 0] = gapInit
+        lastD[:, 0] = gapInit
+        lastPairA = lastPairI = lastPairD = np.zeros((batch, height + 1), dtype=bool)
+
+        for d in range(1, height + width + 1):
+
+            curA = np.empty((batch, height + 1), dtype=dtype)
+            curI = np.empty((batch, height + 1), dtype=dtype)
+            curD = np.empty((batch, height + 1), dtype=dtype)
+            if trackPairs:
+                curPairA = np.zeros((batch, height + 1), dtype=bool)
+                curPairI = np.zeros((batch, height + 1), dtype=bool)
+                curPairD = np.zeros((batch, height + 1), dtype=bool)
+
+            # first row and first column
+            boundary = gapInit + d * gapExtend
+            if d <= width:
+                curA[:, 0] = boundary
+                curD[:, 0] = boundary + gapInit
+            if d <= height:
+                curA[:, d] = boundary
+                curI[:, d] = boundary + gapInit
+
+            iLo = max(1, d - width)
+            iHi = min(height, d - 1)
+
+            if iLo <= iHi:
+                rows = np.arange(iLo, iHi + 1)
+                cols = d - rows
+
+                # min/max ( D(i-1,j) + gext,  A(i-1,j) + gini + gext)
+                costD = lastD[:, iLo - 1:iHi] + gapExtend
+                costA = lastA[:, iLo - 1:iHi] + gapOpen
+                keepD = better(costD, costA)
+                valueD = np.where(keepD, costD, costA)
+
+                # min/max ( I(i,j-1) + gext,  A(i,j-1) + gini + gext)
+                costI = lastI[:, iLo:iHi + 1] + gapExtend
+                costA = lastA[:, iLo:iHi + 1] + gapOpen
+                keepI = better(costI, costA)
+                valueI = np.where(keepI, costI, costA)
+
+                # min/max ( D(i,j),  I(i,j),  A(i-1,j-1) + score(ai, bj))
+                costA = prevA[:, iLo - 1:iHi] + table[codesX[cols - 1], codesY[:, rows - 1]]
+                aBeatsI = better(costA, valueI)
+                aBeatsD = better(costA, valueD)
+                if transposed:
+                    fromD = ~aBeatsD & better(valueD, valueI)
+                    fromI = ~(aBeatsI & aBeatsD) & ~fromD
+                else:
+                    fromI = ~aBeatsI & better(valueI, valueD)
+                    fromD = ~(aBeatsI & aBeatsD) & ~fromI
+
+                curD[:, iLo:iHi + 1] = valueD
+                curI[:, iLo:iHi + 1] = valueI
+                curA[:, iLo:iHi + 1] = np.where(fromD, valueD, np.where(fromI, valueI, costA))
+
+                if trackPairs:
+                    curPairD[:, iLo:iHi + 1] = np.where(keepD, lastPairD[:, iLo - 1:iHi], lastPairA[:, iLo - 1:iHi])
+                    curPairI[:, iLo:iHi + 1] = np.where(keepI, lastPairI[:, iLo:iHi + 1], lastPairA[:, iLo:iHi + 1])
+                    curPairA[:, iLo:iHi + 1] = np.where(fromD, curPairD[:, iLo:iHi + 1],
+                                                        fromI & curPairI[:, iLo:iHi + 1] | ~fromI)
+
+                if pointers is not None:
+                    pointers[:, rows - 1, cols - 1] = (fromI * aligner.A_FROM_INSERTION
+                                                       | fromD * aligner.A_FROM_DELETION
+                                                       | ~keepI * aligner.INSERTION_FROM_ALIGNMENT
+                                                       | ~keepD * aligner.DELETION_FROM_ALIGNMENT)
+
+            prevA, lastA, lastI, lastD = lastA, curA, curI, curD
+            if trackPairs:
+                lastPairA, lastPairI, lastPairD = curPairA, curPairI, curPairD
+
+            if bonus is not None:
+                rows = np.arange(max(0, d - width), min(height, d) + 1)
+                remaining = heights - rows
+                bound = (lastA[:, rows[0]:rows[-1] + 1] + np.abs(remaining - (width - d + rows)) * gapExtend
+                         + pairs[:, rows[0]:rows[-1] + 1])
+                bound = best(np.where(remaining >= 0, bound, worst), axis=1)
+                rejected |= better(aligner.threshold, np.where(better(bound, lastBound), bound, lastBound))
+                lastBound = bound
+                if rejected.all():
+                    break
+
+            for k in ends.get(d, ()):
+                if bonus is not None and rejected[k]:
+                    continue
+                score = lastA[k, lengths[k]].item()
+                if trackPairs and not lastPairA[k, lengths[k]]:
+                    score = type(gapOpen)(score)
+                scores[k] = None if aligner.rejects(score) else score
+
+        return scores
+
+
+    def _score_table(self):
+        """
+        Returns the aligner's dense substitution table as an array indexed [codeX, codeY]
+        """
+        if self._tableSource is not self.aligner.scoreTable:
+            self._table = np.array(self.aligner.scoreTable)
+            self._tableSource = self.aligner.scoreTable
+        return self._table